@@ -1,12 +1,18 @@
 import streamlit as st
-from database import init_db
+from contextlib import nullcontext
+from database import init_db, iniciar_varredura_expirados
+import instrumentacao
 
 # Configuração da página principal
 st.set_page_config(page_title="Sistema de Gestão MTA", layout="wide")
 
-# Inicializa o banco de dados
+# Inicializa o banco de dados (só aplica migrações pendentes, uma vez por processo)
 init_db()
 
+# encerra agendamentos expirados em segundo plano (uma thread por processo),
+# fora da renderização das páginas
+iniciar_varredura_expirados()
+
 # Referência das páginas
 inicio = st.Page("pages/0_Inicio.py", title="Início", icon="🏠")
 agendamentos = st.Page("pages/1_Agendamentos.py", title="Agendamentos", icon="📅")
@@ -14,8 +20,13 @@ disponibilidades = st.Page("pages/2_Disponibilidades.py", title="Disponibilidade
 itens = st.Page("pages/3_Itens.py", title="Itens", icon="📦")
 clientes = st.Page("pages/4_Clientes.py", title="Clientes", icon="👥")
 relatorios = st.Page("pages/5_Relatorios.py", title="Relatórios", icon="📊")
+# fora do menu; acessível por /diagnostico
+diagnostico = st.Page("pages/9_Diagnostico.py", title="Diagnóstico", icon="🩺", url_path="diagnostico",
+                      visibility="hidden")
 
-pg = st.navigation(pages=[inicio, agendamentos, disponibilidades, itens, clientes, relatorios])
+pg = st.navigation(pages=[inicio, agendamentos, disponibilidades, itens, clientes, relatorios, diagnostico])
 st.sidebar.caption("Sistema de Gestão MTA")
 
-pg.run()
\ No newline at end of file
+# cada rerun é registrado pela instrumentação (quando ligada), exceto o da própria página de diagnóstico
+with nullcontext() if pg.url_path == diagnostico.url_path else instrumentacao.rerun(pg.title):
+    pg.run()
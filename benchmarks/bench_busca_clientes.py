@@ -0,0 +1,73 @@
+"""Benchmark: busca paginada de clientes por prefixo (nome, sobrenome, e-mail, CPF).
+
+Gera clientes sintéticos num banco temporário e mede, para alguns termos,
+a primeira página, a página seguinte (cursor) e a contagem, contra carregar
+todos com listar_clientes() e filtrar em Python (como a página fazia).
+
+    python benchmarks/bench_busca_clientes.py --clientes 100000
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+NOMES = ["Ana", "Bruno", "Carla", "Daniel", "Eduarda", "Felipe", "Gabriela", "Heitor", "Isabela", "João",
+         "Larissa", "Marcos", "Natália", "Otávio", "Paula", "Rafael", "Sofia", "Thiago", "Vitória", "William"]
+SOBRENOMES = ["Silva", "Santos", "Oliveira", "Souza", "Lima", "Pereira", "Costa", "Almeida", "Ferreira", "Rocha"]
+
+
+def ms(funcao, repeticoes=5):
+    t0 = time.perf_counter()
+    for _ in range(repeticoes):
+        resultado = funcao()
+    return (time.perf_counter() - t0) / repeticoes * 1000, resultado
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--clientes", type=int, default=100000)
+    parser.add_argument("--termos", nargs="+", default=["ana", "Ana Sil", "rocha", "c123", "529.98", "a", "zzz"])
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        os.environ["MTA_DB_PATH"] = str(Path(tmp) / "bench.db")
+        import database
+
+        rnd = random.Random(42)
+        conn = database.get_connection()
+        conn.executemany(
+            "INSERT INTO clientes (nome, sobrenome, email, telefone, cpf) VALUES (?, ?, ?, '', ?)",
+            [(f"{rnd.choice(NOMES)}{i}" if rnd.random() < 0.5 else rnd.choice(NOMES), rnd.choice(SOBRENOMES),
+              f"c{i}@exemplo.com", f"{rnd.randrange(10**11):011d}") for i in range(args.clientes)],
+        )
+        conn.commit()
+        conn.execute("ANALYZE")
+        conn.close()
+
+        print(f"{'termo':>10} {'achados':>8} {'1ª pág (ms)':>12} {'2ª pág (ms)':>12} {'contagem (ms)':>14} {'python (ms)':>12}")
+        for termo in args.termos:
+            t_pag, pagina = ms(lambda: database.listar_clientes_paginado(termo, limite=20))
+            cursor = (f"{pagina[-1][1]} {pagina[-1][2]}", pagina[-1][0]) if pagina else None
+            t_prox, _ = ms(lambda: database.listar_clientes_paginado(termo, limite=20, cursor=cursor))
+            database.cache_leituras.limpar()  # fora da medição (liberar o cache também custa)
+            t_cont, total = ms(lambda: database.contar_clientes(termo), 1)
+
+            def em_python():
+                database.cache_leituras.limpar()
+                t = termo.lower()
+                achados = [c for c in database.listar_clientes()
+                           if f"{c[1]} {c[2]}".lower().startswith(t) or c[2].lower().startswith(t)
+                           or c[3].lower().startswith(t) or c[5].startswith(database.normalizar_cpf(termo) or "-")]
+                return sorted(achados, key=lambda c: (f"{c[1]} {c[2]}".lower(), c[0]))[:20]
+
+            t_py, _ = ms(em_python, 1)
+            print(f"{termo:>10} {total:>8} {t_pag:>12.2f} {t_prox:>12.2f} {t_cont:>14.2f} {t_py:>12.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,60 @@
+"""Benchmark: busca de itens pelo índice FTS5 x varredura em Python (como a página fazia).
+
+Gera um catálogo sintético num banco temporário e mede, para alguns termos,
+a página ranqueada + contagem vindas do SQL contra carregar tudo, filtrar
+com `in`, ordenar e fatiar.
+
+    python benchmarks/bench_busca_itens.py --itens 100000
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+PALAVRAS = ["cadeira", "mesa", "toalha", "tenda", "prato", "copo", "taça", "louça",
+            "buffet", "som", "luz", "palco", "tiffany", "provençal", "lounge", "painel"]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--itens", type=int, default=100000)
+    parser.add_argument("--termos", nargs="+", default=["tiffany", "palco 123", "lounge", "xyz"])
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        os.environ["MTA_DB_PATH"] = str(Path(tmp) / "bench.db")
+        import database
+
+        rnd = random.Random(42)
+        conn = database.get_connection()
+        conn.executemany(
+            "INSERT INTO itens (nome, descricao, quantidade_total) VALUES (?, ?, 1)",
+            [(f"{rnd.choice(PALAVRAS)} {rnd.choice(PALAVRAS)} {i}", " ".join(rnd.choices(PALAVRAS, k=6)))
+             for i in range(args.itens)],
+        )
+        conn.commit()
+        conn.close()
+        database.reconstruir_busca_itens()
+
+        print(f"{'termo':>12} {'achados':>8} {'FTS5 (ms)':>10} {'python (ms)':>12}")
+        for termo in args.termos:
+            t0 = time.perf_counter()
+            total = database.contar_busca_itens(termo)
+            database.buscar_itens(termo, 20, 0)
+            t_fts = time.perf_counter() - t0
+
+            database.cache_leituras.limpar()
+            t0 = time.perf_counter()
+            achados = [i for i in database.listar_itens() if termo.lower() in i[1].lower()]
+            sorted(achados, key=lambda i: i[1].lower())[:20]
+            t_py = time.perf_counter() - t0
+            print(f"{termo:>12} {total:>8} {t_fts * 1000:>10.1f} {t_py * 1000:>12.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,58 @@
+"""Benchmark: conexão nova por chamada x pool de conexões do database.py.
+
+Simula um rerun que faz várias leituras curtas seguidas e mostra os
+contadores do pool (abertas / reutilizadas). Usa um banco temporário.
+
+    python benchmarks/bench_conexoes.py --chamadas 2000
+"""
+import argparse
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--chamadas", type=int, default=2000)
+    parser.add_argument("--itens", type=int, default=500)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        os.environ["MTA_DB_PATH"] = str(Path(tmp) / "bench.db")
+        import database
+
+        conn = database.get_connection()
+        conn.executemany(
+            "INSERT INTO itens (nome, descricao, quantidade_total) VALUES (?, '', 1)",
+            [(f"Item {i}",) for i in range(args.itens)],
+        )
+        conn.commit()
+        conn.close()
+
+        t0 = time.perf_counter()
+        for _ in range(args.chamadas):
+            raw = sqlite3.connect(database.DB_PATH)
+            raw.execute("SELECT id, nome, descricao, quantidade_total FROM itens").fetchall()
+            raw.close()
+        t_sem_pool = time.perf_counter() - t0
+
+        # mesma consulta pelo pool (listar_itens passaria pelo cache de leituras)
+        t0 = time.perf_counter()
+        for _ in range(args.chamadas):
+            conn = database.get_connection()
+            conn.execute("SELECT id, nome, descricao, quantidade_total FROM itens").fetchall()
+            conn.close()
+        t_pool = time.perf_counter() - t0
+
+        print(f"conexão nova por chamada: {t_sem_pool:.4f}s")
+        print(f"pool de conexões:         {t_pool:.4f}s ({t_sem_pool / t_pool:.1f}x)")
+        print("contadores do pool:", database.obter_gerenciador().estatisticas())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+"""Benchmark: disponibilidade por item (uma consulta por item) x consulta em lote.
+
+Simula o custo de um rerun da página Disponibilidades para catálogos de
+tamanhos diferentes. Usa um banco temporário, nunca o database.db do projeto.
+
+    python benchmarks/bench_disponibilidade.py --tamanhos 100 1000 5000
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import date, timedelta
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+
+def popular(conn, n_itens, agendamentos_por_item, seed=42):
+    rnd = random.Random(seed)
+    hoje = date.today()
+    conn.executemany(
+        "INSERT INTO itens (nome, descricao, quantidade_total) VALUES (?, ?, ?)",
+        [(f"Item {i}", "", rnd.randint(1, 50)) for i in range(n_itens)],
+    )
+    conn.execute("""
+        INSERT INTO clientes (nome, sobrenome, email, cpf)
+        VALUES ('Cliente', 'Bench', 'bench@example.com', '00000000000')
+    """)
+    for _ in range(n_itens * agendamentos_por_item):
+        inicio = hoje + timedelta(days=rnd.randint(-60, 60))
+        fim = inicio + timedelta(days=rnd.randint(0, 10))
+        cur = conn.execute("""
+            INSERT INTO agendamentos (cliente_id, data_inicio, data_fim, valor_total, status, criado_em)
+            VALUES (1, ?, ?, 0, 'Em andamento', date('now'))
+        """, (inicio.isoformat(), fim.isoformat()))
+        conn.execute("""
+            INSERT INTO agendamento_itens (agendamento_id, item_id, quantidade, valor_unitario, valor_total)
+            VALUES (?, ?, ?, 0, 0)
+        """, (cur.lastrowid, rnd.randint(1, n_itens), rnd.randint(1, 5)))
+    conn.commit()
+
+
+def cronometrar(fn, repeticoes):
+    melhor = float("inf")
+    for _ in range(repeticoes):
+        t0 = time.perf_counter()
+        fn()
+        melhor = min(melhor, time.perf_counter() - t0)
+    return melhor
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--tamanhos", type=int, nargs="+", default=[100, 1000, 5000])
+    parser.add_argument("--agendamentos-por-item", type=int, default=3)
+    parser.add_argument("--repeticoes", type=int, default=3)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        os.environ["MTA_DB_PATH"] = str(Path(tmp) / "bench.db")
+        import database
+
+        inicio = date.today().isoformat()
+        fim = (date.today() + timedelta(days=30)).isoformat()
+
+        print(f"{'itens':>8} {'por item (s)':>14} {'lote (s)':>10} {'ganho':>8}")
+        for n in args.tamanhos:
+            database.DB_PATH = Path(tmp) / f"bench_{n}.db"
+            database.init_db()
+            conn = database.get_connection()
+            popular(conn, n, args.agendamentos_por_item)
+            conn.close()
+            database.reconstruir_ocupacao_diaria()
+
+            ids = [i[0] for i in database.listar_itens()]
+
+            def por_item():
+                for item_id in ids:
+                    database.quantidade_locada_no_periodo(item_id, inicio, fim)
+
+            def em_lote():
+                database.quantidades_locadas_no_periodo(ids, inicio, fim)
+
+            t_item = cronometrar(por_item, args.repeticoes)
+            t_lote = cronometrar(em_lote, args.repeticoes)
+            print(f"{n:>8} {t_item:>14.4f} {t_lote:>10.4f} {t_item / t_lote:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
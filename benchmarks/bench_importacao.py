@@ -0,0 +1,91 @@
+"""Benchmark: importação em massa (importacao.py) em linhas por segundo.
+
+Gera CSVs sintéticos de itens e clientes (com uma fração de linhas
+inválidas) e mede importar_csv em alguns tamanhos de lote, contra o
+cadastro linha a linha (inserir_item / inserir_cliente, como os
+formulários fazem) numa amostra. Usa um banco temporário por medição.
+
+    python benchmarks/bench_importacao.py --linhas 50000 --lotes 1000 5000 20000
+"""
+import argparse
+import csv
+import os
+import random
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+
+def cpf_aleatorio(rnd):
+    base = [rnd.randint(0, 9) for _ in range(9)]
+    for pesos in (range(10, 1, -1), range(11, 1, -1)):
+        base.append(sum(d * p for d, p in zip(base, pesos)) * 10 % 11 % 10)
+    return "".join(map(str, base))
+
+
+def gerar_csvs(pasta, n, invalidas=0.02, seed=42):
+    rnd = random.Random(seed)
+    itens, clientes = pasta / "itens.csv", pasta / "clientes.csv"
+    with open(itens, "w", newline="", encoding="utf-8") as f:
+        w = csv.writer(f)
+        w.writerow(["nome", "descricao", "quantidade_total"])
+        for i in range(n):
+            qtd = "x" if rnd.random() < invalidas else rnd.randint(1, 500)
+            w.writerow([f"Item {i}", f"descrição do item {i}", qtd])
+    with open(clientes, "w", newline="", encoding="utf-8") as f:
+        w = csv.writer(f)
+        w.writerow(["nome", "sobrenome", "email", "cpf", "data_nascimento", "telefone"])
+        for i in range(n):
+            cpf = "123" if rnd.random() < invalidas else cpf_aleatorio(rnd)
+            w.writerow([f"Cliente {i}", "Bench", f"c{i}@exemplo.com", cpf, "1980-01-01", "11999990000"])
+    return itens, clientes
+
+
+def banco_novo(pasta, nome):
+    import database
+
+    database.DB_PATH = pasta / nome
+    database.init_db()
+    return database
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--linhas", type=int, default=50000)
+    parser.add_argument("--lotes", type=int, nargs="+", default=[1000, 5000, 20000])
+    parser.add_argument("--amostra", type=int, default=2000, help="linhas do cadastro linha a linha")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        pasta = Path(tmp)
+        os.environ["MTA_DB_PATH"] = str(pasta / "inicial.db")
+        import importacao
+
+        csvs = dict(zip(["itens", "clientes"], gerar_csvs(pasta, args.linhas)))
+        print(f"{'tipo':>9} {'lote':>7} {'inseridas':>10} {'erros':>7} {'tempo (s)':>10} {'linhas/s':>10}")
+        for tipo, arquivo in csvs.items():
+            for lote in args.lotes:
+                banco_novo(pasta, f"{tipo}_{lote}.db")
+                r = importacao.importar_csv(tipo, arquivo, tamanho_lote=lote)
+                print(f"{tipo:>9} {lote:>7} {r['inseridas']:>10} {len(r['erros']):>7} "
+                      f"{r['duracao']:>10.2f} {r['lidas'] / r['duracao']:>10,.0f}")
+
+        database = banco_novo(pasta, "linha_a_linha.db")
+        rnd = random.Random(1)
+        t0 = time.perf_counter()
+        for i in range(args.amostra):
+            database.inserir_item(f"Item {i}", "", 1)
+        t_itens = time.perf_counter() - t0
+        t0 = time.perf_counter()
+        for i in range(args.amostra):
+            database.inserir_cliente(f"Cliente {i}", "Bench", None, "c@x.com", "", cpf_aleatorio(rnd))
+        t_clientes = time.perf_counter() - t0
+        print(f"linha a linha: itens {args.amostra / t_itens:,.0f} linhas/s, "
+              f"clientes {args.amostra / t_clientes:,.0f} linhas/s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,114 @@
+"""Benchmark: custo da instrumentação (instrumentacao.py) por chamada ao banco.
+
+Mede chamadas reais do database.py (sem cache de leituras) num banco
+temporário em quatro situações: pool acessado direto (referência),
+instrumentação desligada, ligada fora de um rerun (threads de fundo) e
+ligada dentro de um rerun com seções.
+
+    python benchmarks/bench_instrumentacao.py --agendamentos 20000
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import date, timedelta
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+
+def popular(database, n_agendamentos, rnd):
+    conn = database.get_connection()
+    conn.executemany("INSERT INTO itens (nome, descricao, quantidade_total) VALUES (?, '', ?)",
+                     [(f"Item {i}", rnd.randint(10, 100)) for i in range(200)])
+    conn.executemany("INSERT INTO clientes (nome, sobrenome, email, telefone, cpf) VALUES (?, 'Bench', ?, '', ?)",
+                     [(f"Cliente {i}", f"c{i}@exemplo.com", f"{i:011d}") for i in range(2000)])
+    hoje = date.today()
+    for a in range(n_agendamentos):
+        inicio = hoje + timedelta(days=rnd.randint(-365, 365))
+        cur = conn.execute(
+            "INSERT INTO agendamentos (cliente_id, data_inicio, data_fim, valor_total, status, criado_em) "
+            "VALUES (?, ?, ?, 0, 'Em andamento', ?)",
+            (rnd.randint(1, 2000), inicio.isoformat(), (inicio + timedelta(days=rnd.randint(0, 7))).isoformat(),
+             inicio.isoformat()),
+        )
+        conn.execute("INSERT INTO agendamento_itens (agendamento_id, item_id, quantidade, valor_unitario, valor_total) "
+                     "VALUES (?, ?, 1, 10, 10)", (cur.lastrowid, rnd.randint(1, 200)))
+    conn.commit()
+    conn.execute("ANALYZE")
+    conn.close()
+    database.reconstruir_ocupacao_diaria()
+
+
+def medir(funcoes, repeticoes):
+    """Microssegundos por chamada, melhor de 3 rodadas."""
+    melhor = float("inf")
+    for _ in range(3):
+        t0 = time.perf_counter()
+        for _ in range(repeticoes):
+            for funcao in funcoes:
+                funcao()
+        melhor = min(melhor, (time.perf_counter() - t0) / (repeticoes * len(funcoes)) * 1e6)
+    return melhor
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--agendamentos", type=int, default=20000)
+    parser.add_argument("--repeticoes", type=int, default=300)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        os.environ["MTA_DB_PATH"] = str(Path(tmp) / "bench.db")
+        os.environ.pop("MTA_INSTRUMENTACAO", None)
+        import database
+        import instrumentacao
+
+        popular(database, args.agendamentos, random.Random(42))
+        database.cache_leituras.max_entradas = 0  # mede o banco, não o cache
+        hoje = date.today()
+        inicio, fim = hoje.isoformat(), (hoje + timedelta(days=30)).isoformat()
+
+        def ping():
+            conn = database.get_connection()
+            conn.execute("SELECT 1").fetchone()
+            conn.close()
+
+        funcoes = {
+            "conexão + SELECT 1": [ping],
+            "páginas (listagens)": [
+                lambda: database.listar_agendamentos_completos(limite=20),
+                lambda: database.listar_itens_paginado(limite=20),
+                lambda: database.listar_clientes_paginado("cliente 1", limite=20),
+            ],
+            "disponibilidade": [lambda: database.quantidades_locadas_no_periodo(None, inicio, fim)],
+        }
+
+        def no_rerun(lista):
+            def rodar():
+                with instrumentacao.rerun("bench"), instrumentacao.secao("seção"):
+                    for funcao in lista:
+                        funcao()
+            return [rodar]
+
+        print(f"{'chamada':>22} {'pool direto':>12} {'desligada':>10} {'ligada':>8} {'em rerun':>9}  (µs/chamada)")
+        for nome, lista in funcoes.items():
+            get_connection = database.get_connection
+            database.get_connection = lambda: database.obter_gerenciador().emprestar()
+            direto = medir(lista, args.repeticoes)
+            database.get_connection = get_connection
+
+            instrumentacao.desativar()
+            desligada = medir(lista, args.repeticoes)
+            instrumentacao.ativar()
+            ligada = medir(lista, args.repeticoes)
+            em_rerun = medir(no_rerun(lista), args.repeticoes) / len(lista)
+            instrumentacao.desativar()
+            instrumentacao.limpar()
+            print(f"{nome:>22} {direto:>12.1f} {desligada:>10.1f} {ligada:>8.1f} {em_rerun:>9.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,255 @@
+"""Suíte de benchmarks das funções reais do database.py / relatorios.py em várias escalas.
+
+Para cada escala (número de agendamentos) gera um banco temporário com
+gerar_dados.py (mesma semente = mesmos dados), mede as leituras dos caminhos
+quentes (disponibilidade, listagem de agendamentos, relatórios,
+catálogo e clientes) e depois os caminhos de escrita. Grava os resultados
+em JSON (commit, versões, parâmetros e tempos de cada repetição) e, com
+--comparar, confronta a mediana de cada caso com outro arquivo de
+resultados: sai com código 1 se algum caso piorar além da tolerância.
+
+    python benchmarks/bench_suite.py --escalas 1000 10000 100000 --saida base.json
+    python benchmarks/bench_suite.py --escalas 1000 10000 100000 --saida novo.json --comparar base.json
+"""
+import argparse
+import io
+import json
+import os
+import platform
+import sqlite3
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import date, datetime, timedelta
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+# diferenças abaixo disso (ms) são ruído, mesmo que a razão passe da tolerância
+PISO_RUIDO_MS = 0.5
+
+
+def tamanhos(agendamentos):
+    """Itens e clientes proporcionais ao volume de agendamentos."""
+    return {"itens": max(50, agendamentos // 100), "clientes": max(200, agendamentos // 5), "agendamentos": agendamentos}
+
+
+def commit_atual():
+    try:
+        raiz = Path(__file__).resolve().parent.parent
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=raiz, capture_output=True,
+                                text=True, check=True).stdout.strip()
+        sujo = subprocess.run(["git", "status", "--porcelain", "--untracked-files=no"], cwd=raiz,
+                              capture_output=True, text=True, check=True).stdout.strip()
+        return commit + ("-sujo" if sujo else "")
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def casos_leitura(database, relatorios):
+    """nome -> (função, preparo fora da medição ou None)."""
+    hoje = date.today()
+    inicio, fim = hoje.isoformat(), (hoje + timedelta(days=30)).isoformat()
+    ano_passado = (hoje - timedelta(days=365)).isoformat()
+    with database.conexao() as conn:
+        item_popular = conn.execute(
+            "SELECT item_id FROM agendamento_itens GROUP BY item_id ORDER BY COUNT(*) DESC LIMIT 1").fetchone()[0]
+        cliente_frequente = conn.execute(
+            "SELECT cliente_id FROM agendamentos GROUP BY cliente_id ORDER BY COUNT(*) DESC LIMIT 1").fetchone()[0]
+        cursor_profundo = conn.execute(
+            "SELECT data_inicio, id FROM agendamentos ORDER BY data_inicio DESC, id DESC LIMIT 1 OFFSET ?",
+            (conn.execute("SELECT COUNT(*) FROM agendamentos").fetchone()[0] // 2,)).fetchone()
+    # página do meio do detalhe dos relatórios (OFFSET cresce com o histórico)
+    deslocamento_profundo = relatorios.contar_itens_agendados(ano_passado, inicio) // 2 // 50 * 50
+    frio = database.cache_leituras.limpar
+
+    return {
+        "quantidade_locada_no_periodo (item popular, 30 dias)": (
+            lambda: database.quantidade_locada_no_periodo(item_popular, inicio, fim), None),
+        "quantidades_locadas_no_periodo (todos os itens, 30 dias)": (
+            lambda: database.quantidades_locadas_no_periodo(None, inicio, fim), None),
+        "curva_ocupacao (item popular, 1 ano)": (
+            lambda: database.curva_ocupacao([item_popular], ano_passado, inicio), None),
+        "listar_agendamentos_completos (1ª página)": (
+            lambda: database.listar_agendamentos_completos(limite=20), None),
+        "listar_agendamentos_completos (meio da lista)": (
+            lambda: database.listar_agendamentos_completos(limite=20, apos=tuple(cursor_profundo)), None),
+        "listar_agendamentos_completos (cliente frequente)": (
+            lambda: database.listar_agendamentos_completos(limite=20, cliente_id=cliente_frequente), None),
+        "contar_agendamentos (cache frio)": (lambda: database.contar_agendamentos(), frio),
+        "contar_itens_agendados (1 ano, cache frio)": (
+            lambda: relatorios.contar_itens_agendados(ano_passado, inicio), frio),
+        "itens_agendados_periodo (1 ano, 1ª página)": (
+            lambda: relatorios.itens_agendados_periodo(ano_passado, inicio, 50), None),
+        "itens_agendados_periodo (1 ano, página profunda)": (
+            lambda: relatorios.itens_agendados_periodo(ano_passado, inicio, 50, deslocamento_profundo), None),
+        "exportar_itens_agendados (1 ano, CSV)": (
+            lambda: relatorios.exportar_itens_agendados(io.BytesIO(), ano_passado, inicio), None),
+        "kpis_periodo (1 ano, fatos em memória)": (lambda: relatorios.kpis_periodo(ano_passado, inicio), None),
+        "receita_por_item (1 ano, fatos em memória)": (
+            lambda: relatorios.receita_por_item(ano_passado, inicio), None),
+        "BaseRelatorio (carga completa dos fatos)": (lambda: relatorios.BaseRelatorio().dados(), None),
+        "listar_itens (cache frio)": (database.listar_itens, frio),
+        "listar_clientes (cache frio)": (database.listar_clientes, frio),
+        "listar_itens_paginado (1ª página)": (lambda: database.listar_itens_paginado(limite=20), None),
+        "listar_clientes_paginado (busca 'ana')": (
+            lambda: database.listar_clientes_paginado("ana", limite=20), None),
+    }
+
+
+def casos_escrita(database, ids):
+    """Escritas com dados novos a cada repetição (nomes e CPFs únicos, datas sem conflito)."""
+    import gerar_dados
+    import numpy as np
+
+    contador = iter(range(10**9))
+    rng = np.random.default_rng(0)
+    with database.conexao() as conn:
+        existentes = {r[0] for r in conn.execute("SELECT cpf FROM clientes")}
+    cpfs = iter([cpf for cpf in gerar_dados.cpfs(200000, rng) if cpf not in existentes])
+    futuro = date.today() + timedelta(days=2000)
+    ids_itens, ids_agendamentos = ids
+
+    def criar():
+        k = next(contador)
+        dia = (futuro + timedelta(days=k % 300)).isoformat()
+        itens = [{"item_id": int(i), "quantidade": 1, "valor_unitario": 10.0}
+                 for i in rng.choice(ids_itens, size=3, replace=False)]
+        database.criar_agendamento(int(rng.integers(1, 100)), dia, dia, itens)
+
+    return {
+        "inserir_item": (lambda: database.inserir_item(f"Bench item {next(contador)}", "", 10), None),
+        "inserir_cliente": (
+            lambda: database.inserir_cliente("Bench", "Suite", "1980-01-01", "bench@exemplo.com", "", next(cpfs)),
+            None),
+        "criar_agendamento (3 itens)": (criar, None),
+        "atualizar_status": (
+            lambda: database.atualizar_status(int(rng.choice(ids_agendamentos)), "Em andamento"), None),
+        "inserir_itens_lote (1000)": (
+            lambda: database.inserir_itens_lote([(f"Bench lote {next(contador)}", "", 5) for _ in range(1000)]),
+            None),
+        "inserir_clientes_lote (1000)": (
+            lambda: database.inserir_clientes_lote(
+                [("Bench", "Lote", None, "lote@exemplo.com", "", next(cpfs)) for _ in range(1000)]),
+            None),
+    }
+
+
+def medir(funcao, preparo, repeticoes):
+    tempos = []
+    for _ in range(repeticoes):
+        if preparo is not None:
+            preparo()
+        t0 = time.perf_counter()
+        funcao()
+        tempos.append((time.perf_counter() - t0) * 1000)
+    return tempos
+
+
+def rodar_escala(pasta, agendamentos, args, saida):
+    import database
+    import gerar_dados
+    import relatorios
+
+    database.DB_PATH = pasta / f"escala_{agendamentos}.db"
+    database.init_db()
+    database.cache_leituras.limpar()
+    dados = gerar_dados.gerar(**tamanhos(agendamentos), assimetria=args.assimetria, seed=args.seed)
+    print(f"\n== {agendamentos} agendamentos ({dados['itens']} itens, {dados['clientes']} clientes, "
+          f"{dados['linhas']} linhas; gerado em {dados['duracao']:.1f}s)")
+
+    with database.conexao() as conn:
+        ids = (
+            [r[0] for r in conn.execute("SELECT id FROM itens")],
+            [r[0] for r in conn.execute("SELECT id FROM agendamentos LIMIT 10000")],
+        )
+
+    for grupo, casos in (("leitura", casos_leitura(database, relatorios)), ("escrita", casos_escrita(database, ids))):
+        for nome, (funcao, preparo) in casos.items():
+            if args.casos and not any(filtro in nome for filtro in args.casos):
+                continue
+            funcao()  # aquecimento (conexões, páginas do SQLite, imports)
+            tempos = medir(funcao, preparo, args.repeticoes)
+            resultado = {
+                "escala": agendamentos,
+                "caso": nome,
+                "grupo": grupo,
+                "dados": {k: dados[k] for k in ("itens", "clientes", "agendamentos", "linhas")},
+                "repeticoes": len(tempos),
+                "mediana_ms": statistics.median(tempos),
+                "min_ms": min(tempos),
+                "max_ms": max(tempos),
+                "tempos_ms": tempos,
+            }
+            saida.append(resultado)
+            print(f"{nome:<58} {resultado['mediana_ms']:>10.2f} ms  (min {resultado['min_ms']:.2f})")
+    database.obter_gerenciador().fechar_todas()
+
+
+def comparar(resultados, arquivo_base, tolerancia):
+    """Imprime a razão novo/base por caso; retorna quantos casos pioraram além da tolerância."""
+    base = json.loads(Path(arquivo_base).read_text(encoding="utf-8"))
+    anteriores = {(r["escala"], r["caso"]): r for r in base["resultados"]}
+    print(f"\nComparação com {arquivo_base} (commit {base['meta'].get('commit')}):")
+    piores = 0
+    for r in resultados:
+        anterior = anteriores.get((r["escala"], r["caso"]))
+        if anterior is None:
+            continue
+        razao = r["mediana_ms"] / anterior["mediana_ms"] if anterior["mediana_ms"] else float("inf")
+        regrediu = razao > 1 + tolerancia and r["mediana_ms"] - anterior["mediana_ms"] > PISO_RUIDO_MS
+        piores += regrediu
+        marca = "PIOROU" if regrediu else ("melhorou" if razao < 1 - tolerancia else "")
+        print(f"{r['escala']:>8} {r['caso']:<58} {anterior['mediana_ms']:>9.2f} -> {r['mediana_ms']:>9.2f} ms "
+              f"{razao:>6.2f}x {marca}")
+    return piores
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--escalas", type=int, nargs="+", default=[1000, 10000, 100000],
+                        help="números de agendamentos (itens e clientes proporcionais)")
+    parser.add_argument("--assimetria", type=float, default=1.0)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--repeticoes", type=int, default=7)
+    parser.add_argument("--casos", nargs="+", help="só os casos cujo nome contém um destes textos")
+    parser.add_argument("--saida", default=None, help="arquivo JSON (padrão: bench_<commit>_<data>.json)")
+    parser.add_argument("--comparar", help="JSON de uma execução anterior")
+    parser.add_argument("--tolerancia", type=float, default=0.25, help="piora relativa aceita na comparação")
+    args = parser.parse_args()
+
+    commit = commit_atual()
+    saida = Path(args.saida or f"bench_{commit or 'semgit'}_{datetime.now():%Y%m%d_%H%M%S}.json")
+    resultados = []
+    with tempfile.TemporaryDirectory() as tmp:
+        pasta = Path(tmp)
+        os.environ["MTA_DB_PATH"] = str(pasta / "inicial.db")
+        os.environ.pop("MTA_INSTRUMENTACAO", None)
+        sys.path.insert(0, str(Path(__file__).resolve().parent))
+        for agendamentos in args.escalas:
+            rodar_escala(pasta, agendamentos, args, resultados)
+
+    saida.write_text(json.dumps({
+        "meta": {
+            "commit": commit,
+            "data": datetime.now().isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "sqlite": sqlite3.sqlite_version,
+            "plataforma": platform.platform(),
+            "seed": args.seed,
+            "assimetria": args.assimetria,
+            "repeticoes": args.repeticoes,
+            "escalas": {a: tamanhos(a) for a in args.escalas},
+        },
+        "resultados": resultados,
+    }, ensure_ascii=False, indent=2), encoding="utf-8")
+    print(f"\nresultados em {saida}")
+
+    if args.comparar and comparar(resultados, args.comparar, args.tolerancia):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
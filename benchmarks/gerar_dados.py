@@ -0,0 +1,198 @@
+"""Gerador de dados sintéticos (itens, clientes, agendamentos e linhas) com semente.
+
+Popularidade de itens e frequência de clientes seguem uma lei de Zipf com
+expoente `assimetria` (0 = uniforme; ~1 = poucos itens/clientes concentram
+a maior parte dos agendamentos). As datas de início caem numa janela em
+torno de hoje, com mais retiradas às sextas/sábados e em dezembro/janeiro
+e junho/julho; a duração é geométrica (1 a 15 dias). O estoque de cada item
+é dimensionado pela demanda esperada, para o volume não virar overbooking.
+
+Itens e clientes entram pelas funções de lote do database.py (índice de
+busca incluso); agendamentos e linhas entram por executemany (os triggers
+de fatos rodam normalmente) e a ocupação diária é reconstruída no fim.
+Escreve no banco de MTA_DB_PATH (ou --db), que precisa estar vazio.
+
+    python benchmarks/gerar_dados.py --db /tmp/carga.db --agendamentos 100000 --assimetria 1.1
+"""
+import argparse
+import os
+import sys
+import time
+from datetime import date, timedelta
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+TIPOS = ["Cadeira", "Mesa", "Tenda", "Toalha", "Sousplat", "Taça", "Prato", "Painel", "Arranjo", "Luminária",
+         "Puff", "Sofá", "Tapete", "Bandeja", "Castiçal", "Vaso", "Biombo", "Carrinho", "Balcão", "Pista"]
+ESTILOS = ["Tiffany", "Provençal", "Rústico", "Clássico", "Moderno", "Dourado", "Prata", "Branco", "Madeira",
+           "Cristal", "Vintage", "Industrial", "Boho", "Acrílico", "Redondo", "Quadrado"]
+NOMES = ["Ana", "Bruno", "Carla", "Daniel", "Eduarda", "Felipe", "Gabriela", "Heitor", "Isabela", "João",
+         "Larissa", "Marcos", "Natália", "Otávio", "Paula", "Rafael", "Sofia", "Thiago", "Vitória", "William"]
+SOBRENOMES = ["Silva", "Santos", "Oliveira", "Souza", "Lima", "Pereira", "Costa", "Almeida", "Ferreira", "Rocha",
+              "Gomes", "Ribeiro", "Carvalho", "Martins", "Araújo", "Barbosa", "Melo", "Cardoso", "Teixeira", "Dias"]
+
+# peso relativo da data de retirada: dia da semana (seg..dom) e mês (jan..dez)
+PESO_DIA_SEMANA = [0.7, 0.7, 0.8, 0.9, 1.6, 1.8, 1.0]
+PESO_MES = [1.4, 0.9, 0.9, 0.9, 1.0, 1.3, 1.3, 0.9, 0.9, 1.0, 1.1, 1.6]
+
+TAMANHO_LOTE_AGENDAMENTOS = 20000
+DURACAO_MEDIA = 2.5      # dias ocupados por agendamento (geométrica)
+QUANTIDADE_MEDIA = 2.5   # unidades por linha (geométrica)
+
+
+def pesos_zipf(n, assimetria, rng):
+    """Probabilidades Zipf em ordem aleatória de ids (o mais popular não é sempre o id 1)."""
+    pesos = 1.0 / np.arange(1, n + 1) ** assimetria
+    return rng.permutation(pesos / pesos.sum())
+
+
+def cpfs(n, rng):
+    """n CPFs distintos com dígitos verificadores válidos."""
+    # i -> i * primo mod 10^9 é uma bijeção: bases distintas sem sortear com reposição
+    base = (np.arange(n, dtype=np.int64) * 7919 + int(rng.integers(10**9))) % 10**9
+    d = (base[:, None] // 10 ** np.arange(8, -1, -1)) % 10
+    dig1 = (d @ np.arange(10, 1, -1)) * 10 % 11 % 10
+    dig2 = (np.column_stack([d, dig1]) @ np.arange(11, 1, -1)) * 10 % 11 % 10
+    return [f"{b:09d}{x}{y}" for b, x, y in zip(base, dig1, dig2)]
+
+
+def _datas_inicio(n, hoje, dias_passado, dias_futuro, rng):
+    dias = [hoje + timedelta(days=k) for k in range(-dias_passado, dias_futuro + 1)]
+    pesos = np.array([PESO_DIA_SEMANA[d.weekday()] * PESO_MES[d.month - 1] for d in dias])
+    return rng.choice(len(dias), size=n, p=pesos / pesos.sum()) - dias_passado
+
+
+def gerar(itens=500, clientes=5000, agendamentos=20000, linhas_media=2.5, assimetria=1.0,
+          dias_passado=730, dias_futuro=180, seed=42, progresso=None):
+    """Popula o banco configurado no database.py. Retorna contagens e duração."""
+    import database
+
+    t0 = time.perf_counter()
+    rng = np.random.default_rng(seed)
+    hoje = date.today()
+    with database.conexao() as conn:
+        vazio = all(conn.execute(f"SELECT 1 FROM {t} LIMIT 1").fetchone() is None
+                    for t in ("itens", "clientes", "agendamentos"))
+    if not vazio:
+        raise ValueError(f"o banco {database.DB_PATH} já tem dados; use um arquivo novo")
+
+    # ----- itens: popularidade Zipf, preço log-normal, estoque pela demanda esperada
+    pop_itens = pesos_zipf(itens, assimetria, rng)
+    precos = np.round(rng.lognormal(np.log(15), 0.8, itens), 2)
+    # unidades ocupadas em média num dia qualquer; estoque ~ 4x isso (picos de fim de semana e temporada)
+    demanda = (agendamentos * linhas_media * pop_itens * QUANTIDADE_MEDIA * DURACAO_MEDIA
+               / (dias_passado + dias_futuro + 1))
+    estoque = np.maximum(rng.integers(5, 200, itens), np.ceil(4 * demanda + 3 * np.sqrt(demanda))).astype(int)
+    tipos, estilos = rng.integers(len(TIPOS), size=itens), rng.integers(len(ESTILOS), size=itens)
+    database.inserir_itens_lote([
+        (f"{TIPOS[t]} {ESTILOS[e]} {i + 1}", f"{TIPOS[t]} estilo {ESTILOS[e].lower()}", int(q))
+        for i, (t, e, q) in enumerate(zip(tipos, estilos, estoque))
+    ])
+    if progresso:
+        progresso(f"{itens} itens")
+
+    # ----- clientes: frequência Zipf (clientes recorrentes), CPFs válidos e únicos
+    pop_clientes = pesos_zipf(clientes, assimetria, rng)
+    nomes, sobrenomes = rng.integers(len(NOMES), size=clientes), rng.integers(len(SOBRENOMES), size=clientes)
+    nascimento = rng.integers(-27000, -6600, size=clientes)
+    lista_cpfs = cpfs(clientes, rng)
+    database.inserir_clientes_lote([
+        (NOMES[a], SOBRENOMES[b], (hoje + timedelta(days=int(nasc))).isoformat(),
+         f"{NOMES[a]}.{SOBRENOMES[b]}{i + 1}@exemplo.com".lower(), f"119{i % 10**8:08d}", cpf)
+        for i, (a, b, nasc, cpf) in enumerate(zip(nomes, sobrenomes, nascimento, lista_cpfs))
+    ])
+    if progresso:
+        progresso(f"{clientes} clientes")
+
+    with database.conexao() as conn:
+        ids_itens = np.array([r[0] for r in conn.execute("SELECT id FROM itens ORDER BY id")])
+        ids_clientes = np.array([r[0] for r in conn.execute("SELECT id FROM clientes ORDER BY id")])
+
+    def dia(deslocamento):
+        return (hoje + timedelta(days=int(deslocamento))).isoformat()
+
+    # ----- agendamentos e linhas, em lotes (uma transação por lote)
+    feitos = 0
+    while feitos < agendamentos:
+        n = min(TAMANHO_LOTE_AGENDAMENTOS, agendamentos - feitos)
+        inicio = _datas_inicio(n, hoje, dias_passado, dias_futuro, rng)
+        duracao = np.minimum(rng.geometric(1 / DURACAO_MEDIA, n) - 1, 14)
+        fim = inicio + duracao
+        cancelado = rng.random(n) < 0.05
+        criado = np.minimum(inicio - rng.integers(1, 60, n), 0)
+        cliente = ids_clientes[rng.choice(clientes, size=n, p=pop_clientes)]
+
+        # linhas: 1 + Poisson itens por agendamento, sem repetir item no mesmo agendamento
+        por_ag = 1 + rng.poisson(max(linhas_media - 1, 0), n)
+        dono = np.repeat(np.arange(n), por_ag)
+        item = rng.choice(itens, size=len(dono), p=pop_itens)
+        _, unicas = np.unique(dono * itens + item, return_index=True)
+        dono, item = dono[unicas], item[unicas]
+        quantidade = np.minimum(rng.geometric(1 / QUANTIDADE_MEDIA, len(dono)), 20)
+        valor_linha = quantidade * precos[item]
+        valor_ag = np.bincount(dono, weights=valor_linha, minlength=n)
+
+        with database.transacao() as conn:
+            base_id = conn.execute("SELECT COALESCE(MAX(id), 0) FROM agendamentos").fetchone()[0] + 1
+            conn.executemany("""
+                INSERT INTO agendamentos (id, cliente_id, data_inicio, data_fim, valor_total, status, criado_em)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+            """, [
+                (base_id + k, int(cliente[k]), dia(inicio[k]), dia(fim[k]), round(float(valor_ag[k]), 2),
+                 "Cancelado" if cancelado[k] else ("Encerrado" if fim[k] < 0 else "Em andamento"), dia(criado[k]))
+                for k in range(n)
+            ])
+            conn.executemany("""
+                INSERT INTO agendamento_itens (agendamento_id, item_id, quantidade, valor_unitario, valor_total)
+                VALUES (?, ?, ?, ?, ?)
+            """, [
+                (base_id + int(d), int(ids_itens[i]), int(q), float(precos[i]), round(float(v), 2))
+                for d, i, q, v in zip(dono, item, quantidade, valor_linha)
+            ])
+        feitos += n
+        if progresso:
+            progresso(f"{feitos} agendamentos")
+
+    database.reconstruir_ocupacao_diaria()
+    with database.conexao() as conn:
+        linhas = conn.execute("SELECT COUNT(*) FROM agendamento_itens").fetchone()[0]
+        conn.execute("ANALYZE")
+    database.marcar_alteracao("itens", "clientes", "agendamentos", "agendamento_itens", "ocupacao_diaria")
+    return {
+        "itens": itens,
+        "clientes": clientes,
+        "agendamentos": agendamentos,
+        "linhas": linhas,
+        "duracao": time.perf_counter() - t0,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--db", help="arquivo do banco (padrão: MTA_DB_PATH); precisa estar vazio")
+    parser.add_argument("--itens", type=int, default=500)
+    parser.add_argument("--clientes", type=int, default=5000)
+    parser.add_argument("--agendamentos", type=int, default=20000)
+    parser.add_argument("--linhas-media", type=float, default=2.5, help="itens por agendamento (média)")
+    parser.add_argument("--assimetria", type=float, default=1.0, help="expoente Zipf (0 = uniforme)")
+    parser.add_argument("--dias-passado", type=int, default=730)
+    parser.add_argument("--dias-futuro", type=int, default=180)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    if args.db:
+        os.environ["MTA_DB_PATH"] = args.db
+    elif "MTA_DB_PATH" not in os.environ:
+        parser.error("informe --db ou MTA_DB_PATH (o gerador não escreve no database.db do projeto)")
+
+    r = gerar(args.itens, args.clientes, args.agendamentos, args.linhas_media, args.assimetria,
+              args.dias_passado, args.dias_futuro, args.seed, progresso=print)
+    print(f"{r['itens']} itens, {r['clientes']} clientes, {r['agendamentos']} agendamentos, "
+          f"{r['linhas']} linhas em {r['duracao']:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
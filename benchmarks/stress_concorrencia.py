@@ -0,0 +1,107 @@
+"""Teste de estresse: N sessões simultâneas lendo e gravando no mesmo banco.
+
+Cada sessão (thread, como no Streamlit) alterna leituras de disponibilidade
+com gravações de agendamentos. Ao final mostra vazão e quantos erros de
+"database is locked" chegaram até a sessão, para cada journal_mode.
+
+    python benchmarks/stress_concorrencia.py --sessoes 8 --segundos 5 --modos WAL DELETE
+"""
+import argparse
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+from datetime import date, timedelta
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+
+def sessao(database, segundos, proporcao_escrita, seed, resultado):
+    rnd = random.Random(seed)
+    hoje = date.today()
+    leituras = escritas = erros_lock = 0
+    fim_teste = time.perf_counter() + segundos
+    while time.perf_counter() < fim_teste:
+        inicio = hoje + timedelta(days=rnd.randint(0, 30))
+        fim = inicio + timedelta(days=rnd.randint(0, 7))
+        try:
+            if rnd.random() < proporcao_escrita:
+                ag_id = database.inserir_agendamento_base(1, inicio.isoformat(), fim.isoformat(), 10.0)
+                database.inserir_item_agendamento(ag_id, rnd.randint(1, 50), 1, 10.0, 10.0)
+                if rnd.random() < 0.2:
+                    database.atualizar_status(ag_id, "Cancelado")
+                escritas += 1
+            else:
+                database.quantidades_locadas_no_periodo(None, inicio.isoformat(), fim.isoformat())
+                database.listar_itens()
+                leituras += 1
+        except sqlite3.OperationalError as e:
+            if not database.banco_ocupado(e):
+                raise
+            erros_lock += 1
+    resultado.append((leituras, escritas, erros_lock))
+
+
+def rodar(database, tmp, modo, args):
+    database.SQLITE_PRAGMAS["journal_mode"] = modo
+    database.SQLITE_PRAGMAS["busy_timeout"] = str(args.busy_timeout)
+    database.DB_PATH = Path(tmp) / f"stress_{modo.lower()}.db"
+    database.init_db()
+
+    conn = database.get_connection()
+    conn.executemany(
+        "INSERT INTO itens (nome, descricao, quantidade_total) VALUES (?, '', 100)",
+        [(f"Item {i}",) for i in range(50)],
+    )
+    conn.execute("""
+        INSERT INTO clientes (nome, sobrenome, email, cpf)
+        VALUES ('Cliente', 'Stress', 'stress@example.com', '00000000000')
+    """)
+    conn.commit()
+    conn.close()
+
+    retentativas_antes = database.estatisticas_escrita["retentativas"]
+    resultado = []
+    threads = [
+        threading.Thread(target=sessao, args=(database, args.segundos, args.proporcao_escrita, s, resultado))
+        for s in range(args.sessoes)
+    ]
+    t0 = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    duracao = time.perf_counter() - t0
+
+    leituras = sum(r[0] for r in resultado)
+    escritas = sum(r[1] for r in resultado)
+    erros = sum(r[2] for r in resultado)
+    retentativas = database.estatisticas_escrita["retentativas"] - retentativas_antes
+    divergencias = len(database.verificar_ocupacao_diaria()) + len(database.verificar_fatos_relatorio())
+    print(f"{modo:>8} {leituras / duracao:>12.1f} {escritas / duracao:>12.1f} {retentativas:>12} {erros:>10} {divergencias:>12}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sessoes", type=int, default=8)
+    parser.add_argument("--segundos", type=float, default=5)
+    parser.add_argument("--proporcao-escrita", type=float, default=0.3)
+    parser.add_argument("--busy-timeout", type=int, default=5000, help="ms")
+    parser.add_argument("--modos", nargs="+", default=["WAL", "DELETE"])
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        os.environ["MTA_DB_PATH"] = str(Path(tmp) / "bench.db")
+        import database
+
+        print(f"{'modo':>8} {'leituras/s':>12} {'escritas/s':>12} {'retentativas':>12} {'erros lock':>10} {'divergências':>12}")
+        for modo in args.modos:
+            rodar(database, tmp, modo, args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+"""Corrida de reservas: vários processos disputando as últimas unidades de um item.
+
+Cada processo tenta reservar 1 unidade do mesmo item, no mesmo período, várias
+vezes. Com a checagem dentro da transação (criar_agendamento) o número de
+reservas aceitas nunca passa do estoque. Com --sem-guarda, cada processo
+confere a disponibilidade e só depois grava (como o formulário fazia), o que
+mostra a corrida acontecendo.
+
+Sai com código 1 se houver overbooking no modo protegido ou se ocupacao_diaria
+terminar inconsistente.
+
+    python benchmarks/stress_overbooking.py --processos 8 --estoque 20
+"""
+import argparse
+import multiprocessing
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+RAIZ = Path(__file__).resolve().parent.parent
+INICIO, FIM = "2030-01-01", "2030-01-07"
+
+
+def reservar(db_path, tentativas, estoque, sem_guarda, barreira, fila):
+    os.environ["MTA_DB_PATH"] = db_path
+    sys.path.insert(0, str(RAIZ))
+    import database
+
+    aceitas = recusadas = 0
+    barreira.wait()
+    for _ in range(tentativas):
+        if sem_guarda:
+            locadas = database.quantidade_locada_no_periodo(1, INICIO, FIM)
+            if locadas >= estoque:
+                recusadas += 1
+                continue
+            time.sleep(0.001)  # tempo de "render" entre ver e salvar
+            ag_id = database.inserir_agendamento_base(1, INICIO, FIM, 0)
+            database.inserir_item_agendamento(ag_id, 1, 1, 0, 0)
+            aceitas += 1
+        else:
+            try:
+                database.criar_agendamento(1, INICIO, FIM, [{"item_id": 1, "quantidade": 1, "valor_unitario": 0}])
+                aceitas += 1
+            except database.DisponibilidadeInsuficiente:
+                recusadas += 1
+    fila.put((aceitas, recusadas))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--processos", type=int, default=8)
+    parser.add_argument("--tentativas", type=int, default=10, help="por processo")
+    parser.add_argument("--estoque", type=int, default=20)
+    parser.add_argument("--sem-guarda", action="store_true")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = str(Path(tmp) / "corrida.db")
+        os.environ["MTA_DB_PATH"] = db_path
+        sys.path.insert(0, str(RAIZ))
+        import database
+
+        conn = database.get_connection()
+        conn.execute("INSERT INTO itens (nome, descricao, quantidade_total) VALUES ('Item disputado', '', ?)",
+                     (args.estoque,))
+        conn.execute("""
+            INSERT INTO clientes (nome, sobrenome, email, cpf)
+            VALUES ('Cliente', 'Corrida', 'corrida@example.com', '00000000000')
+        """)
+        conn.commit()
+        conn.close()
+
+        ctx = multiprocessing.get_context("spawn")
+        barreira = ctx.Barrier(args.processos)
+        fila = ctx.Queue()
+        procs = [
+            ctx.Process(target=reservar, args=(db_path, args.tentativas, args.estoque, args.sem_guarda, barreira, fila))
+            for _ in range(args.processos)
+        ]
+        t0 = time.perf_counter()
+        for p in procs:
+            p.start()
+        resultados = [fila.get() for _ in procs]
+        for p in procs:
+            p.join()
+        duracao = time.perf_counter() - t0
+
+        aceitas = sum(r[0] for r in resultados)
+        recusadas = sum(r[1] for r in resultados)
+        ocupacao = database.quantidade_locada_no_periodo(1, INICIO, FIM)
+        excesso = max(0, ocupacao - args.estoque)
+        divergencias = database.verificar_ocupacao_diaria()
+
+        modo = "sem guarda" if args.sem_guarda else "com guarda"
+        print(f"modo: {modo} • {args.processos} processos • {duracao:.2f}s")
+        print(f"aceitas: {aceitas} • recusadas: {recusadas} • estoque: {args.estoque} • "
+              f"ocupação final: {ocupacao} • overbooking: {excesso}")
+        print(f"divergências em ocupacao_diaria: {len(divergencias)}")
+
+    sys.exit(1 if (excesso and not args.sem_guarda) or divergencias else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,20 +1,433 @@
+import logging
+import os
+import random
 import sqlite3
+import string
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from functools import wraps
 from pathlib import Path
-from datetime import date
+from datetime import date, datetime, timedelta
+
+try:
+    import streamlit as st
+    from streamlit import runtime as st_runtime
+except ImportError:  # uso fora do Streamlit (scripts, benchmarks)
+    st = None
+    st_runtime = None
+
+DB_PATH = Path(os.environ.get("MTA_DB_PATH", "database.db"))
+
+log = logging.getLogger(__name__)
+
+# quantas conexões ociosas o pool mantém abertas por banco
+POOL_MAX_CONEXOES = int(os.environ.get("MTA_POOL_MAX_CONEXOES", "8"))
+
+# PRAGMAs do SQLite (configuráveis por variável de ambiente MTA_SQLITE_<NOME>).
+# journal_mode é persistente no arquivo e é aplicado no init_db; os demais
+# valem por conexão e são aplicados ao abrir cada conexão do pool.
+SQLITE_PRAGMAS = {
+    nome: os.environ.get(f"MTA_SQLITE_{nome.upper()}", padrao)
+    for nome, padrao in [
+        ("journal_mode", "WAL"),
+        ("synchronous", "NORMAL"),
+        ("cache_size", "-20000"),      # negativo = KiB (~20 MB)
+        ("mmap_size", "268435456"),    # 256 MB
+        ("temp_store", "MEMORY"),
+        ("busy_timeout", "5000"),      # ms esperando lock antes de SQLITE_BUSY
+    ]
+}
+
+# escritas que ainda assim encontram o banco ocupado são repetidas com backoff
+ESCRITA_MAX_TENTATIVAS = int(os.environ.get("MTA_ESCRITA_MAX_TENTATIVAS", "5"))
+ESCRITA_BACKOFF_BASE = float(os.environ.get("MTA_ESCRITA_BACKOFF_BASE", "0.05"))
+
+estatisticas_escrita = {"retentativas": 0, "falhas_lock": 0}
+_estatisticas_escrita_lock = threading.Lock()
+
+
+def _contar_escrita(chave):
+    with _estatisticas_escrita_lock:
+        estatisticas_escrita[chave] += 1
+
+
+def banco_ocupado(erro):
+    msg = str(erro).lower()
+    return isinstance(erro, sqlite3.OperationalError) and ("locked" in msg or "busy" in msg)
+
+
+def com_retentativa(func):
+    """Repete a escrita com backoff exponencial (com jitter) se o banco estiver ocupado."""
+
+    @wraps(func)
+    def wrapper(*args, **kwargs):
+        for tentativa in range(ESCRITA_MAX_TENTATIVAS):
+            try:
+                return func(*args, **kwargs)
+            except sqlite3.OperationalError as e:
+                if not banco_ocupado(e):
+                    raise
+                if tentativa == ESCRITA_MAX_TENTATIVAS - 1:
+                    _contar_escrita("falhas_lock")
+                    raise
+                _contar_escrita("retentativas")
+            # espera fora do except para liberar o traceback (e a conexão) antes
+            espera = ESCRITA_BACKOFF_BASE * (2 ** tentativa)
+            time.sleep(espera + random.uniform(0, espera))
+
+    return wrapper
+
+
+# =======================================================
+#              POOL DE CONEXÕES
+# =======================================================
+class ConexaoPool(sqlite3.Connection):
+    """Conexão SQLite cujo close() devolve a conexão ao pool em vez de fechá-la."""
+
+    pool = None
+
+    def close(self):
+        if self.pool is None:
+            super().close()
+        else:
+            self.pool.devolver(self)
+
+    def fechar(self):
+        super().close()
+
+
+class GerenciadorConexoes:
+    """Pool limitado de conexões reaproveitadas entre chamadas e reruns.
+
+    Cada conexão emprestada é de uso exclusivo da thread que a pegou até o
+    close(). Na devolução, transações pendentes são desfeitas (mesmo efeito de
+    fechar sem commit). Conexões além de max_conexoes são fechadas ao voltar.
+    """
+
+    def __init__(self, db_path, max_conexoes=POOL_MAX_CONEXOES):
+        self.db_path = db_path
+        self.max_conexoes = max_conexoes
+        self._ociosas = []
+        self._lock = threading.Lock()
+        self.rastreador = None
+        self.abertas = 0
+        self.reutilizadas = 0
+        self.descartadas = 0
+        self.fechadas = 0
+
+    def _abrir(self):
+        conn = sqlite3.connect(self.db_path, factory=ConexaoPool, check_same_thread=False)
+        conn.pool = self
+        for nome, valor in SQLITE_PRAGMAS.items():
+            if nome != "journal_mode":
+                conn.execute(f"PRAGMA {nome}={valor}")
+        with self._lock:
+            self.abertas += 1
+        return conn
+
+    @staticmethod
+    def _saudavel(conn):
+        try:
+            conn.execute("SELECT 1").fetchone()
+            return True
+        except sqlite3.Error:
+            return False
+
+    def emprestar(self):
+        while True:
+            with self._lock:
+                conn = self._ociosas.pop() if self._ociosas else None
+            if conn is None:
+                conn = self._abrir()
+                conn.set_trace_callback(self.rastreador)
+                return conn
+            if self._saudavel(conn):
+                with self._lock:
+                    self.reutilizadas += 1
+                conn.set_trace_callback(self.rastreador)
+                return conn
+            with self._lock:
+                self.descartadas += 1
+            try:
+                conn.fechar()
+            except sqlite3.Error:
+                pass
+
+    def devolver(self, conn):
+        try:
+            if conn.in_transaction:
+                conn.rollback()
+        except sqlite3.Error:
+            with self._lock:
+                self.descartadas += 1
+            return
+        with self._lock:
+            if len(self._ociosas) < self.max_conexoes and conn not in self._ociosas:
+                self._ociosas.append(conn)
+                return
+            self.fechadas += 1
+        conn.fechar()
+
+    def definir_rastreador(self, callback):
+        """Registra callback(sql) chamado para cada comando executado (None desliga)."""
+        self.rastreador = callback
+
+    def fechar_todas(self):
+        with self._lock:
+            ociosas, self._ociosas = self._ociosas, []
+        for conn in ociosas:
+            conn.fechar()
+
+    def estatisticas(self):
+        with self._lock:
+            return {
+                "abertas": self.abertas,
+                "reutilizadas": self.reutilizadas,
+                "descartadas": self.descartadas,
+                "fechadas": self.fechadas,
+                "ociosas": len(self._ociosas),
+            }
+
+
+def recurso_compartilhado(criar):
+    """No Streamlit, guarda o resultado de criar(...) no cache de recursos (compartilhado entre sessões).
+
+    Fora dele (scripts, benchmarks) devolve a função como está; ela mesma
+    garante uma instância por processo.
+    """
+    if st_runtime is not None and st_runtime.exists():
+        return st.cache_resource(show_spinner=False)(criar)
+    return criar
+
+
+_gerenciadores = {}
+_gerenciadores_lock = threading.Lock()
+
+
+@recurso_compartilhado
+def _criar_gerenciador(db_path):
+    with _gerenciadores_lock:
+        if db_path not in _gerenciadores:
+            _gerenciadores[db_path] = GerenciadorConexoes(db_path)
+        return _gerenciadores[db_path]
+
+
+def obter_gerenciador():
+    return _criar_gerenciador(str(DB_PATH))
+
+
+# instrumentação opcional (instrumentacao.py): recebe a função de empréstimo e
+# devolve a conexão; None = desligada (custo de um teste por conexão)
+_gancho_conexao = None
+
+
+def definir_gancho_conexao(gancho):
+    """Registra gancho(emprestar) -> conexão usado por get_connection (None desliga)."""
+    global _gancho_conexao
+    _gancho_conexao = gancho
 
-DB_PATH = Path("database.db")
 
 def get_connection():
-    return sqlite3.connect(DB_PATH)
+    if _gancho_conexao is None:
+        return obter_gerenciador().emprestar()
+    return _gancho_conexao(obter_gerenciador().emprestar)
+
+
+@contextmanager
+def conexao():
+    """Conexão do pool para leituras (ou escritas simples): devolvida ao sair, mesmo com erro.
+
+    O close() dentro do pool desfaz o que não teve commit, então uma exceção
+    no meio do bloco não deixa transação aberta numa conexão reaproveitada.
+    """
+    conn = get_connection()
+    try:
+        yield conn
+    finally:
+        conn.close()
+
+
+@contextmanager
+def transacao():
+    """Conexão dentro de BEGIN IMMEDIATE: commit ao sair, rollback em caso de erro.
+
+    O lock de escrita é pego já no início, então leituras feitas dentro da
+    transação (ex.: checar disponibilidade) não mudam até o commit.
+    """
+    conn = get_connection()
+    try:
+        conn.execute("BEGIN IMMEDIATE")
+        yield conn
+        conn.commit()
+    except BaseException:
+        if conn.in_transaction:
+            conn.rollback()
+        raise
+    finally:
+        conn.close()
+
+
+# =======================================================
+#              VERSÕES DAS TABELAS
+# =======================================================
+# Contador por tabela, incrementado a cada escrita feita por este módulo.
+# Resultados caros (ex.: contagens) ficam em cache até a versão mudar.
+_versoes_tabelas = {}
+_versoes_lock = threading.Lock()
+
+
+def versao_tabela(tabela):
+    return _versoes_tabelas.get(tabela, 0)
+
+
+def marcar_alteracao(*tabelas):
+    with _versoes_lock:
+        for tabela in tabelas:
+            _versoes_tabelas[tabela] = _versoes_tabelas.get(tabela, 0) + 1
+
+
+# =======================================================
+#              CACHE DE LEITURA (LRU)
+# =======================================================
+# Leituras frequentes (catálogo, clientes, contagens) ficam em cache com a
+# versão das tabelas de que dependem na chave: qualquer escrita feita por
+# este módulo muda a versão e a entrada antiga deixa de ser encontrada
+# (e sai por LRU). A versão é lida antes da consulta, então um resultado
+# nunca fica guardado sob uma versão mais nova que os dados que ele viu.
+# Escritas feitas por outro processo não mudam as versões deste.
+CACHE_MAX_ENTRADAS = int(os.environ.get("MTA_CACHE_MAX_ENTRADAS", "256"))
+
+
+class CacheLRU:
+    """Dicionário limitado com despejo do menos usado; seguro entre threads."""
+
+    def __init__(self, max_entradas=CACHE_MAX_ENTRADAS):
+        self.max_entradas = max_entradas
+        self._dados = OrderedDict()
+        self._lock = threading.Lock()
+        self.acertos = 0
+        self.falhas = 0
+        self.despejos = 0
+
+    def obter(self, chave):
+        """(True, valor) se a chave estiver em cache, senão (False, None)."""
+        with self._lock:
+            if chave in self._dados:
+                self._dados.move_to_end(chave)
+                self.acertos += 1
+                return True, self._dados[chave]
+            self.falhas += 1
+            return False, None
+
+    def guardar(self, chave, valor):
+        with self._lock:
+            self._dados[chave] = valor
+            self._dados.move_to_end(chave)
+            while len(self._dados) > self.max_entradas:
+                self._dados.popitem(last=False)
+                self.despejos += 1
+
+    def limpar(self):
+        with self._lock:
+            self._dados.clear()
+
+    def estatisticas(self):
+        with self._lock:
+            consultas = self.acertos + self.falhas
+            return {
+                "acertos": self.acertos,
+                "falhas": self.falhas,
+                "despejos": self.despejos,
+                "entradas": len(self._dados),
+                "taxa_acerto": self.acertos / consultas if consultas else 0.0,
+            }
+
+
+cache_leituras = CacheLRU()
+
+
+def em_cache(*tabelas):
+    """Guarda o resultado da função até uma das tabelas mudar de versão."""
+
+    def decorador(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            versoes = tuple(versao_tabela(t) for t in tabelas)
+            chave = (str(DB_PATH), func.__name__, args, tuple(sorted(kwargs.items())), versoes)
+            achou, valor = cache_leituras.obter(chave)
+            if not achou:
+                valor = func(*args, **kwargs)
+                cache_leituras.guardar(chave, valor)
+            # listas saem como cópia: quem chama pode ordenar/alterar à vontade
+            return list(valor) if isinstance(valor, list) else valor
+
+        return wrapper
+
+    return decorador
+
+
+def busca_incremental(*tabelas, casa, modo=None):
+    """Cache por prefixo para buscas `func(texto, limite)` digitadas aos poucos.
+
+    Cada texto buscado fica no cache de leitura (mesma chave de versões do
+    em_cache). Se um prefixo dele já foi buscado e voltou completo (menos
+    que `limite` resultados), o texto mais longo é filtrado em memória com
+    `casa(linha, texto)`, sem ir ao banco. `modo(texto)` separa textos cuja
+    busca tem outra regra (ex.: termos curtos), que não podem se aproveitar.
+    """
+
+    def decorador(func):
+        @wraps(func)
+        def wrapper(texto, limite):
+            texto = (texto or "").strip()
+            versoes = tuple(versao_tabela(t) for t in tabelas)
+            base = (str(DB_PATH), func.__name__, limite, versoes)
+            achou, valor = cache_leituras.obter(base + (texto,))
+            if achou:
+                return list(valor[0])
+            for fim in range(len(texto) - 1, 0, -1):
+                prefixo = texto[:fim]
+                if modo is not None and modo(prefixo) != modo(texto):
+                    break
+                achou, valor = cache_leituras.obter(base + (prefixo,))
+                if achou and valor[1]:
+                    linhas = [linha for linha in valor[0] if casa(linha, texto)]
+                    cache_leituras.guardar(base + (texto,), (linhas, True))
+                    with _estatisticas_prefixo_lock:
+                        estatisticas_prefixo["filtradas"] += 1
+                    return list(linhas)
+            linhas = func(texto, limite + 1)
+            completo = len(linhas) <= limite
+            cache_leituras.guardar(base + (texto,), (linhas[:limite], completo))
+            with _estatisticas_prefixo_lock:
+                estatisticas_prefixo["consultas"] += 1
+            return list(linhas[:limite])
+
+        return wrapper
+
+    return decorador
+
+
+# buscas por prefixo: quantas foram ao banco e quantas saíram de um prefixo já em cache
+estatisticas_prefixo = {"consultas": 0, "filtradas": 0}
+_estatisticas_prefixo_lock = threading.Lock()
+
+
+def estatisticas_cache():
+    return cache_leituras.estatisticas()
 
 
 # =======================================================
 #              INICIALIZAÇÃO + MIGRAÇÕES
 # =======================================================
-def init_db():
-    conn = get_connection()
-    cur = conn.cursor()
+# Cada migração recebe um cursor dentro da transação e leva o schema da
+# versão N-1 para N. A versão aplicada fica em PRAGMA user_version; para
+# mudar o schema, acrescente uma função ao final de MIGRACOES (nunca edite
+# uma migração já publicada).
 
+def _migracao_schema_inicial(cur):
     # -------------------------
     # TABELA ITENS
     # -------------------------
@@ -74,7 +487,7 @@ def init_db():
         )
     """)
 
-    # MIGRAÇÃO: garantir que colunas existam
+    # bancos antigos: garantir que colunas existam
     cur.execute("PRAGMA table_info(agendamento_itens)")
     cols = [c[1] for c in cur.fetchall()]
 
@@ -84,156 +497,1644 @@ def init_db():
     if "valor_total" not in cols:
         cur.execute("ALTER TABLE agendamento_itens ADD COLUMN valor_total REAL DEFAULT 0")
 
-    conn.commit()
-    conn.close()
 
+def _migracao_indices_agendamentos(cur):
+    # datas sempre em ISO (YYYY-MM-DD), para que as consultas comparem
+    # as colunas direto (sem date(...)) e usem os índices
+    cur.execute("""
+        UPDATE agendamentos
+        SET data_inicio = date(data_inicio), data_fim = date(data_fim)
+        WHERE (data_inicio != date(data_inicio) OR data_fim != date(data_fim))
+          AND date(data_inicio) IS NOT NULL
+          AND date(data_fim) IS NOT NULL
+    """)
+
+    # -------------------------
+    # ÍNDICES
+    # -------------------------
+    # disponibilidade por janela de datas / expiração (data_fim >= ? / data_fim < ?)
+    cur.execute("""
+        CREATE INDEX IF NOT EXISTS idx_agendamentos_periodo
+        ON agendamentos (data_fim, data_inicio, status)
+    """)
+    # listagem e relatórios ordenados por data de início
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_agendamentos_inicio ON agendamentos (data_inicio)")
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_agendamentos_status ON agendamentos (status, data_inicio)")
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_agendamentos_cliente ON agendamentos (cliente_id, data_inicio)")
+    # itens de um agendamento / agendamentos de um item (cobrem a quantidade)
+    cur.execute("""
+        CREATE INDEX IF NOT EXISTS idx_agendamento_itens_agendamento
+        ON agendamento_itens (agendamento_id, item_id, quantidade)
+    """)
+    cur.execute("""
+        CREATE INDEX IF NOT EXISTS idx_agendamento_itens_item
+        ON agendamento_itens (item_id, agendamento_id, quantidade)
+    """)
 
-init_db()
+
+def _migracao_ocupacao_diaria(cur):
+    # ocupação materializada: quantidade locada de cada item em cada dia
+    # (agendamentos não cancelados), mantida pelas funções de escrita
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS ocupacao_diaria (
+            item_id INTEGER NOT NULL,
+            dia TEXT NOT NULL,
+            quantidade INTEGER NOT NULL,
+            PRIMARY KEY (item_id, dia)
+        ) WITHOUT ROWID
+    """)
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_ocupacao_diaria_dia ON ocupacao_diaria (dia, item_id)")
+    reconstruir_ocupacao_diaria(cur.connection)
+
+
+def _migracao_manutencao(cur):
+    # última execução de cada rotina de manutenção (ex.: encerrar expirados),
+    # compartilhada entre processos
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS manutencao (
+            tarefa TEXT PRIMARY KEY,
+            executado_em TEXT NOT NULL,
+            linhas INTEGER NOT NULL DEFAULT 0,
+            duracao REAL NOT NULL DEFAULT 0
+        )
+    """)
+
+
+def _migracao_fatos_relatorio(cur):
+    # fatos diários pré-agregados para os relatórios (dia = data_inicio do
+    # agendamento), mantidos por triggers em qualquer escrita
+    for tabela, chave in (("fatos_item_dia", "item_id"), ("fatos_cliente_dia", "cliente_id")):
+        cur.execute(f"""
+            CREATE TABLE IF NOT EXISTS {tabela} (
+                dia TEXT NOT NULL,
+                {chave} INTEGER NOT NULL,
+                receita REAL NOT NULL,
+                quantidade INTEGER NOT NULL,
+                agendamentos INTEGER NOT NULL,
+                PRIMARY KEY (dia, {chave})
+            ) WITHOUT ROWID
+        """)
+    for nome, corpo in _gatilhos_fatos().items():
+        cur.execute(f"CREATE TRIGGER IF NOT EXISTS {nome} {corpo}")
+    reconstruir_fatos_relatorio(cur.connection)
+
+
+def _migracao_busca_itens(cur):
+    # índice de busca (FTS5, trigramas) sobre nome e descrição dos itens;
+    # rowid = itens.id, mantido pelas funções de CRUD de itens. Num SQLite
+    # sem FTS5 ou sem o tokenizador trigram (antes do 3.34) o índice não é
+    # criado e a busca usa LIKE no nome e na descrição (ver _consulta_busca)
+    if not _fts5_trigram(cur.connection):
+        return
+    cur.execute("""
+        CREATE VIRTUAL TABLE IF NOT EXISTS itens_busca
+        USING fts5(nome, descricao, tokenize='trigram')
+    """)
+    reconstruir_busca_itens(cur.connection)
+
+
+def _migracao_indice_nome_itens(cur):
+    # catálogo ordenado/paginado por nome sem diferenciar maiúsculas
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_itens_nome_nocase ON itens (nome COLLATE NOCASE, id)")
+
+
+def _migracao_nome_unico_itens(cur):
+    # nome do item único sem diferenciar maiúsculas nem espaços nas pontas,
+    # garantido pelo banco (índice único de expressão). Colisões já existentes
+    # ficam com o item mais antigo; os demais recebem o sufixo " (#id)" (ou
+    # " (#id-2)", ... se esse nome também já existir). Cada renomeação vai para
+    # o log e para itens_renomeados, exibida para revisão na página de itens
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS itens_renomeados (
+            item_id INTEGER NOT NULL,
+            nome_anterior TEXT NOT NULL,
+            nome_novo TEXT NOT NULL,
+            renomeado_em TEXT NOT NULL
+        )
+    """)
+    colisoes = cur.execute("""
+        SELECT id, nome FROM (
+            SELECT id, nome, ROW_NUMBER() OVER (PARTITION BY trim(nome) COLLATE NOCASE ORDER BY id) AS n
+            FROM itens
+        )
+        WHERE n > 1
+    """).fetchall()
+    for item_id, nome in colisoes:
+        novo, n = f"{nome.strip()} (#{item_id})", 1
+        while cur.execute("SELECT 1 FROM itens WHERE trim(nome) = trim(?) COLLATE NOCASE", (novo,)).fetchone():
+            n += 1
+            novo = f"{nome.strip()} (#{item_id}-{n})"
+        log.warning("Item %s renomeado de %r para %r: nome repetido de outro item", item_id, nome, novo)
+        cur.execute("UPDATE itens SET nome=? WHERE id=?", (novo, item_id))
+        cur.execute("""
+            INSERT INTO itens_renomeados (item_id, nome_anterior, nome_novo, renomeado_em)
+            VALUES (?, ?, ?, datetime('now'))
+        """, (item_id, nome, novo))
+        _indexar_item(cur.connection, item_id)
+    cur.execute("CREATE UNIQUE INDEX IF NOT EXISTS idx_itens_nome_unico ON itens (trim(nome) COLLATE NOCASE)")
+
+
+def _migracao_normalizar_cpf(cur):
+    # CPF guardado só com dígitos (o UNIQUE passa a valer para o número, não
+    # para a formatação digitada). Reescreve os CPFs já cadastrados e não
+    # guarda a forma digitada: não há como desfazer. Um CPF que, normalizado,
+    # já pertence a outro cliente fica como está, vai para o log e para
+    # cpfs_duplicados, exibida para revisão na página de clientes
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS cpfs_duplicados (
+            cliente_id INTEGER NOT NULL,
+            cpf TEXT NOT NULL,
+            cliente_existente_id INTEGER NOT NULL,
+            registrado_em TEXT NOT NULL
+        )
+    """)
+    formatados = cur.execute("SELECT id, cpf FROM clientes WHERE cpf GLOB '*[^0-9]*' ORDER BY id").fetchall()
+    for cliente_id, cpf in formatados:
+        normalizado = normalizar_cpf(cpf)
+        existente = cur.execute("SELECT id FROM clientes WHERE cpf = ?", (normalizado,)).fetchone()
+        if existente:
+            log.warning("CPF %r do cliente %s não normalizado: %s já é do cliente %s",
+                        cpf, cliente_id, normalizado, existente[0])
+            cur.execute("""
+                INSERT INTO cpfs_duplicados (cliente_id, cpf, cliente_existente_id, registrado_em)
+                VALUES (?, ?, ?, datetime('now'))
+            """, (cliente_id, cpf, existente[0]))
+        else:
+            cur.execute("UPDATE clientes SET cpf = ? WHERE id = ?", (normalizado, cliente_id))
+
+
+def _migracao_busca_clientes(cur):
+    # busca por prefixo (sem diferenciar maiúsculas) em nome completo,
+    # sobrenome e e-mail; o CPF usa o índice do UNIQUE
+    cur.execute(f"CREATE INDEX IF NOT EXISTS idx_clientes_nome_completo ON clientes (({_NOME_COMPLETO}) COLLATE NOCASE, id)")
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_clientes_sobrenome ON clientes (sobrenome COLLATE NOCASE)")
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_clientes_email ON clientes (email COLLATE NOCASE)")
+
+
+def _migracao_alteracoes_fatos(cur):
+    # dias dos fatos alterados, com um número de sequência: a base em memória
+    # do relatorios.py relê só os dias com seq maior que a última leitura.
+    # Uma linha por dia (a mais recente), então a tabela não cresce com as escritas
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS fatos_dias_alterados (
+            dia TEXT PRIMARY KEY,
+            seq INTEGER NOT NULL
+        ) WITHOUT ROWID
+    """)
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_fatos_dias_alterados_seq ON fatos_dias_alterados (seq)")
+    for nome, corpo in _gatilhos_alteracoes_fatos().items():
+        cur.execute(f"CREATE TRIGGER IF NOT EXISTS {nome} {corpo}")
+
+
+MIGRACOES = [
+    _migracao_schema_inicial,
+    _migracao_indices_agendamentos,
+    _migracao_ocupacao_diaria,
+    _migracao_manutencao,
+    _migracao_fatos_relatorio,
+    _migracao_busca_itens,
+    _migracao_indice_nome_itens,
+    _migracao_nome_unico_itens,
+    _migracao_normalizar_cpf,
+    _migracao_busca_clientes,
+    _migracao_alteracoes_fatos,
+]
+
+_bancos_migrados = set()
+_migracao_lock = threading.Lock()
+
+
+def versao_schema():
+    with conexao() as conn:
+        versao = conn.execute("PRAGMA user_version").fetchone()[0]
+    return versao
+
+
+def init_db():
+    """Aplica as migrações pendentes; roda no máximo uma vez por processo e banco."""
+    chave = str(DB_PATH)
+    if chave in _bancos_migrados:
+        return
+
+    with _migracao_lock:
+        if chave in _bancos_migrados:
+            return
+
+        with conexao() as conn:
+            cur = conn.cursor()
+
+            # WAL: leitores não bloqueiam o escritor (várias sessões simultâneas)
+            cur.execute(f"PRAGMA journal_mode={SQLITE_PRAGMAS['journal_mode']}")
+
+            if cur.execute("PRAGMA user_version").fetchone()[0] < len(MIGRACOES):
+                # BEGIN IMMEDIATE: outro processo migrando ao mesmo tempo espera aqui
+                cur.execute("BEGIN IMMEDIATE")
+                try:
+                    versao = cur.execute("PRAGMA user_version").fetchone()[0]
+                    for migracao in MIGRACOES[versao:]:
+                        migracao(cur)
+                    cur.execute(f"PRAGMA user_version = {len(MIGRACOES)}")
+                    conn.commit()
+                except Exception:
+                    conn.rollback()
+                    raise
+
+        _bancos_migrados.add(chave)
 
 
 # =======================================================
 #     ROTINA AUTOMÁTICA – ENCERRAR AGENDAMENTOS
 # =======================================================
-def encerrar_agendamentos_expirados():
-    hoje = date.today().isoformat()
-    conn = get_connection()
-    cur = conn.cursor()
-    cur.execute("""
+# a expiração é por data, então basta varrer quando o dia muda; o intervalo
+# (segundos) força uma varredura extra se o processo ficar muito tempo no ar
+INTERVALO_VARREDURA_EXPIRADOS = float(os.environ.get("MTA_INTERVALO_VARREDURA_EXPIRADOS", "86400"))
+TAREFA_EXPIRADOS = "encerrar_expirados"
+
+estatisticas_varredura = {"execucoes": 0, "linhas": 0, "ultima_linhas": 0, "ultima_duracao": 0.0}
+_estatisticas_varredura_lock = threading.Lock()
+
+_agendador_varredura = None
+_agendador_varredura_lock = threading.Lock()
+
+
+def _encerrar_expirados(conn, hoje):
+    # Encerrado continua contando na ocupação: ocupacao_diaria não muda
+    cur = conn.execute("""
         UPDATE agendamentos
         SET status = 'Encerrado'
-        WHERE date(data_fim) < date(?)
+        WHERE data_fim < ?
           AND status NOT IN ('Cancelado', 'Encerrado')
     """, (hoje,))
-    conn.commit()
-    conn.close()
+    return cur.rowcount
+
+
+def _varredura_pendente(executado_em, agora):
+    if executado_em is None:
+        return True
+    ultima = datetime.fromisoformat(executado_em)
+    return ultima.date() < agora.date() or (agora - ultima).total_seconds() >= INTERVALO_VARREDURA_EXPIRADOS
+
+
+def ultima_varredura_expirados():
+    """(executado_em, linhas, duracao) da última varredura registrada, ou None."""
+    with conexao() as conn:
+        row = conn.execute(
+            "SELECT executado_em, linhas, duracao FROM manutencao WHERE tarefa=?", (TAREFA_EXPIRADOS,)
+        ).fetchone()
+    return row
+
+
+@com_retentativa
+def varrer_expirados(forcar=False):
+    """Encerra agendamentos expirados se a varredura estiver pendente.
+
+    Retorna quantos agendamentos foram encerrados, ou None se ainda não era hora.
+    """
+    agora = datetime.now()
+    ultima = ultima_varredura_expirados()
+    if not forcar and not _varredura_pendente(ultima and ultima[0], agora):
+        return None  # caminho comum: só uma leitura, sem lock de escrita
+
+    t0 = time.perf_counter()
+    with transacao() as conn:
+        # outro processo pode ter varrido entre a leitura e o BEGIN IMMEDIATE
+        row = conn.execute("SELECT executado_em FROM manutencao WHERE tarefa=?", (TAREFA_EXPIRADOS,)).fetchone()
+        if not forcar and not _varredura_pendente(row and row[0], agora):
+            return None
+        linhas = _encerrar_expirados(conn, agora.date().isoformat())
+        duracao = time.perf_counter() - t0
+        conn.execute("""
+            INSERT INTO manutencao (tarefa, executado_em, linhas, duracao) VALUES (?, ?, ?, ?)
+            ON CONFLICT (tarefa) DO UPDATE
+            SET executado_em = excluded.executado_em, linhas = excluded.linhas, duracao = excluded.duracao
+        """, (TAREFA_EXPIRADOS, agora.isoformat(timespec="seconds"), linhas, duracao))
+
+    with _estatisticas_varredura_lock:
+        estatisticas_varredura["execucoes"] += 1
+        estatisticas_varredura["linhas"] += linhas
+        estatisticas_varredura["ultima_linhas"] = linhas
+        estatisticas_varredura["ultima_duracao"] = duracao
+    if linhas:
+        marcar_alteracao("agendamentos")
+    return linhas
+
+
+def encerrar_agendamentos_expirados():
+    """Varredura imediata, ignorando o intervalo. Retorna quantos foram encerrados."""
+    return varrer_expirados(forcar=True)
+
+
+def _laco_varredura(parar):
+    while True:
+        try:
+            varrer_expirados()
+        except sqlite3.Error:
+            pass  # banco ocupado/indisponível: tenta de novo no próximo ciclo
+        agora = datetime.now()
+        virada = datetime.combine(agora.date() + timedelta(days=1), datetime.min.time())
+        espera = min(INTERVALO_VARREDURA_EXPIRADOS, (virada - agora).total_seconds() + 1)
+        if parar.wait(max(espera, 1)):
+            return
+
+
+def iniciar_varredura_expirados():
+    """Sobe, uma vez por processo, a thread que encerra agendamentos expirados.
+
+    A varredura sai do caminho de renderização das páginas: roda na virada
+    do dia (ou a cada INTERVALO_VARREDURA_EXPIRADOS) e registra em manutencao.
+    """
+    global _agendador_varredura
+    with _agendador_varredura_lock:
+        if _agendador_varredura is None or not _agendador_varredura.is_alive():
+            parar = threading.Event()
+            _agendador_varredura = threading.Thread(
+                target=_laco_varredura, args=(parar,), name="varredura-expirados", daemon=True
+            )
+            _agendador_varredura.parar = parar
+            _agendador_varredura.start()
+        return _agendador_varredura
+
+
+def parar_varredura_expirados():
+    global _agendador_varredura
+    with _agendador_varredura_lock:
+        if _agendador_varredura is not None:
+            _agendador_varredura.parar.set()
+            _agendador_varredura.join()
+            _agendador_varredura = None
 
 
 # =======================================================
 #                 CLIENTES
 # =======================================================
+# ao menos 18 anos (vale para o formulário e para a importação de CSV)
+IDADE_MINIMA_DIAS = 6575
+
+# expressão do índice idx_clientes_nome_completo (as consultas precisam
+# repeti-la igual para que o índice seja usado)
+_NOME_COMPLETO = "nome || ' ' || sobrenome"
+
+
+def normalizar_cpf(cpf):
+    """CPF só com dígitos (como é gravado)."""
+    return "".join(c for c in cpf if c in "0123456789")
+
+
+@em_cache("clientes")
 def listar_clientes():
-    conn = get_connection()
-    cur = conn.cursor()
-    cur.execute("""
-        SELECT id, nome, sobrenome, email, telefone, cpf
-        FROM clientes
-        ORDER BY nome ASC
-    """)
-    rows = cur.fetchall()
-    conn.close()
+    with conexao() as conn:
+        cur = conn.cursor()
+        cur.execute("""
+            SELECT id, nome, sobrenome, email, telefone, cpf
+            FROM clientes
+            ORDER BY nome ASC
+        """)
+        rows = cur.fetchall()
     return rows
 
 
+def _condicao_prefixo(expr, prefixo):
+    """`expr` começa com `prefixo` (sem diferenciar maiúsculas), como faixa de um índice NOCASE."""
+    # U+10FFFF é maior que qualquer continuação do prefixo na ordem NOCASE
+    return f"({expr} >= ? COLLATE NOCASE AND {expr} < ? COLLATE NOCASE)", [prefixo, prefixo + "\U0010ffff"]
+
+
+def _filtro_busca_clientes(busca):
+    """Condição de prefixo em nome completo, sobrenome, e-mail ou CPF (cada uma no seu índice).
+
+    Buscas curtas (menos de MIN_CARACTERES_BUSCA) olham só o nome completo,
+    cuja faixa já sai do índice na ordem da listagem; as demais juntam os
+    quatro índices (MULTI-INDEX OR) e ordenam só os encontrados.
+    """
+    if not busca or not busca.strip():
+        return [], []
+    busca = busca.strip()
+    if len(busca) < MIN_CARACTERES_BUSCA:
+        condicao, params = _condicao_prefixo(f"({_NOME_COMPLETO})", busca)
+        return [condicao], params
+    termos, params = [], []
+    for expr in (f"({_NOME_COMPLETO})", "sobrenome", "email"):
+        condicao, valores = _condicao_prefixo(expr, busca)
+        termos.append(condicao)
+        params.extend(valores)
+    # CPF: só quando a busca tem dígitos e nenhuma letra ("123.456" casa 123456...)
+    digitos = normalizar_cpf(busca)
+    if digitos and not any(c.isalpha() for c in busca):
+        termos.append("(cpf >= ? AND cpf < ?)")
+        params.extend([digitos, digitos + ":"])  # ':' vem logo depois de '9'
+    return [f"({' OR '.join(termos)})"], params
+
+
+def listar_clientes_paginado(busca=None, limite=20, cursor=None):
+    """Uma página de clientes em ordem de nome completo, filtrada por prefixo.
+
+    busca: prefixo do nome completo, do sobrenome, do e-mail ou do CPF.
+    cursor: (nome completo, id) do último cliente da página anterior.
+    Retorna [(id, nome, sobrenome, email, telefone, cpf)], como listar_clientes.
+    """
+    condicoes, params = _filtro_busca_clientes(busca)
+    if cursor is not None:
+        # (nome completo, id) > cursor, na forma que o índice consegue buscar.
+        # Na busca ampla (MULTI-INDEX OR) o "+" tira o cursor do índice: senão o
+        # planejador varre o nome completo a partir do cursor filtrando o resto
+        nome = f"({_NOME_COMPLETO})"
+        if busca and len(busca.strip()) >= MIN_CARACTERES_BUSCA:
+            nome = f"+{nome}"
+        condicoes.append(f"{nome} >= ? COLLATE NOCASE AND ({nome} > ? COLLATE NOCASE OR id > ?)")
+        params.extend([cursor[0], cursor[0], cursor[1]])
+    filtro_sql = f"WHERE {' AND '.join(condicoes)}" if condicoes else ""
+
+    with conexao() as conn:
+        rows = conn.execute(f"""
+            SELECT id, nome, sobrenome, email, telefone, cpf
+            FROM clientes
+            {filtro_sql}
+            ORDER BY ({_NOME_COMPLETO}) COLLATE NOCASE, id
+            LIMIT ?
+        """, params + [limite]).fetchall()
+    return rows
+
+
+@em_cache("clientes")
+def contar_clientes(busca=None):
+    condicoes, params = _filtro_busca_clientes(busca)
+    filtro_sql = f"WHERE {' AND '.join(condicoes)}" if condicoes else ""
+    with conexao() as conn:
+        total = conn.execute(f"SELECT COUNT(*) FROM clientes {filtro_sql}", params).fetchone()[0]
+    return total
+
+
+def _cliente_casa_busca(cliente, busca):
+    """Mesma regra de _filtro_busca_clientes, em memória (para busca_incremental)."""
+    _, nome, sobrenome, email, _, cpf = cliente
+    prefixo = busca.translate(_MINUSCULAS_ASCII)
+    curta = len(busca) < MIN_CARACTERES_BUSCA
+    campos = [f"{nome} {sobrenome}"] if curta else [f"{nome} {sobrenome}", sobrenome, email]
+    if any(campo.translate(_MINUSCULAS_ASCII).startswith(prefixo) for campo in campos):
+        return True
+    if curta:
+        return False
+    digitos = normalizar_cpf(busca)
+    return bool(digitos) and not any(c.isalpha() for c in busca) and cpf.startswith(digitos)
+
+
+@busca_incremental("clientes", casa=_cliente_casa_busca, modo=lambda busca: len(busca) >= MIN_CARACTERES_BUSCA)
+def opcoes_clientes(busca, limite):
+    """Até `limite` clientes para um seletor com busca (ver listar_clientes_paginado)."""
+    return listar_clientes_paginado(busca, limite=limite)
+
+
+def cpfs_duplicados():
+    """[(cliente_id, cpf, cliente_existente_id, registrado_em)] dos CPFs que não puderam ser normalizados."""
+    with conexao() as conn:
+        rows = conn.execute("""
+            SELECT cliente_id, cpf, cliente_existente_id, registrado_em
+            FROM cpfs_duplicados
+            ORDER BY cliente_id
+        """).fetchall()
+    return rows
+
+
+def obter_cliente(cliente_id):
+    with conexao() as conn:
+        row = conn.execute("""
+            SELECT id, nome, sobrenome, data_nascimento, email, telefone, cpf
+            FROM clientes WHERE id=?
+        """, (cliente_id,)).fetchone()
+    return row
+
+
+@com_retentativa
+def inserir_cliente(nome, sobrenome, data_nascimento, email, telefone, cpf):
+    cpf = normalizar_cpf(cpf)
+    conn = get_connection()
+    try:
+        cur = conn.execute("""
+            INSERT INTO clientes (nome, sobrenome, data_nascimento, email, telefone, cpf)
+            VALUES (?, ?, ?, ?, ?, ?)
+        """, (nome, sobrenome, data_nascimento, email, telefone, cpf))
+        conn.commit()
+    finally:
+        conn.close()
+    marcar_alteracao("clientes")
+    return cur.lastrowid
+
+
+def _valores_existentes(conn, consulta, valores):
+    """Valores da lista já presentes no banco; `consulta` tem um {marcadores} para o IN."""
+    existentes = set()
+    for i in range(0, len(valores), MAX_PARAMS_IN):
+        lote = valores[i:i + MAX_PARAMS_IN]
+        existentes.update(r[0] for r in conn.execute(consulta.format(marcadores=",".join("?" * len(lote))), lote))
+    return existentes
+
+
+@com_retentativa
+def inserir_clientes_lote(clientes):
+    """Cadastra [(nome, sobrenome, data_nascimento, email, telefone, cpf)] numa transação.
+
+    CPFs já cadastrados não são inseridos; retorna as posições deles em
+    `clientes`. Repetições dentro da própria lista devem ser filtradas antes.
+    """
+    with transacao() as conn:
+        existentes = _valores_existentes(
+            conn, "SELECT cpf FROM clientes WHERE cpf IN ({marcadores})", [c[5] for c in clientes]
+        )
+        duplicados = [i for i, c in enumerate(clientes) if c[5] in existentes]
+        conn.executemany("""
+            INSERT INTO clientes (nome, sobrenome, data_nascimento, email, telefone, cpf)
+            VALUES (?, ?, ?, ?, ?, ?)
+        """, [c for c in clientes if c[5] not in existentes])
+    marcar_alteracao("clientes")
+    return duplicados
+
+
+@com_retentativa
+def atualizar_cliente(cliente_id, nome, sobrenome, data_nascimento, email, telefone, cpf):
+    cpf = normalizar_cpf(cpf)
+    conn = get_connection()
+    try:
+        conn.execute("""
+            UPDATE clientes
+            SET nome=?, sobrenome=?, data_nascimento=?, email=?, telefone=?, cpf=?
+            WHERE id=?
+        """, (nome, sobrenome, data_nascimento, email, telefone, cpf, cliente_id))
+        conn.commit()
+    finally:
+        conn.close()
+    marcar_alteracao("clientes")
+
+
+@com_retentativa
+def excluir_cliente(cliente_id):
+    conn = get_connection()
+    try:
+        conn.execute("DELETE FROM clientes WHERE id=?", (cliente_id,))
+        conn.commit()
+    finally:
+        conn.close()
+    marcar_alteracao("clientes")
+
+
 # =======================================================
 #                 ITENS CRUD
 # =======================================================
+@em_cache("itens")
 def listar_itens():
-    conn = get_connection()
-    cur = conn.cursor()
-    cur.execute("SELECT id, nome, descricao, quantidade_total FROM itens")
-    rows = cur.fetchall()
-    conn.close()
+    with conexao() as conn:
+        cur = conn.cursor()
+        cur.execute("SELECT id, nome, descricao, quantidade_total FROM itens")
+        rows = cur.fetchall()
     return rows
 
 
-def nome_item_existe(nome):
-    conn = get_connection()
-    cur = conn.cursor()
-    cur.execute("SELECT COUNT(*) FROM itens WHERE nome = ?", (nome,))
-    existe = cur.fetchone()[0] > 0
-    conn.close()
-    return existe
+def _filtro_prefixo_nome(filtro):
+    """Condição de prefixo do nome (sem diferenciar maiúsculas) como faixa do índice NOCASE."""
+    if not filtro or not filtro.strip():
+        return [], []
+    condicao, params = _condicao_prefixo("nome", filtro.strip())
+    return [condicao], params
+
+
+def listar_itens_paginado(filtro=None, ordem="nome", limite=20, cursor=None):
+    """Uma página do catálogo, ordenada por nome (sem diferenciar maiúsculas) no índice.
+
+    filtro: prefixo do nome (opcional). ordem: "nome" ou "nome_desc".
+    cursor: (nome, id) do último item da página anterior; None para a primeira.
+    Retorna [(id, nome, descricao, quantidade_total)].
+    """
+    if ordem not in ("nome", "nome_desc"):
+        raise ValueError(f"ordem desconhecida: {ordem}")
+    condicoes, params = _filtro_prefixo_nome(filtro)
+    maior, direcao = (">", "ASC") if ordem == "nome" else ("<", "DESC")
+    if cursor is not None:
+        # equivale a (nome, id) > cursor, escrito de forma que o índice faça a busca
+        condicoes.append(f"nome {maior}= ? COLLATE NOCASE AND (nome {maior} ? COLLATE NOCASE OR id {maior} ?)")
+        params.extend([cursor[0], cursor[0], cursor[1]])
+    filtro_sql = f"WHERE {' AND '.join(condicoes)}" if condicoes else ""
+
+    with conexao() as conn:
+        rows = conn.execute(f"""
+            SELECT id, nome, descricao, quantidade_total
+            FROM itens
+            {filtro_sql}
+            ORDER BY nome COLLATE NOCASE {direcao}, id {direcao}
+            LIMIT ?
+        """, params + [limite]).fetchall()
+    return rows
+
+
+@em_cache("itens")
+def contar_itens(filtro=None):
+    condicoes, params = _filtro_prefixo_nome(filtro)
+    filtro_sql = f"WHERE {' AND '.join(condicoes)}" if condicoes else ""
+    with conexao() as conn:
+        total = conn.execute(f"SELECT COUNT(*) FROM itens {filtro_sql}", params).fetchone()[0]
+    return total
+
+
+def _item_casa_busca(item, texto):
+    """Mesma regra de _consulta_busca, em memória (para busca_incremental)."""
+    _, nome, descricao, _ = item
+    if len(texto) < MIN_CARACTERES_BUSCA or not busca_fts_ativa():
+        # LIKE: só A-Z/a-z são iguais sem diferenciar maiúsculas
+        campos, termo = (nome, descricao or ""), texto.translate(_MINUSCULAS_ASCII)
+        return any(termo in campo.translate(_MINUSCULAS_ASCII) for campo in campos)
+    return texto.lower() in nome.lower() or texto.lower() in (descricao or "").lower()
+
 
+@busca_incremental("itens", casa=_item_casa_busca, modo=lambda texto: len(texto) >= MIN_CARACTERES_BUSCA)
+def opcoes_itens(texto, limite):
+    """Até `limite` itens para um seletor com busca, pela mesma regra da página de Itens.
 
+    Sem texto, os primeiros por nome; com texto, buscar_itens (nome ou
+    descrição). Um texto filtrado de um mais curto já em cache mantém a
+    ordem de relevância do mais curto.
+    """
+    if not texto:
+        return listar_itens_paginado(limite=limite)
+    return buscar_itens(texto, limite)
+
+
+def obter_item(item_id):
+    with conexao() as conn:
+        row = conn.execute(
+            "SELECT id, nome, descricao, quantidade_total FROM itens WHERE id=?", (item_id,)
+        ).fetchone()
+    return row
+
+
+def obter_itens(item_ids):
+    """{id: (id, nome, descricao, quantidade_total)} dos itens pedidos (os que existirem)."""
+    ids = list(item_ids)
+    with conexao() as conn:
+        itens = {}
+        for i in range(0, len(ids), MAX_PARAMS_IN):
+            lote = ids[i:i + MAX_PARAMS_IN]
+            for row in conn.execute(
+                f"SELECT id, nome, descricao, quantidade_total FROM itens WHERE id IN ({','.join('?' * len(lote))})", lote
+            ):
+                itens[row[0]] = row
+    return itens
+
+
+class NomeItemDuplicado(Exception):
+    """Já existe item com esse nome (sem diferenciar maiúsculas nem espaços nas pontas)."""
+
+    def __init__(self, nome):
+        self.nome = nome
+        super().__init__(f"Já existe um item com o nome {nome!r}")
+
+
+class ItemComAgendamentos(Exception):
+    """O item aparece em agendamentos (de qualquer status) e não pode ser excluído."""
+
+    def __init__(self, item_id, agendamentos):
+        self.item_id = item_id
+        self.agendamentos = agendamentos
+        super().__init__(f"O item {item_id} aparece em {agendamentos} agendamento(s)")
+
+
+def _nome_duplicado(erro):
+    # idx_itens_nome_unico, ou o UNIQUE original da coluna (itens.nome)
+    return "UNIQUE constraint failed" in str(erro)
+
+
+def nome_item_existe(nome, ignorar_id=None):
+    """Há outro item com o mesmo nome? Uma busca no índice único de nomes."""
+    with conexao() as conn:
+        row = conn.execute(
+            "SELECT id FROM itens WHERE trim(nome) = trim(?) COLLATE NOCASE AND id IS NOT ?", (nome, ignorar_id)
+        ).fetchone()
+    return row is not None
+
+
+def itens_renomeados():
+    """[(item_id, nome_anterior, nome_novo, renomeado_em)] das colisões de nome resolvidas na migração."""
+    with conexao() as conn:
+        rows = conn.execute("""
+            SELECT item_id, nome_anterior, nome_novo, renomeado_em
+            FROM itens_renomeados
+            ORDER BY nome_novo
+        """).fetchall()
+    return rows
+
+
+@com_retentativa
 def inserir_item(nome, descricao, quantidade_total):
-    conn = get_connection()
-    conn.execute("""
-        INSERT INTO itens (nome, descricao, quantidade_total)
-        VALUES (?, ?, ?)
-    """, (nome, descricao, quantidade_total))
-    conn.commit()
-    conn.close()
+    """Cadastra o item e retorna o id; NomeItemDuplicado se o nome já estiver em uso."""
+    nome = nome.strip()
+    try:
+        with transacao() as conn:
+            cur = conn.execute("""
+                INSERT INTO itens (nome, descricao, quantidade_total)
+                VALUES (?, ?, ?)
+            """, (nome, descricao, quantidade_total))
+            _indexar_item(conn, cur.lastrowid)
+    except sqlite3.IntegrityError as e:
+        if _nome_duplicado(e):
+            raise NomeItemDuplicado(nome) from e
+        raise
+    marcar_alteracao("itens")
+    return cur.lastrowid
+
+
+# NOCASE só iguala A-Z/a-z; lower() do SQLite (sem ICU) faz o mesmo
+_MINUSCULAS_ASCII = str.maketrans(string.ascii_uppercase, string.ascii_lowercase)
+
+
+def chave_nome_item(nome):
+    """Nome como o índice único o compara: sem espaços nas pontas, A-Z em minúsculas."""
+    return nome.strip().translate(_MINUSCULAS_ASCII)
+
 
+@com_retentativa
+def inserir_itens_lote(itens):
+    """Cadastra [(nome, descricao, quantidade_total)] numa transação (executemany).
 
+    Nomes já cadastrados não são inseridos; retorna as posições deles em
+    `itens`. Repetições dentro da própria lista devem ser filtradas antes
+    (ver chave_nome_item).
+    """
+    chaves = [chave_nome_item(it[0]) for it in itens]
+    with transacao() as conn:
+        existentes = _valores_existentes(conn, """
+            SELECT lower(trim(nome)) FROM itens WHERE trim(nome) COLLATE NOCASE IN ({marcadores})
+        """, chaves)
+        duplicados = [i for i, chave in enumerate(chaves) if chave in existentes]
+        ultimo_id = conn.execute("SELECT COALESCE(MAX(id), 0) FROM itens").fetchone()[0]
+        conn.executemany("""
+            INSERT INTO itens (nome, descricao, quantidade_total)
+            VALUES (?, ?, ?)
+        """, [it for it, chave in zip(itens, chaves) if chave not in existentes])
+        indexar_itens_apos(conn, ultimo_id)
+    marcar_alteracao("itens")
+    return duplicados
+
+
+@com_retentativa
 def atualizar_item(item_id, nome, descricao, quantidade_total):
-    conn = get_connection()
-    conn.execute("""
-        UPDATE itens SET nome=?, descricao=?, quantidade_total=?
-        WHERE id=?
-    """, (nome, descricao, quantidade_total, item_id))
-    conn.commit()
-    conn.close()
+    """Atualiza o item; NomeItemDuplicado se o novo nome for de outro item."""
+    nome = nome.strip()
+    try:
+        with transacao() as conn:
+            conn.execute("""
+                UPDATE itens SET nome=?, descricao=?, quantidade_total=?
+                WHERE id=?
+            """, (nome, descricao, quantidade_total, item_id))
+            _indexar_item(conn, item_id)
+    except sqlite3.IntegrityError as e:
+        if _nome_duplicado(e):
+            raise NomeItemDuplicado(nome) from e
+        raise
+    marcar_alteracao("itens")
 
 
+@com_retentativa
 def excluir_item(item_id):
-    conn = get_connection()
-    conn.execute("DELETE FROM itens WHERE id=?", (item_id,))
-    conn.commit()
-    conn.close()
+    """Exclui o item; ItemComAgendamentos se algum agendamento ainda o usa.
+
+    Excluir nesse caso deixaria linhas de agendamento e de ocupacao_diaria
+    apontando para um item que não existe mais.
+    """
+    with transacao() as conn:
+        agendamentos = conn.execute(
+            "SELECT COUNT(DISTINCT agendamento_id) FROM agendamento_itens WHERE item_id=?", (item_id,)
+        ).fetchone()[0]
+        if agendamentos:
+            raise ItemComAgendamentos(item_id, agendamentos)
+        conn.execute("DELETE FROM itens WHERE id=?", (item_id,))
+        _indexar_item(conn, item_id)
+    marcar_alteracao("itens")
+
+
+# =======================================================
+#              BUSCA DE ITENS (FTS5 / TRIGRAMAS)
+# =======================================================
+# O tokenizador trigram casa qualquer trecho com 3+ caracteres do nome ou da
+# descrição (sem diferenciar maiúsculas). Termos mais curtos não formam
+# trigrama e caem num LIKE sobre nome e descrição (varre a tabela de itens),
+# assim como qualquer termo num SQLite sem FTS5/trigram (o índice não existe
+# nesse caso).
+MIN_CARACTERES_BUSCA = 3
+
+_suporte_fts5_trigram = None
+_busca_fts_por_banco = {}
+
+
+def _fts5_trigram(conn):
+    """Este SQLite tem FTS5 com o tokenizador trigram? (sonda numa tabela temporária)"""
+    global _suporte_fts5_trigram
+    if _suporte_fts5_trigram is None:
+        try:
+            conn.execute("CREATE VIRTUAL TABLE temp.sonda_fts5 USING fts5(x, tokenize='trigram')")
+            conn.execute("DROP TABLE temp.sonda_fts5")
+            _suporte_fts5_trigram = True
+        except sqlite3.OperationalError:
+            _suporte_fts5_trigram = False
+    return _suporte_fts5_trigram
+
+
+def busca_fts_ativa(conn=None):
+    """A busca de itens usa o índice itens_busca? (senão, LIKE no nome)
+
+    Passe `conn` dentro de uma transação (ex.: migrações). O resultado só
+    fica guardado depois que o banco foi migrado.
+    """
+    chave = str(DB_PATH)
+    if chave in _busca_fts_por_banco:
+        return _busca_fts_por_banco[chave]
+    if conn is None:
+        with conexao() as conn:
+            return busca_fts_ativa(conn)
+    ativa = _fts5_trigram(conn) and conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'itens_busca'"
+    ).fetchone() is not None
+    if chave in _bancos_migrados:
+        _busca_fts_por_banco[chave] = ativa
+    return ativa
+
+
+def _indexar_item(conn, item_id):
+    """Sincroniza a linha de itens_busca do item (some se o item não existir mais)."""
+    if not busca_fts_ativa(conn):
+        return
+    conn.execute("DELETE FROM itens_busca WHERE rowid = ?", (item_id,))
+    conn.execute("""
+        INSERT INTO itens_busca (rowid, nome, descricao)
+        SELECT id, nome, COALESCE(descricao, '') FROM itens WHERE id = ?
+    """, (item_id,))
+
+
+def indexar_itens_apos(conn, ultimo_id):
+    """Indexa os itens com id maior que `ultimo_id` (cadastro em lote)."""
+    if not busca_fts_ativa(conn):
+        return
+    conn.execute("""
+        INSERT INTO itens_busca (rowid, nome, descricao)
+        SELECT id, nome, COALESCE(descricao, '') FROM itens WHERE id > ?
+    """, (ultimo_id,))
+
+
+def reconstruir_busca_itens(conn=None):
+    """Recria o índice de busca a partir da tabela itens."""
+    if conn is None:
+        with transacao() as conn:
+            reconstruir_busca_itens(conn)
+        return
+    if not busca_fts_ativa(conn):
+        return
+    conn.execute("DELETE FROM itens_busca")
+    conn.execute("INSERT INTO itens_busca (rowid, nome, descricao) SELECT id, nome, COALESCE(descricao, '') FROM itens")
+
+
+def _consulta_busca(texto):
+    """(FROM/WHERE, ORDER BY, parâmetros) da busca de itens por nome ou descrição.
+
+    Com FTS5 e pelo menos MIN_CARACTERES_BUSCA caracteres, usa o índice
+    itens_busca, por relevância. Senão, LIKE '%texto%' em nome e descrição,
+    por nome: lê a tabela de itens inteira a cada busca.
+    """
+    texto = texto.strip()
+    if len(texto) >= MIN_CARACTERES_BUSCA and busca_fts_ativa():
+        # frase entre aspas: casa o trecho literal, com aspas internas escapadas
+        frase = '"' + texto.replace('"', '""') + '"'
+        # bm25 com peso maior para o nome que para a descrição
+        return """
+            FROM itens_busca b JOIN itens i ON i.id = b.rowid
+            WHERE itens_busca MATCH ?
+        """, "bm25(itens_busca, 10.0, 1.0), i.nome", [frase]
+    padrao = "%" + texto.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "%"
+    return """
+        FROM itens i
+        WHERE i.nome LIKE ? ESCAPE '\\' OR i.descricao LIKE ? ESCAPE '\\'
+    """, "i.nome", [padrao, padrao]
+
+
+def buscar_itens(texto, limite=20, deslocamento=0):
+    """Itens cujo nome ou descrição contém o texto, dos mais relevantes para os menos.
+
+    Retorna [(id, nome, descricao, quantidade_total)] da página pedida.
+    """
+    origem, ordem, params = _consulta_busca(texto)
+    with conexao() as conn:
+        rows = conn.execute(f"""
+            SELECT i.id, i.nome, i.descricao, i.quantidade_total
+            {origem}
+            ORDER BY {ordem}
+            LIMIT ? OFFSET ?
+        """, params + [limite, deslocamento]).fetchall()
+    return rows
+
+
+@em_cache("itens")
+def contar_busca_itens(texto):
+    origem, _, params = _consulta_busca(texto)
+    with conexao() as conn:
+        total = conn.execute(f"SELECT COUNT(*) {origem}", params).fetchone()[0]
+    return total
 
 
 # =======================================================
 #              AGENDAMENTOS — MULTI-ITENS
 # =======================================================
 
+@com_retentativa
 def inserir_agendamento_base(cliente_id, data_inicio, data_fim, valor_total):
-    conn = get_connection()
-    cur = conn.cursor()
-    cur.execute("""
-        INSERT INTO agendamentos (cliente_id, data_inicio, data_fim, valor_total, status, criado_em)
-        VALUES (?, ?, ?, ?, 'Em andamento', date('now'))
-    """, (cliente_id, data_inicio, data_fim, valor_total))
-    conn.commit()
-    new_id = cur.lastrowid
-    conn.close()
+    with conexao() as conn:
+        cur = conn.cursor()
+        cur.execute("""
+            INSERT INTO agendamentos (cliente_id, data_inicio, data_fim, valor_total, status, criado_em)
+            VALUES (?, ?, ?, ?, 'Em andamento', date('now'))
+        """, (cliente_id, data_inicio, data_fim, valor_total))
+        conn.commit()
+        new_id = cur.lastrowid
+    marcar_alteracao("agendamentos")
     return new_id
 
 
+@com_retentativa
 def inserir_item_agendamento(agendamento_id, item_id, quantidade, valor_unitario, valor_total):
-    conn = get_connection()
-    conn.execute("""
-        INSERT INTO agendamento_itens
-        (agendamento_id, item_id, quantidade, valor_unitario, valor_total)
-        VALUES (?, ?, ?, ?, ?)
-    """, (agendamento_id, item_id, quantidade, valor_unitario, valor_total))
-    conn.commit()
-    conn.close()
+    with transacao() as conn:
+        cur = conn.execute("""
+            INSERT INTO agendamento_itens
+            (agendamento_id, item_id, quantidade, valor_unitario, valor_total)
+            VALUES (?, ?, ?, ?, ?)
+        """, (agendamento_id, item_id, quantidade, valor_unitario, valor_total))
+        _ajustar_ocupacao(conn, agendamento_id, +1, linha_id=cur.lastrowid)
+    marcar_alteracao("agendamento_itens", "ocupacao_diaria")
 
 
+def obter_agendamento(agendamento_id):
+    """Cabeçalho (id, cliente_id, data_inicio, data_fim, valor_total, status) ou None."""
+    with conexao() as conn:
+        row = conn.execute(
+            "SELECT id, cliente_id, data_inicio, data_fim, valor_total, status FROM agendamentos WHERE id=?",
+            (agendamento_id,),
+        ).fetchone()
+    return row
+
+
+@com_retentativa
 def excluir_agendamento(agendamento_id):
-    conn = get_connection()
-    conn.execute("DELETE FROM agendamentos WHERE id=?", (agendamento_id,))
-    conn.execute("DELETE FROM agendamento_itens WHERE agendamento_id=?", (agendamento_id,))
-    conn.commit()
-    conn.close()
+    with transacao() as conn:
+        _ajustar_ocupacao(conn, agendamento_id, -1)
+        conn.execute("DELETE FROM agendamentos WHERE id=?", (agendamento_id,))
+        conn.execute("DELETE FROM agendamento_itens WHERE agendamento_id=?", (agendamento_id,))
+    marcar_alteracao("agendamentos", "agendamento_itens", "ocupacao_diaria")
 
 
+@com_retentativa
 def atualizar_status(agendamento_id, novo_status):
-    conn = get_connection()
-    conn.execute("""
-        UPDATE agendamentos SET status=? WHERE id=?
-    """, (novo_status, agendamento_id))
-    conn.commit()
-    conn.close()
+    """Muda o status; DisponibilidadeInsuficiente se reativar um cancelado sem estoque livre."""
+    with transacao() as conn:
+        row = conn.execute(
+            "SELECT status, data_inicio, data_fim FROM agendamentos WHERE id=?", (agendamento_id,)
+        ).fetchone()
+        # só cancelamento (ou sua reversão) muda a ocupação; Encerrado continua contando
+        muda_ocupacao = row is not None and (row[0] == "Cancelado") != (novo_status == "Cancelado")
+        if muda_ocupacao and row[0] == "Cancelado":
+            # reativar volta a ocupar estoque: mesma checagem da criação
+            itens = [
+                {"item_id": item_id, "quantidade": quantidade}
+                for item_id, quantidade in conn.execute(
+                    "SELECT item_id, quantidade FROM agendamento_itens WHERE agendamento_id=?", (agendamento_id,)
+                )
+            ]
+            _garantir_disponibilidade(conn, row[1], row[2], itens, ignorar_agendamento_id=agendamento_id)
+        if muda_ocupacao:
+            _ajustar_ocupacao(conn, agendamento_id, -1)
+        conn.execute("""
+            UPDATE agendamentos SET status=? WHERE id=?
+        """, (novo_status, agendamento_id))
+        if muda_ocupacao:
+            _ajustar_ocupacao(conn, agendamento_id, +1)
+    marcar_alteracao("agendamentos", "ocupacao_diaria")
+
+
+def _filtros_agendamentos(status=None, cliente_id=None, data_de=None, data_ate=None):
+    """Cláusulas WHERE (e parâmetros) dos filtros da listagem de agendamentos.
+
+    data_de/data_ate selecionam agendamentos cujo período cruza o intervalo.
+    """
+    condicoes, params = [], []
+    if status is not None:
+        condicoes.append("status = ?")
+        params.append(status)
+    if cliente_id is not None:
+        condicoes.append("cliente_id = ?")
+        params.append(cliente_id)
+    if data_de is not None:
+        condicoes.append("data_fim >= ?")
+        params.append(str(data_de)[:10])
+    if data_ate is not None:
+        condicoes.append("data_inicio <= ?")
+        params.append(str(data_ate)[:10])
+    return condicoes, params
+
+
+class DisponibilidadeInsuficiente(Exception):
+    """Algum item não tem quantidade livre suficiente no período pedido.
+
+    `conflitos` traz um dict por item em falta (ver conflitos_reserva).
+    """
+
+    def __init__(self, conflitos):
+        self.conflitos = conflitos
+        detalhes = "; ".join(
+            f"{c['nome']}: pedido {c['pedido']}, disponível {c['disponivel']}" for c in conflitos
+        )
+        super().__init__(f"Sem disponibilidade suficiente ({detalhes})")
+
+
+def conflitos_reserva(conn, inicio, fim, itens, ignorar_agendamento_id=None):
+    """Itens do pedido que não cabem no estoque do período.
+
+    Deve ser chamada dentro da transação de escrita (ver transacao()), para que
+    nenhuma outra sessão reserve as mesmas unidades entre a checagem e o commit.
+    Estoque e ocupação de todos os itens saem de duas consultas, não de uma por
+    item. Retorna [{"item_id", "nome", "total", "locadas", "pedido", "disponivel"}].
+    """
+    pedidos = {}
+    for it in itens:
+        pedidos[it["item_id"]] = pedidos.get(it["item_id"], 0) + int(it["quantidade"])
+
+    ids = list(pedidos)
+    estoque = {}
+    for i in range(0, len(ids), MAX_PARAMS_IN):
+        lote = ids[i:i + MAX_PARAMS_IN]
+        for item_id, nome, total in conn.execute(
+            f"SELECT id, nome, quantidade_total FROM itens WHERE id IN ({','.join('?' * len(lote))})", lote
+        ):
+            estoque[item_id] = (nome, total)
+    locadas = quantidades_locadas_no_periodo(ids, inicio, fim, ignorar_agendamento_id, conn=conn)
+
+    conflitos = []
+    for item_id, pedido in pedidos.items():
+        nome, total = estoque.get(item_id, (f"item {item_id}", 0))
+        disponivel = max(0, total - locadas[item_id])
+        if pedido > disponivel:
+            conflitos.append({
+                "item_id": item_id,
+                "nome": nome,
+                "total": total,
+                "locadas": locadas[item_id],
+                "pedido": pedido,
+                "disponivel": disponivel,
+            })
+    return conflitos
+
+
+def _garantir_disponibilidade(conn, inicio, fim, itens, ignorar_agendamento_id=None):
+    conflitos = conflitos_reserva(conn, inicio, fim, itens, ignorar_agendamento_id)
+    if conflitos:
+        raise DisponibilidadeInsuficiente(conflitos)
+
+
+def _linhas_itens(agendamento_id, itens):
+    return [
+        (agendamento_id, it["item_id"], int(it["quantidade"]), float(it["valor_unitario"]),
+         int(it["quantidade"]) * float(it["valor_unitario"]))
+        for it in itens
+    ]
+
+
+@com_retentativa
+def criar_agendamento(cliente_id, inicio, fim, itens):
+    """Cria o agendamento e seus itens numa única transação; retorna o id.
+
+    itens: [{"item_id", "quantidade", "valor_unitario"}, ...]. A disponibilidade
+    é conferida de novo sob BEGIN IMMEDIATE, então dois operadores não
+    conseguem reservar as mesmas unidades ao mesmo tempo.
+    """
+    with transacao() as conn:
+        _garantir_disponibilidade(conn, inicio, fim, itens)
+        linhas = _linhas_itens(None, itens)
+        valor_total = sum(linha[4] for linha in linhas)
+        cur = conn.execute("""
+            INSERT INTO agendamentos (cliente_id, data_inicio, data_fim, valor_total, status, criado_em)
+            VALUES (?, ?, ?, ?, 'Em andamento', date('now'))
+        """, (cliente_id, inicio, fim, valor_total))
+        agendamento_id = cur.lastrowid
+        conn.executemany("""
+            INSERT INTO agendamento_itens
+            (agendamento_id, item_id, quantidade, valor_unitario, valor_total)
+            VALUES (?, ?, ?, ?, ?)
+        """, [(agendamento_id,) + linha[1:] for linha in linhas])
+        _ajustar_ocupacao(conn, agendamento_id, +1)
+    marcar_alteracao("agendamentos", "agendamento_itens", "ocupacao_diaria")
+    return agendamento_id
+
+
+@com_retentativa
+def atualizar_agendamento(agendamento_id, cliente_id, inicio, fim, itens):
+    """Substitui cabeçalho e itens do agendamento numa única transação."""
+    with transacao() as conn:
+        _garantir_disponibilidade(conn, inicio, fim, itens, ignorar_agendamento_id=agendamento_id)
+        linhas = _linhas_itens(agendamento_id, itens)
+        _ajustar_ocupacao(conn, agendamento_id, -1)
+        conn.execute("""
+            UPDATE agendamentos
+            SET cliente_id=?, data_inicio=?, data_fim=?, valor_total=?
+            WHERE id=?
+        """, (cliente_id, inicio, fim, sum(linha[4] for linha in linhas), agendamento_id))
+        conn.execute("DELETE FROM agendamento_itens WHERE agendamento_id=?", (agendamento_id,))
+        conn.executemany("""
+            INSERT INTO agendamento_itens
+            (agendamento_id, item_id, quantidade, valor_unitario, valor_total)
+            VALUES (?, ?, ?, ?, ?)
+        """, linhas)
+        _ajustar_ocupacao(conn, agendamento_id, +1)
+    marcar_alteracao("agendamentos", "agendamento_itens", "ocupacao_diaria")
+
+
+def listar_agendamentos_completos(limite=None, apos=None, status=None, cliente_id=None,
+                                  data_de=None, data_ate=None):
+    """Agendamentos com seus itens, do início mais recente para o mais antigo.
+
+    Uma única consulta (cabeçalhos paginados + LEFT JOIN dos itens), agrupada
+    em memória. Retorna [{"agendamento": (...), "itens": [(...), ...]}].
+    Paginação por cursor: passe em `apos` o (data_inicio, id) do último
+    agendamento da página anterior. Os filtros são aplicados no SQL.
+    """
+    condicoes, params = _filtros_agendamentos(status, cliente_id, data_de, data_ate)
+    if apos is not None:
+        condicoes.append("(data_inicio, id) < (?, ?)")
+        params.extend(apos)
+    filtro = f"WHERE {' AND '.join(condicoes)}" if condicoes else ""
+    paginacao = ""
+    if limite is not None:
+        paginacao = "LIMIT ?"
+        params.append(limite)
+
+    with conexao() as conn:
+        cur = conn.cursor()
+        cur.execute(f"""
+            SELECT a.id AS agendamento_id,
+                   a.cliente_id,
+                   c.nome || ' ' || c.sobrenome AS cliente_nome,
+                   a.data_inicio,
+                   a.data_fim,
+                   a.valor_total,
+                   a.status,
+                   a.criado_em,
+                   ai.id, ai.item_id, i.nome, ai.quantidade, ai.valor_unitario, ai.valor_total
+            FROM (
+                SELECT * FROM agendamentos
+                {filtro}
+                ORDER BY data_inicio DESC, id DESC
+                {paginacao}
+            ) a
+            LEFT JOIN clientes c ON c.id = a.cliente_id
+            LEFT JOIN agendamento_itens ai ON ai.agendamento_id = a.id
+            LEFT JOIN itens i ON i.id = ai.item_id
+            ORDER BY a.data_inicio DESC, a.id DESC, ai.id
+        """, params)
+        rows = cur.fetchall()
+
+    result = []
+    for row in rows:
+        if not result or result[-1]["agendamento"][0] != row[0]:
+            result.append({"agendamento": row[:8], "itens": []})
+        if row[8] is not None:
+            result[-1]["itens"].append(row[8:])
+    return result
+
+
+def contar_agendamentos(status=None, cliente_id=None, data_de=None, data_ate=None):
+    """Total de agendamentos para os filtros; em cache até a próxima escrita."""
+    return _contar_agendamentos(
+        status, cliente_id, str(data_de)[:10] if data_de else None, str(data_ate)[:10] if data_ate else None
+    )
+
+
+@em_cache("agendamentos")
+def _contar_agendamentos(status, cliente_id, data_de, data_ate):
+    condicoes, params = _filtros_agendamentos(status, cliente_id, data_de, data_ate)
+    filtro = f"WHERE {' AND '.join(condicoes)}" if condicoes else ""
+    with conexao() as conn:
+        total = conn.execute(f"SELECT COUNT(*) FROM agendamentos {filtro}", params).fetchone()[0]
+    return total
 
 
 # =======================================================
 #              DISPONIBILIDADE DE ITENS
 # =======================================================
-def quantidade_locada_no_periodo(item_id, inicio, fim):
-    conn = get_connection()
-    cur = conn.cursor()
+def quantidade_locada_no_periodo(item_id, inicio, fim, ignorar_agendamento_id=None):
+    return quantidades_locadas_no_periodo([item_id], inicio, fim, ignorar_agendamento_id)[item_id]
+
+
+# limite seguro de parâmetros "?" por consulta no SQLite
+MAX_PARAMS_IN = 900
+
 
+def _eventos_por_item(item_ids, inicio, fim, ignorar_agendamento_id=None, conn=None):
+    """Eventos de ocupação (dia, delta) por item, ordenados, recortados à janela [inicio, fim].
+
+    Cada reserva gera +quantidade no primeiro dia e -quantidade no dia seguinte
+    ao último (data_fim é inclusiva). Em um mesmo dia as saídas vêm antes das
+    entradas, então reservas encostadas (uma termina dia 10, outra começa dia 11)
+    não se somam.
+    """
+    inicio, fim = str(inicio)[:10], str(fim)[:10]
     sql = """
-        SELECT SUM(ai.quantidade)
+        SELECT ai.item_id, a.data_inicio, a.data_fim, ai.quantidade
         FROM agendamento_itens ai
         JOIN agendamentos a ON ai.agendamento_id = a.id
-        WHERE ai.item_id = ?
-          AND a.status != 'Cancelado'
-          AND NOT (date(a.data_fim) < date(?) OR date(a.data_inicio) > date(?))
+        WHERE a.status != 'Cancelado'
+          AND a.data_fim >= ?
+          AND a.data_inicio <= ?
+    """
+    params = [inicio, fim]
+
+    # para listas grandes é mais barato buscar tudo e filtrar em Python
+    if item_ids is not None and len(item_ids) <= MAX_PARAMS_IN:
+        ids = list(item_ids)
+        if not ids:
+            return {}
+        sql += f" AND ai.item_id IN ({','.join('?' * len(ids))})"
+        params.extend(ids)
+    if ignorar_agendamento_id is not None:
+        sql += " AND a.id != ?"
+        params.append(ignorar_agendamento_id)
+
+    if conn is None:
+        with conexao() as conn:
+            rows = conn.execute(sql, params).fetchall()
+    else:
+        rows = conn.execute(sql, params).fetchall()
+
+    dia_seguinte = {}  # cache: muitas reservas terminam nos mesmos dias
+
+    eventos = {}
+    for item_id, ini, fim_reserva, qtd in rows:
+        if not qtd:
+            continue
+        ini = max(ini, inicio)
+        fim_reserva = min(fim_reserva, fim)
+        saida = dia_seguinte.get(fim_reserva)
+        if saida is None:
+            saida = (date.fromisoformat(fim_reserva) + timedelta(days=1)).isoformat()
+            dia_seguinte[fim_reserva] = saida
+        ev = eventos.setdefault(item_id, [])
+        ev.append((ini, qtd))
+        ev.append((saida, -qtd))
+
+    for ev in eventos.values():
+        ev.sort()
+    return eventos
+
+
+def _ocupacao_por_dia(item_ids, inicio, fim, ignorar_agendamento_id=None, conn=None):
+    """{item_id: {dia: quantidade}} lido de ocupacao_diaria (só dias com ocupação).
+
+    Custo proporcional a dias × itens tocados na janela. Com
+    ignorar_agendamento_id, a parte desse agendamento é descontada.
+    """
+    inicio, fim = str(inicio)[:10], str(fim)[:10]
+    sql = "SELECT item_id, dia, quantidade FROM ocupacao_diaria WHERE dia BETWEEN ? AND ?"
+    params = [inicio, fim]
+    if item_ids is not None and len(item_ids) <= MAX_PARAMS_IN:
+        ids = list(item_ids)
+        if not ids:
+            return {}
+        sql += f" AND item_id IN ({','.join('?' * len(ids))})"
+        params.extend(ids)
+
+    proprio = None
+    if conn is None:
+        with conexao() as conn:
+            rows = conn.execute(sql, params).fetchall()
+            if ignorar_agendamento_id is not None:
+                proprio = _linhas_ocupacao(conn, ignorar_agendamento_id)
+    else:
+        rows = conn.execute(sql, params).fetchall()
+        if ignorar_agendamento_id is not None:
+            proprio = _linhas_ocupacao(conn, ignorar_agendamento_id)
+
+    ocupacao = {}
+    for item_id, dia, qtd in rows:
+        ocupacao.setdefault(item_id, {})[dia] = qtd
+
+    if proprio:
+        ini_proprio, fim_proprio, linhas = proprio
+        dia = date.fromisoformat(max(ini_proprio, inicio))
+        ultimo = min(fim_proprio, fim)
+        while dia.isoformat() <= ultimo:
+            dia_iso = dia.isoformat()
+            for item_id, qtd in linhas:
+                por_dia = ocupacao.get(item_id)
+                if por_dia and dia_iso in por_dia:
+                    por_dia[dia_iso] -= qtd
+            dia += timedelta(days=1)
+    return ocupacao
+
+
+def quantidades_locadas_no_periodo(item_ids, inicio, fim, ignorar_agendamento_id=None, conn=None):
+    """Pico de quantidade locada simultaneamente no período, para vários itens de uma vez.
+
+    Retorna {item_id: quantidade}; itens sem reservas no período ficam com 0.
+    Se item_ids for None, considera todos os itens com reservas no período.
+    ignorar_agendamento_id exclui um agendamento do cálculo (usado na edição).
+    Passe `conn` para ler dentro de uma transação já aberta.
+    """
+    ocupacao = _ocupacao_por_dia(item_ids, inicio, fim, ignorar_agendamento_id, conn)
+    picos = {item_id: max(0, max(por_dia.values())) for item_id, por_dia in ocupacao.items()}
+
+    if item_ids is None:
+        return picos
+    return {iid: picos.get(iid, 0) for iid in item_ids}
+
+
+def curva_ocupacao(item_ids, inicio, fim, ignorar_agendamento_id=None):
+    """Quantidade locada dia a dia no período: {item_id: [(date, quantidade), ...]}."""
+    ini = date.fromisoformat(str(inicio)[:10])
+    n_dias = (date.fromisoformat(str(fim)[:10]) - ini).days + 1
+    dias = [ini + timedelta(days=d) for d in range(max(0, n_dias))]
+    ocupacao = _ocupacao_por_dia(item_ids, inicio, fim, ignorar_agendamento_id)
+
+    ids = ocupacao.keys() if item_ids is None else item_ids
+    curvas = {}
+    for item_id in ids:
+        por_dia = ocupacao.get(item_id, {})
+        curvas[item_id] = [(dia, por_dia.get(dia.isoformat(), 0)) for dia in dias]
+    return curvas
+
+
+def ocupacao_por_item(inicio, fim):
+    """Diárias locadas (soma das quantidades por dia) e pico por item no período.
+
+    Retorna [(item_id, nome, diarias, pico)], da maior ocupação para a menor.
+    """
+    with conexao() as conn:
+        rows = conn.execute("""
+            SELECT o.item_id, i.nome, SUM(o.quantidade) AS diarias, MAX(o.quantidade) AS pico
+            FROM ocupacao_diaria o
+            LEFT JOIN itens i ON i.id = o.item_id
+            WHERE o.dia BETWEEN ? AND ?
+            GROUP BY o.item_id
+            ORDER BY diarias DESC
+        """, (str(inicio)[:10], str(fim)[:10])).fetchall()
+    return rows
+
+
+# =======================================================
+#              OCUPAÇÃO DIÁRIA (MATERIALIZADA)
+# =======================================================
+def _periodo_ocupado(conn, agendamento_id):
+    """(data_inicio, data_fim) do agendamento, ou None se ele não ocupa estoque."""
+    row = conn.execute(
+        "SELECT data_inicio, data_fim, status FROM agendamentos WHERE id=?", (agendamento_id,)
+    ).fetchone()
+    if row is None or row[2] == "Cancelado" or row[1] < row[0]:
+        return None
+    return row[0], row[1]
+
+
+def _linhas_ocupacao(conn, agendamento_id):
+    """(data_inicio, data_fim, [(item_id, quantidade)]) do agendamento, ou None se ele não ocupa estoque."""
+    periodo = _periodo_ocupado(conn, agendamento_id)
+    if periodo is None:
+        return None
+    linhas = conn.execute(
+        "SELECT item_id, SUM(quantidade) FROM agendamento_itens WHERE agendamento_id=? GROUP BY item_id",
+        (agendamento_id,),
+    ).fetchall()
+    return periodo[0], periodo[1], linhas
+
+
+def _ajustar_ocupacao(conn, agendamento_id, sinal, linha_id=None):
+    """Soma (sinal=+1) ou tira (sinal=-1) o agendamento de ocupacao_diaria.
+
+    Deve rodar na mesma transação da escrita. Agendamentos cancelados não
+    ocupam estoque, então chame -1 antes de mudar/apagar e +1 depois.
+    Com linha_id, ajusta só aquela linha de agendamento_itens.
     """
+    periodo = _periodo_ocupado(conn, agendamento_id)
+    if periodo is None:
+        return
+    inicio, fim = periodo
+
+    filtro_linha, params = "", [inicio, fim, sinal, agendamento_id]
+    if linha_id is not None:
+        filtro_linha = "AND ai.id = ?"
+        params.append(linha_id)
+    conn.execute(f"""
+        WITH RECURSIVE dias(dia) AS (
+            SELECT ? UNION ALL SELECT date(dia, '+1 day') FROM dias WHERE dia < ?
+        )
+        INSERT INTO ocupacao_diaria (item_id, dia, quantidade)
+        SELECT ai.item_id, dias.dia, ? * SUM(ai.quantidade)
+        FROM agendamento_itens ai, dias
+        WHERE ai.agendamento_id = ? {filtro_linha}
+        GROUP BY ai.item_id, dias.dia
+        ON CONFLICT (item_id, dia) DO UPDATE SET quantidade = quantidade + excluded.quantidade
+    """, params)
+    if sinal < 0:
+        conn.execute("""
+            DELETE FROM ocupacao_diaria
+            WHERE item_id IN (SELECT item_id FROM agendamento_itens WHERE agendamento_id = ?)
+              AND dia BETWEEN ? AND ?
+              AND quantidade = 0
+        """, (agendamento_id, inicio, fim))
+
+
+def reconstruir_ocupacao_diaria(conn=None):
+    """Recalcula ocupacao_diaria do zero a partir de agendamentos e itens."""
+    if conn is None:
+        with transacao() as conn:
+            reconstruir_ocupacao_diaria(conn)
+        marcar_alteracao("ocupacao_diaria")
+        return
+    conn.execute("DELETE FROM ocupacao_diaria")
+    conn.execute("""
+        WITH RECURSIVE dias(agendamento_id, dia, fim) AS (
+            SELECT id, data_inicio, data_fim FROM agendamentos
+            WHERE status != 'Cancelado' AND data_inicio <= data_fim
+            UNION ALL
+            SELECT agendamento_id, date(dia, '+1 day'), fim FROM dias WHERE dia < fim
+        )
+        INSERT INTO ocupacao_diaria (item_id, dia, quantidade)
+        SELECT ai.item_id, dias.dia, SUM(ai.quantidade)
+        FROM dias
+        JOIN agendamento_itens ai ON ai.agendamento_id = dias.agendamento_id
+        GROUP BY ai.item_id, dias.dia
+        HAVING SUM(ai.quantidade) != 0
+    """)
+
+
+def verificar_ocupacao_diaria():
+    """Confere ocupacao_diaria contra o cálculo direto (linha de varredura sobre os agendamentos).
+
+    Retorna [(item_id, dia, esperado, materializado)] para cada divergência;
+    lista vazia significa tabela consistente.
+    """
+    with conexao() as conn:
+        limites = conn.execute("SELECT MIN(data_inicio), MAX(data_fim) FROM agendamentos").fetchone()
+        materializado = {
+            (item_id, dia): qtd
+            for item_id, dia, qtd in conn.execute("SELECT item_id, dia, quantidade FROM ocupacao_diaria")
+        }
+
+    esperado = {}
+    if limites[0] is not None:
+        for item_id, ev in _eventos_por_item(None, limites[0], limites[1]).items():
+            nivel = 0
+            for (dia, delta), proximo in zip(ev, ev[1:] + [(None, 0)]):
+                nivel += delta
+                if not nivel or proximo[0] is None or proximo[0] == dia:
+                    continue
+                d = date.fromisoformat(dia)
+                while d.isoformat() < proximo[0]:
+                    esperado[(item_id, d.isoformat())] = nivel
+                    d += timedelta(days=1)
+
+    return [
+        (item_id, dia, esperado.get((item_id, dia), 0), materializado.get((item_id, dia), 0))
+        for item_id, dia in sorted(esperado.keys() | materializado.keys())
+        if esperado.get((item_id, dia), 0) != materializado.get((item_id, dia), 0)
+    ]
+
 
-    cur.execute(sql, (item_id, inicio, fim))
-    result = cur.fetchone()[0]
-    conn.close()
-    return result if result else 0
+# =======================================================
+#              FATOS DOS RELATÓRIOS
+# =======================================================
+# fatos_item_dia: por (data_inicio, item) receita, quantidade e linhas de agendamento
+# fatos_cliente_dia: por (data_inicio, cliente) receita, quantidade e agendamentos
+# Os triggers somam/subtraem a contribuição de cada linha alterada, então
+# o custo de uma escrita não depende do tamanho do histórico.
+_SOMAR_FATOS = """
+    ON CONFLICT ({chave}) DO UPDATE SET
+        receita = receita + excluded.receita,
+        quantidade = quantidade + excluded.quantidade,
+        agendamentos = agendamentos + excluded.agendamentos;
+"""
+
+
+def _delta_linha_fatos(linha, sinal):
+    """Contribuição de uma linha de agendamento_itens (NEW/OLD) com o sinal dado."""
+    return f"""
+        INSERT INTO fatos_item_dia (dia, item_id, receita, quantidade, agendamentos)
+        SELECT a.data_inicio, {linha}.item_id, {sinal} * COALESCE({linha}.valor_total, 0),
+               {sinal} * {linha}.quantidade, {sinal}
+        FROM agendamentos a WHERE a.id = {linha}.agendamento_id
+        {_SOMAR_FATOS.format(chave="dia, item_id")}
+        INSERT INTO fatos_cliente_dia (dia, cliente_id, receita, quantidade, agendamentos)
+        SELECT a.data_inicio, a.cliente_id, {sinal} * COALESCE({linha}.valor_total, 0),
+               {sinal} * {linha}.quantidade, 0
+        FROM agendamentos a WHERE a.id = {linha}.agendamento_id
+        {_SOMAR_FATOS.format(chave="dia, cliente_id")}
+    """
+
+
+def _delta_agendamento_fatos(ag, sinal):
+    """Contribuição de um agendamento (NEW/OLD) inteiro, com os itens que ele tem agora."""
+    return f"""
+        INSERT INTO fatos_item_dia (dia, item_id, receita, quantidade, agendamentos)
+        SELECT {ag}.data_inicio, ai.item_id, {sinal} * SUM(COALESCE(ai.valor_total, 0)),
+               {sinal} * SUM(ai.quantidade), {sinal} * COUNT(*)
+        FROM agendamento_itens ai WHERE ai.agendamento_id = {ag}.id
+        GROUP BY ai.item_id
+        {_SOMAR_FATOS.format(chave="dia, item_id")}
+        INSERT INTO fatos_cliente_dia (dia, cliente_id, receita, quantidade, agendamentos)
+        SELECT {ag}.data_inicio, {ag}.cliente_id,
+               {sinal} * (SELECT COALESCE(SUM(valor_total), 0) FROM agendamento_itens WHERE agendamento_id = {ag}.id),
+               {sinal} * (SELECT COALESCE(SUM(quantidade), 0) FROM agendamento_itens WHERE agendamento_id = {ag}.id),
+               {sinal}
+        WHERE true
+        {_SOMAR_FATOS.format(chave="dia, cliente_id")}
+    """
+
+
+def _limpar_fatos(dia):
+    return f"""
+        DELETE FROM fatos_item_dia WHERE dia = {dia} AND agendamentos <= 0;
+        DELETE FROM fatos_cliente_dia WHERE dia = {dia} AND agendamentos <= 0;
+    """
+
+
+def _gatilhos_fatos():
+    dia_old = "(SELECT data_inicio FROM agendamentos WHERE id = OLD.agendamento_id)"
+    return {
+        "trg_fatos_itens_ins": f"AFTER INSERT ON agendamento_itens BEGIN {_delta_linha_fatos('NEW', 1)} END",
+        "trg_fatos_itens_del": f"""AFTER DELETE ON agendamento_itens BEGIN
+            {_delta_linha_fatos('OLD', -1)} {_limpar_fatos(dia_old)} END""",
+        "trg_fatos_itens_upd": f"""AFTER UPDATE ON agendamento_itens BEGIN
+            {_delta_linha_fatos('OLD', -1)} {_limpar_fatos(dia_old)} {_delta_linha_fatos('NEW', 1)} END""",
+        "trg_fatos_agendamentos_ins": f"AFTER INSERT ON agendamentos BEGIN {_delta_agendamento_fatos('NEW', 1)} END",
+        # excluir o agendamento antes ou depois dos itens dá o mesmo resultado:
+        # cada trigger só conta o que ainda existe do outro lado
+        "trg_fatos_agendamentos_del": f"""AFTER DELETE ON agendamentos BEGIN
+            {_delta_agendamento_fatos('OLD', -1)} {_limpar_fatos('OLD.data_inicio')} END""",
+        "trg_fatos_agendamentos_upd": f"""AFTER UPDATE OF data_inicio, cliente_id ON agendamentos BEGIN
+            {_delta_agendamento_fatos('OLD', -1)} {_limpar_fatos('OLD.data_inicio')}
+            {_delta_agendamento_fatos('NEW', 1)} END""",
+    }
+
+
+def _gatilhos_alteracoes_fatos():
+    """Cada linha de fatos inserida, alterada ou removida marca o seu dia em fatos_dias_alterados."""
+    marcar = """
+        INSERT INTO fatos_dias_alterados (dia, seq)
+        SELECT {dia}, COALESCE(MAX(seq), 0) + 1 FROM fatos_dias_alterados WHERE true
+        ON CONFLICT (dia) DO UPDATE SET seq = excluded.seq;
+    """
+    gatilhos = {}
+    for tabela in ("fatos_item_dia", "fatos_cliente_dia"):
+        gatilhos[f"trg_{tabela}_ins"] = f"AFTER INSERT ON {tabela} BEGIN {marcar.format(dia='NEW.dia')} END"
+        gatilhos[f"trg_{tabela}_upd"] = f"AFTER UPDATE ON {tabela} BEGIN {marcar.format(dia='NEW.dia')} END"
+        gatilhos[f"trg_{tabela}_del"] = f"AFTER DELETE ON {tabela} BEGIN {marcar.format(dia='OLD.dia')} END"
+    return gatilhos
+
+
+_CONSULTAS_FATOS = {
+    "fatos_item_dia": """
+        SELECT a.data_inicio, ai.item_id, SUM(COALESCE(ai.valor_total, 0)), SUM(ai.quantidade), COUNT(*)
+        FROM agendamentos a
+        JOIN agendamento_itens ai ON ai.agendamento_id = a.id
+        GROUP BY a.data_inicio, ai.item_id
+    """,
+    "fatos_cliente_dia": """
+        SELECT a.data_inicio, a.cliente_id, COALESCE(SUM(ai.valor_total), 0),
+               COALESCE(SUM(ai.quantidade), 0), COUNT(DISTINCT a.id)
+        FROM agendamentos a
+        LEFT JOIN agendamento_itens ai ON ai.agendamento_id = a.id
+        GROUP BY a.data_inicio, a.cliente_id
+    """,
+}
+
+
+def reconstruir_fatos_relatorio(conn=None):
+    """Recalcula fatos_item_dia e fatos_cliente_dia do zero."""
+    if conn is None:
+        with transacao() as conn:
+            reconstruir_fatos_relatorio(conn)
+        marcar_alteracao("agendamentos")
+        return
+    for tabela, consulta in _CONSULTAS_FATOS.items():
+        conn.execute(f"DELETE FROM {tabela}")
+        conn.execute(f"INSERT INTO {tabela} {consulta}")
+
+
+def verificar_fatos_relatorio():
+    """Confere as tabelas de fatos contra a agregação direta.
+
+    Retorna [(tabela, dia, id, esperado, materializado)] para cada divergência
+    (valores como (receita, quantidade, agendamentos)); lista vazia = consistente.
+    """
+    with conexao() as conn:
+        divergencias = []
+        for tabela, consulta in _CONSULTAS_FATOS.items():
+            esperado = {(r[0], r[1]): (round(r[2], 2), r[3], r[4]) for r in conn.execute(consulta)}
+            materializado = {
+                (r[0], r[1]): (round(r[2], 2), r[3], r[4])
+                for r in conn.execute(f"SELECT * FROM {tabela}")
+            }
+            for chave in sorted(esperado.keys() | materializado.keys()):
+                if esperado.get(chave) != materializado.get(chave):
+                    divergencias.append((tabela, *chave, esperado.get(chave), materializado.get(chave)))
+    return divergencias
+
+
+# migrações rodam na importação (depois de todas as definições acima)
+init_db()
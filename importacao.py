@@ -0,0 +1,186 @@
+"""Importação em massa de itens e clientes a partir de CSV.
+
+O arquivo é lido em lotes (pandas, chunksize), sem carregá-lo inteiro. Cada
+lote é validado coluna a coluna (CPFs conferidos em lote com numpy) e as
+linhas válidas são gravadas com executemany numa transação por lote. Linhas
+inválidas ou já cadastradas não interrompem a importação: voltam no
+resultado com o número da linha e o motivo.
+
+    python importacao.py itens catalogo.csv
+    python importacao.py clientes clientes.csv --sep ";" --erros erros.csv
+"""
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+
+import database
+
+TAMANHO_LOTE_IMPORTACAO = 5000
+
+# tipo -> (colunas obrigatórias, colunas opcionais)
+COLUNAS_IMPORTACAO = {
+    "itens": (["nome", "quantidade_total"], ["descricao"]),
+    "clientes": (["nome", "sobrenome", "email", "cpf"], ["data_nascimento", "telefone"]),
+}
+
+_EMAIL = r"^[^@\s]+@[^@\s]+\.[^@\s]+$"
+
+
+# =======================================================
+#              VALIDAÇÃO (VETORIZADA)
+# =======================================================
+def cpfs_validos(cpfs):
+    """Array booleano: quais CPFs (Series só com dígitos) têm dígitos verificadores corretos."""
+    validos = np.zeros(len(cpfs), dtype=bool)
+    onze = (cpfs.str.len() == 11).to_numpy()
+    if onze.any():
+        d = np.frombuffer("".join(cpfs[onze]).encode("ascii"), dtype=np.uint8).reshape(-1, 11).astype(np.int64) - 48
+        dig1 = (d[:, :9] @ np.arange(10, 1, -1)) * 10 % 11 % 10
+        dig2 = (d[:, :10] @ np.arange(11, 1, -1)) * 10 % 11 % 10
+        repetidos = (d == d[:, :1]).all(axis=1)  # 000.000.000-00, 111..., etc.
+        validos[onze] = (dig1 == d[:, 9]) & (dig2 == d[:, 10]) & ~repetidos
+    return validos
+
+
+def _obrigatorias(df, colunas):
+    return [(df[col] == "", f"{col} obrigatório") for col in colunas]
+
+
+def _validar_itens(df):
+    """(linhas prontas para gravar, [(máscara, motivo)], chave de unicidade, rótulo da chave)."""
+    quantidade = pd.to_numeric(df["quantidade_total"], errors="coerce")
+    regras = _obrigatorias(df, ["nome"]) + [
+        (~(quantidade >= 1) | (quantidade % 1 != 0), "quantidade_total deve ser um inteiro maior que zero"),
+    ]
+    linhas = pd.DataFrame({
+        "nome": df["nome"],
+        "descricao": df["descricao"],
+        "quantidade_total": quantidade,
+    })
+    chave = df["nome"].map(database.chave_nome_item)
+    return linhas, regras, chave, "nome"
+
+
+def _validar_clientes(df):
+    cpf = df["cpf"].str.replace(r"[^0-9]", "", regex=True)
+    nascimento = pd.to_datetime(df["data_nascimento"], format="%Y-%m-%d", errors="coerce").fillna(
+        pd.to_datetime(df["data_nascimento"], format="%d/%m/%Y", errors="coerce")
+    )
+    limite = pd.Timestamp.today().normalize() - pd.Timedelta(days=database.IDADE_MINIMA_DIAS)
+    regras = _obrigatorias(df, ["nome", "sobrenome", "email", "cpf"]) + [
+        ((df["cpf"] != "") & ~cpfs_validos(cpf), "CPF inválido"),
+        ((df["email"] != "") & ~df["email"].str.match(_EMAIL), "e-mail inválido"),
+        ((df["data_nascimento"] != "") & nascimento.isna(), "data_nascimento inválida (use AAAA-MM-DD ou DD/MM/AAAA)"),
+        (nascimento > limite, "cliente deve ter ao menos 18 anos"),
+    ]
+    linhas = pd.DataFrame({
+        "nome": df["nome"],
+        "sobrenome": df["sobrenome"],
+        "data_nascimento": nascimento.dt.strftime("%Y-%m-%d").astype(object).where(nascimento.notna(), None),
+        "email": df["email"],
+        "telefone": df["telefone"],
+        "cpf": cpf,
+    })
+    return linhas, regras, cpf, "CPF"
+
+
+_IMPORTADORES = {
+    "itens": (_validar_itens, database.inserir_itens_lote),
+    "clientes": (_validar_clientes, database.inserir_clientes_lote),
+}
+
+
+# =======================================================
+#              IMPORTAÇÃO EM LOTES
+# =======================================================
+def _importar_lote(tipo, df, resultado):
+    validar, gravar = _IMPORTADORES[tipo]
+    linhas, regras, chave, rotulo = validar(df)
+
+    motivos = pd.Series("", index=df.index)
+    for mascara, motivo in regras:
+        motivos = motivos.mask(mascara, motivos + motivo + "; ")
+    # repetição dentro do lote: fica a primeira ocorrência válida
+    repetidas = chave[motivos == ""].duplicated()
+    motivos.loc[repetidas[repetidas].index] += f"{rotulo} repetido no arquivo; "
+
+    validas = linhas[motivos == ""]
+    if tipo == "itens":
+        validas = validas.astype({"quantidade_total": "int64"})
+    duplicados = gravar(list(validas.itertuples(index=False, name=None))) if len(validas) else []
+
+    # linha no arquivo: índice do registro + 2 (cabeçalho na linha 1)
+    erros = [(int(i) + 2, m.rstrip("; ")) for i, m in motivos[motivos != ""].items()]
+    erros += [(int(validas.index[pos]) + 2, f"{rotulo} já cadastrado") for pos in duplicados]
+    resultado["erros"].extend(sorted(erros))
+    resultado["lidas"] += len(df)
+    resultado["inseridas"] += len(validas) - len(duplicados)
+    resultado["lotes"] += 1
+
+
+def importar_csv(tipo, arquivo, sep=",", tamanho_lote=TAMANHO_LOTE_IMPORTACAO, progresso=None):
+    """Importa itens ou clientes de `arquivo` (caminho ou arquivo aberto), lote a lote.
+
+    Cada lote é gravado na sua própria transação: uma falha no meio mantém
+    os lotes anteriores. `progresso(resultado)` é chamado após cada lote.
+    Retorna {"lidas", "inseridas", "erros": [(linha, motivo)], "lotes", "duracao"}.
+    """
+    if tipo not in COLUNAS_IMPORTACAO:
+        raise ValueError(f"tipo de importação desconhecido: {tipo}")
+    obrigatorias, opcionais = COLUNAS_IMPORTACAO[tipo]
+    resultado = {"lidas": 0, "inseridas": 0, "erros": [], "lotes": 0, "duracao": 0.0}
+
+    t0 = time.perf_counter()
+    leitor = pd.read_csv(
+        arquivo, sep=sep, dtype=str, keep_default_na=False, encoding="utf-8-sig", chunksize=tamanho_lote
+    )
+    with leitor:
+        for df in leitor:
+            df.columns = [str(c).strip().lower() for c in df.columns]
+            faltando = [c for c in obrigatorias if c not in df.columns]
+            if faltando:
+                raise ValueError(f"coluna(s) obrigatória(s) ausente(s) no CSV: {', '.join(faltando)}")
+            for col in opcionais:
+                if col not in df.columns:
+                    df[col] = ""
+            df = df[obrigatorias + opcionais].apply(lambda col: col.str.strip())
+            _importar_lote(tipo, df, resultado)
+            resultado["duracao"] = time.perf_counter() - t0
+            if progresso is not None:
+                progresso(resultado)
+    resultado["duracao"] = time.perf_counter() - t0
+    return resultado
+
+
+def erros_csv(erros):
+    """Relatório de erros (linha, motivo) em texto CSV."""
+    return pd.DataFrame(erros, columns=["linha", "motivo"]).to_csv(index=False)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Importa itens ou clientes de um arquivo CSV.")
+    parser.add_argument("tipo", choices=list(COLUNAS_IMPORTACAO))
+    parser.add_argument("arquivo")
+    parser.add_argument("--sep", default=",")
+    parser.add_argument("--lote", type=int, default=TAMANHO_LOTE_IMPORTACAO)
+    parser.add_argument("--erros", help="grava o relatório de erros (linha, motivo) neste CSV")
+    args = parser.parse_args()
+
+    resultado = importar_csv(args.tipo, args.arquivo, args.sep, args.lote)
+    taxa = resultado["lidas"] / resultado["duracao"] if resultado["duracao"] else 0
+    print(f"{resultado['inseridas']} de {resultado['lidas']} linha(s) importada(s) em "
+          f"{resultado['duracao']:.2f}s ({taxa:,.0f} linhas/s); {len(resultado['erros'])} erro(s)")
+    if args.erros:
+        with open(args.erros, "w", newline="", encoding="utf-8") as f:
+            f.write(erros_csv(resultado["erros"]))
+    else:
+        for linha, motivo in resultado["erros"][:20]:
+            print(f"  linha {linha}: {motivo}")
+        if len(resultado["erros"]) > 20:
+            print("  ... (use --erros para o relatório completo)")
+
+
+if __name__ == "__main__":
+    main()
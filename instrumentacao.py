@@ -0,0 +1,353 @@
+"""Instrumentação de reruns: consultas SQL, conexões e seções nomeadas por página.
+
+Com a instrumentação ligada, cada rerun da página (envolto em `rerun(pagina)`
+no app.py) registra as conexões pegas em get_connection, cada comando SQL
+(texto, duração incluindo a leitura das linhas, número de linhas) e o tempo
+das seções marcadas com `secao(nome)`. Os registros ficam em memória (últimos
+MAX_EXECUCOES reruns), são agregados por página em `resumo_por_pagina()` e
+exportados em JSON por `exportar_json()` (página oculta Diagnóstico).
+
+Desligada, get_connection só testa um gancho None e `secao()` devolve um
+contexto nulo compartilhado.
+
+    MTA_INSTRUMENTACAO=1 streamlit run app.py
+"""
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import deque, defaultdict
+from contextlib import contextmanager, nullcontext
+from datetime import datetime
+
+import database
+
+MAX_EXECUCOES = int(os.environ.get("MTA_INSTRUMENTACAO_MAX_EXECUCOES", "500"))
+# acima disso as consultas do rerun só entram nos totais (loops por item, importações)
+MAX_CONSULTAS_POR_EXECUCAO = int(os.environ.get("MTA_INSTRUMENTACAO_MAX_CONSULTAS", "1000"))
+
+historico = deque(maxlen=MAX_EXECUCOES)
+_historico_lock = threading.Lock()
+
+# coleta do rerun em andamento, por thread (cada sessão do Streamlit roda o script na sua)
+_local = threading.local()
+_NULO = nullcontext()
+
+
+# =======================================================
+#              COLETA
+# =======================================================
+class Coleta:
+    """Registro de um rerun: consultas, conexões e seções."""
+
+    def __init__(self, pagina):
+        self.pagina = pagina
+        self.inicio = datetime.now().isoformat(timespec="seconds")
+        self.consultas = []
+        self.descartadas = 0
+        self.total_consultas = 0
+        self.tempo_sql = 0.0
+        self.conexoes = 0
+        self.tempo_conexoes = 0.0
+        self.secoes = []
+
+    def registrar_consulta(self, sql, duracao):
+        self.total_consultas += 1
+        self.tempo_sql += duracao
+        consulta = {"sql": sql, "duracao": duracao, "linhas": 0}
+        if len(self.consultas) < MAX_CONSULTAS_POR_EXECUCAO:
+            self.consultas.append(consulta)
+        else:
+            self.descartadas += 1
+        return consulta
+
+    def como_dict(self, duracao):
+        return {
+            "pagina": self.pagina,
+            "inicio": self.inicio,
+            "duracao": duracao,
+            "consultas": self.consultas,
+            "consultas_descartadas": self.descartadas,
+            "total_consultas": self.total_consultas,
+            "tempo_sql": self.tempo_sql,
+            "conexoes": self.conexoes,
+            "tempo_conexoes": self.tempo_conexoes,
+            "secoes": self.secoes,
+        }
+
+
+def _coleta_atual():
+    return getattr(_local, "coleta", None)
+
+
+class CursorInstrumentado(sqlite3.Cursor):
+    """Cursor que mede execute/executemany e soma à consulta o tempo e as linhas lidas."""
+
+    _consulta = None
+
+    def _registrar(self, sql, t0):
+        coleta = _coleta_atual()
+        if coleta is None:
+            self._consulta = None
+            return
+        consulta = coleta.registrar_consulta(sql, time.perf_counter() - t0)
+        if self.description is None:  # escrita: linhas afetadas
+            consulta["linhas"] = max(self.rowcount, 0)
+        self._consulta = consulta
+
+    def _ler(self, linhas, t0):
+        consulta = self._consulta
+        if consulta is not None:
+            duracao = time.perf_counter() - t0
+            consulta["duracao"] += duracao
+            consulta["linhas"] += linhas
+            coleta = _coleta_atual()
+            if coleta is not None:
+                coleta.tempo_sql += duracao
+
+    def execute(self, sql, parametros=()):
+        t0 = time.perf_counter()
+        try:
+            return super().execute(sql, parametros)
+        finally:
+            self._registrar(sql, t0)
+
+    def executemany(self, sql, parametros):
+        t0 = time.perf_counter()
+        try:
+            return super().executemany(sql, parametros)
+        finally:
+            self._registrar(sql, t0)
+
+    def executescript(self, script):
+        t0 = time.perf_counter()
+        try:
+            return super().executescript(script)
+        finally:
+            self._registrar(script, t0)
+
+    def fetchone(self):
+        t0 = time.perf_counter()
+        linha = super().fetchone()
+        self._ler(linha is not None, t0)
+        return linha
+
+    def fetchmany(self, size=None):
+        t0 = time.perf_counter()
+        linhas = super().fetchmany(self.arraysize if size is None else size)
+        self._ler(len(linhas), t0)
+        return linhas
+
+    def fetchall(self):
+        t0 = time.perf_counter()
+        linhas = super().fetchall()
+        self._ler(len(linhas), t0)
+        return linhas
+
+    def __next__(self):
+        t0 = time.perf_counter()
+        linha = super().__next__()
+        self._ler(1, t0)
+        return linha
+
+
+class ConexaoInstrumentada(database.ConexaoPool):
+    """Conexão do pool que cria cursores instrumentados enquanto está emprestada.
+
+    A classe é trocada só durante o empréstimo: no close() a conexão volta a
+    ser uma ConexaoPool comum antes de retornar ao pool.
+    """
+
+    def cursor(self, factory=CursorInstrumentado):
+        return super().cursor(factory)
+
+    # os atalhos do sqlite3.Connection não passam por cursor() sobrescrito
+    def execute(self, sql, parametros=()):
+        return self.cursor().execute(sql, parametros)
+
+    def executemany(self, sql, parametros):
+        return self.cursor().executemany(sql, parametros)
+
+    def executescript(self, script):
+        return self.cursor().executescript(script)
+
+    def close(self):
+        self.__class__ = database.ConexaoPool
+        self.close()
+
+
+def _emprestar_instrumentada(emprestar):
+    coleta = _coleta_atual()
+    if coleta is None:  # fora de um rerun (threads de fundo, scripts)
+        return emprestar()
+    t0 = time.perf_counter()
+    conn = emprestar()
+    coleta.conexoes += 1
+    coleta.tempo_conexoes += time.perf_counter() - t0
+    conn.__class__ = ConexaoInstrumentada
+    return conn
+
+
+# =======================================================
+#              LIGAR / DESLIGAR
+# =======================================================
+_ativa = False
+
+
+def ativa():
+    return _ativa
+
+
+def ativar():
+    global _ativa
+    _ativa = True
+    database.definir_gancho_conexao(_emprestar_instrumentada)
+
+
+def desativar():
+    global _ativa
+    _ativa = False
+    database.definir_gancho_conexao(None)
+
+
+def limpar():
+    with _historico_lock:
+        historico.clear()
+
+
+@contextmanager
+def rerun(pagina):
+    """Registra um rerun da página (também quando interrompido por st.stop/st.rerun)."""
+    if not _ativa:
+        yield
+        return
+    coleta = Coleta(pagina)
+    anterior, _local.coleta = _coleta_atual(), coleta
+    t0 = time.perf_counter()
+    try:
+        yield
+    finally:
+        _local.coleta = anterior
+        registro = coleta.como_dict(time.perf_counter() - t0)
+        with _historico_lock:
+            historico.append(registro)
+
+
+@contextmanager
+def _secao(coleta, nome):
+    consultas, tempo_sql = coleta.total_consultas, coleta.tempo_sql
+    t0 = time.perf_counter()
+    try:
+        yield
+    finally:
+        coleta.secoes.append({
+            "nome": nome,
+            "duracao": time.perf_counter() - t0,
+            "consultas": coleta.total_consultas - consultas,
+            "tempo_sql": coleta.tempo_sql - tempo_sql,
+        })
+
+
+def secao(nome):
+    """Contexto que mede a seção `nome` da página (nulo fora de um rerun instrumentado)."""
+    coleta = _coleta_atual()
+    if coleta is None:
+        return _NULO
+    return _secao(coleta, nome)
+
+
+# =======================================================
+#              AGREGAÇÃO / EXPORTAÇÃO
+# =======================================================
+def _execucoes():
+    with _historico_lock:
+        return list(historico)
+
+
+def _percentil(valores, p):
+    ordenados = sorted(valores)
+    return ordenados[min(len(ordenados) - 1, int(p * len(ordenados)))]
+
+
+def _normalizar_sql(sql):
+    return " ".join(sql.split())
+
+
+def resumo_por_pagina(execucoes=None):
+    """Por página: reruns, duração (média, p95, máx.), SQL e conexões por rerun e seções."""
+    por_pagina = defaultdict(list)
+    for execucao in _execucoes() if execucoes is None else execucoes:
+        por_pagina[execucao["pagina"]].append(execucao)
+
+    resumo = {}
+    for pagina, lista in por_pagina.items():
+        n = len(lista)
+        duracoes = [e["duracao"] for e in lista]
+        secoes = defaultdict(lambda: {"vezes": 0, "duracao": 0.0, "consultas": 0, "tempo_sql": 0.0})
+        for e in lista:
+            for s in e["secoes"]:
+                acumulado = secoes[s["nome"]]
+                acumulado["vezes"] += 1
+                acumulado["duracao"] += s["duracao"]
+                acumulado["consultas"] += s["consultas"]
+                acumulado["tempo_sql"] += s["tempo_sql"]
+        resumo[pagina] = {
+            "reruns": n,
+            "duracao_media": sum(duracoes) / n,
+            "duracao_p95": _percentil(duracoes, 0.95),
+            "duracao_max": max(duracoes),
+            "consultas_media": sum(e["total_consultas"] for e in lista) / n,
+            "tempo_sql_medio": sum(e["tempo_sql"] for e in lista) / n,
+            "conexoes_media": sum(e["conexoes"] for e in lista) / n,
+            "tempo_conexoes_medio": sum(e["tempo_conexoes"] for e in lista) / n,
+            "secoes": {
+                nome: {
+                    "vezes": s["vezes"],
+                    "duracao_media": s["duracao"] / s["vezes"],
+                    "consultas_media": s["consultas"] / s["vezes"],
+                    "tempo_sql_medio": s["tempo_sql"] / s["vezes"],
+                }
+                for nome, s in secoes.items()
+            },
+        }
+    return resumo
+
+
+def consultas_mais_caras(n=20, execucoes=None):
+    """Comandos SQL agrupados pelo texto, do maior tempo total para o menor."""
+    grupos = {}
+    for execucao in _execucoes() if execucoes is None else execucoes:
+        for c in execucao["consultas"]:
+            sql = _normalizar_sql(c["sql"])
+            g = grupos.get(sql)
+            if g is None:
+                g = grupos[sql] = {"sql": sql, "paginas": set(), "vezes": 0, "tempo_total": 0.0,
+                                   "tempo_max": 0.0, "linhas": 0}
+            g["paginas"].add(execucao["pagina"])
+            g["vezes"] += 1
+            g["tempo_total"] += c["duracao"]
+            g["tempo_max"] = max(g["tempo_max"], c["duracao"])
+            g["linhas"] += c["linhas"]
+    ordenados = sorted(grupos.values(), key=lambda g: g["tempo_total"], reverse=True)[:n]
+    for g in ordenados:
+        g["paginas"] = sorted(g["paginas"])
+        g["tempo_medio"] = g["tempo_total"] / g["vezes"]
+    return ordenados
+
+
+def exportar_json(indent=None):
+    """Reruns registrados, resumo por página e estatísticas de pool/cache em JSON."""
+    execucoes = _execucoes()
+    return json.dumps({
+        "gerado_em": datetime.now().isoformat(timespec="seconds"),
+        "resumo_por_pagina": resumo_por_pagina(execucoes),
+        "consultas_mais_caras": consultas_mais_caras(50, execucoes),
+        "pool": database.obter_gerenciador().estatisticas(),
+        "cache": database.estatisticas_cache(),
+        "execucoes": execucoes,
+    }, ensure_ascii=False, indent=indent)
+
+
+if os.environ.get("MTA_INSTRUMENTACAO") == "1":
+    ativar()
@@ -1,20 +1,19 @@
 import streamlit as st
+import pandas as pd
 from datetime import date
-import sqlite3
-from database import listar_itens, quantidade_locada_no_periodo, encerrar_agendamentos_expirados
+from instrumentacao import secao
+from services import disponibilidade, itens as servico_itens
 
 st.title("Disponibilidades dos Itens")
 st.write("Consulte aqui a disponibilidade dos itens para locação, considerando todos os agendamentos existentes.")
 
-# Atualiza automaticamente agendamentos expirados
-encerrar_agendamentos_expirados()
-
 # ==========================
 # Carregar itens cadastrados
 # ==========================
-itens = listar_itens()
+with secao("carregar itens"):
+    tem_itens = servico_itens.existe_algum()
 
-if not itens:
+if not tem_itens:
     st.warning("Nenhum item cadastrado ainda.")
     st.stop()
 
@@ -39,27 +38,36 @@ st.divider()
 # ==========================
 st.subheader("📦 Disponibilidade dos Itens")
 
-for item in itens:
-    item_id, nome, descricao, qtd_total = item
+with secao("tabela de disponibilidade"):
+    # Pico de quantidade locada simultaneamente no período (uma consulta para todos os itens)
+    catalogo = disponibilidade.disponibilidade_catalogo(data_inicio, data_fim)
+
+    for d in catalogo:
+        with st.container(border=True):
+            st.markdown(f"### {d.nome}")
+            if d.descricao:
+                st.caption(d.descricao)
 
-    # Quantidade locada no período
-    locadas = quantidade_locada_no_periodo(
-        item_id,
-        data_inicio.isoformat(),
-        data_fim.isoformat()
-    )
+            colA, colB, colC = st.columns(3)
+            colA.metric("Total em estoque", d.total)
+            colB.metric("Locadas no período (pico)", d.locadas)
+            colC.metric("Disponíveis", d.disponivel)
 
-    disponivel = max(0, qtd_total - locadas)
+# ==========================
+# Curva diária de disponibilidade
+# ==========================
+st.divider()
+st.subheader("📈 Disponibilidade dia a dia")
 
-    with st.container(border=True):
-        st.markdown(f"### {nome}")
-        if descricao:
-            st.caption(descricao)
+itens_por_nome = {d.nome: d for d in catalogo}
+nome_curva = st.selectbox("Item", options=list(itens_por_nome.keys()))
 
-        colA, colB, colC = st.columns(3)
-        colA.metric("Total em estoque", qtd_total)
-        colB.metric("Locadas no período", locadas)
-        colC.metric("Disponíveis", disponivel)
+with secao("curva diária"):
+    df_curva = pd.DataFrame(
+        disponibilidade.curva_disponibilidade(itens_por_nome[nome_curva], data_inicio, data_fim),
+        columns=["Dia", "Disponíveis", "Locadas"]
+    ).set_index("Dia")
+    st.line_chart(df_curva)
 
 st.markdown("---")
 st.caption("Dados atualizados automaticamente com base nos agendamentos.")
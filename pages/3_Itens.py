@@ -1,7 +1,10 @@
 import streamlit as st
 import pandas as pd
-from database import listar_itens, inserir_item, atualizar_item, excluir_item
-from io import StringIO
+from importacao import importar_csv, erros_csv
+from instrumentacao import secao
+from paginacao_ui import controles, pilha_cursores
+from services import itens, DadosInvalidos, ItemComAgendamentos, NomeItemDuplicado
+from services.itens import COLUNAS_ITEM
 
 st.set_page_config(page_title="Itens - Sistema de Gestão MTA", layout="wide")
 st.title("📦 Gestão de Itens")
@@ -10,74 +13,46 @@ st.write("Gerencie aqui os itens disponíveis para locação. (CRUD, export CSV,
 # -----------------------------
 # Helpers
 # -----------------------------
-def carregar_itens():
-    rows = listar_itens()
-    # transformar em lista de dicts para facilitar manipulação
-    cols = ["id", "nome", "descricao", "quantidade_total"]
-    return [dict(zip(cols, r)) for r in rows]
-
-def nome_ja_existe(nome, excluir_id=None):
-    """Verifica se já existe item com mesmo nome (case-insensitive). Se excluir_id for fornecido, ignora esse id."""
-    all_items = carregar_itens()
-    nome_norm = nome.strip().lower()
-    for it in all_items:
-        if it["nome"].strip().lower() == nome_norm:
-            if excluir_id and it["id"] == excluir_id:
-                continue
-            return True
-    return False
+def como_dicts(rows):
+    # transformar em lista de dicts para facilitar manipulação (só a página atual)
+    return [dict(zip(COLUNAS_ITEM, r)) for r in rows]
 
 # -----------------------------
 # Barra superior: pesquisa e export
 # -----------------------------
-itens_all = carregar_itens()
-
 col_search, col_export, col_space = st.columns([3, 1, 6])
 with col_search:
-    q = st.text_input("🔎 Pesquisar por nome", value="").strip()
+    q = st.text_input("🔎 Pesquisar por nome ou descrição", value="").strip()
 with col_export:
     # botao de export CSV (base full)
     if st.button("⬇️ Exportar todos (CSV)"):
-        df_export = pd.DataFrame(itens_all)
-        csv_buf = df_export.to_csv(index=False, sep=",")
-        st.download_button("Download CSV", data=csv_buf, file_name="itens_export.csv", mime="text/csv")
+        st.download_button("Download CSV", data=itens.exportar_csv(), file_name="itens_export.csv", mime="text/csv")
+
+# nomes duplicados encontrados ao criar o índice único de nomes
+renomeados = itens.renomeados()
+if renomeados:
+    with st.expander(f"⚠️ {len(renomeados)} item(ns) renomeado(s) por nome duplicado — revise"):
+        st.dataframe(
+            pd.DataFrame(renomeados, columns=["id", "nome anterior", "nome atual", "renomeado em"]),
+            hide_index=True,
+        )
 
 st.divider()
 
 # -----------------------------
-# Filtros e paginação
+# Filtros e paginação (no banco: o custo não depende do tamanho do catálogo)
 # -----------------------------
-# filtrar por pesquisa
-if q:
-    itens_filtered = [it for it in itens_all if q.lower() in it["nome"].lower()]
-else:
-    itens_filtered = itens_all
-
-# Ordenar por nome
-itens_filtered = sorted(itens_filtered, key=lambda x: x["nome"].lower())
-
-# paginação
+# sem pesquisa: ordem por nome com cursor (nome, id) no índice NOCASE;
+# com pesquisa: o índice de busca (FTS5) devolve a página já ordenada por relevância
 per_page = st.selectbox("Itens por página", options=[5, 10, 20, 50], index=1)
-total = len(itens_filtered)
-total_pages = max(1, (total + per_page - 1) // per_page)
-
-# inicializa estado da pagina
-if "page_itens" not in st.session_state:
-    st.session_state["page_itens"] = 1
 
-col_prev, col_page, col_next = st.columns([1, 2, 1])
-with col_prev:
-    if st.button("◀ Anterior") and st.session_state["page_itens"] > 1:
-        st.session_state["page_itens"] -= 1
-with col_page:
-    st.write(f"Página {st.session_state['page_itens']} de {total_pages} — {total} item(s) encontrado(s)")
-with col_next:
-    if st.button("Próxima ▶") and st.session_state["page_itens"] < total_pages:
-        st.session_state["page_itens"] += 1
+# pilha com o cursor de início de cada página; recomeça se a pesquisa mudar
+cursores = pilha_cursores("itens", (q, per_page))
 
-start_idx = (st.session_state["page_itens"] - 1) * per_page
-end_idx = start_idx + per_page
-itens_page = itens_filtered[start_idx:end_idx]
+with secao("página de itens"):
+    pagina = itens.listar_pagina(q, per_page, cursor=cursores[-1], numero_pagina=len(cursores))
+itens_page = como_dicts(pagina.linhas)
+controles("itens", pagina, per_page, "item(s) encontrado(s)")
 
 # -----------------------------
 # Lista (paginada)
@@ -115,14 +90,16 @@ with st.form("novo_item_form"):
     submit_novo = st.form_submit_button("Cadastrar")
 
     if submit_novo:
-        if not novo_nome.strip():
-            st.error("O nome do item é obrigatório.")
-        elif nome_ja_existe(novo_nome):
+        # a unicidade do nome é garantida pelo índice único do banco
+        try:
+            itens.cadastrar(novo_nome, nova_descricao, nova_quantidade)
+        except DadosInvalidos as e:
+            st.error(e.erros[0])
+        except NomeItemDuplicado:
             st.error("Já existe um item com esse nome. Use um nome diferente ou edite o item existente.")
         else:
-            inserir_item(novo_nome.strip(), nova_descricao.strip(), int(nova_quantidade))
             st.success("Item cadastrado com sucesso!")
-            st.experimental_rerun()
+            st.rerun()
 
 # -----------------------------
 # Edição de Item (quando selecionado)
@@ -130,11 +107,12 @@ with st.form("novo_item_form"):
 if "editar_item_id" in st.session_state:
     edit_id = st.session_state["editar_item_id"]
     # carrega dados atuais
-    item = next((x for x in itens_all if x["id"] == edit_id), None)
+    row = itens.obter(edit_id)
+    item = dict(zip(COLUNAS_ITEM, row)) if row else None
     if not item:
         st.error("Item para edição não encontrado.")
         del st.session_state["editar_item_id"]
-        st.experimental_rerun()
+        st.rerun()
     else:
         st.subheader(f"✏️ Editar Item — ID {edit_id}")
         with st.form("editar_item_form"):
@@ -146,18 +124,19 @@ if "editar_item_id" in st.session_state:
 
             if cancelar:
                 del st.session_state["editar_item_id"]
-                st.experimental_rerun()
+                st.rerun()
 
             if salvar:
-                if not edit_nome.strip():
-                    st.error("Nome é obrigatório.")
-                elif nome_ja_existe(edit_nome, excluir_id=edit_id):
+                try:
+                    itens.atualizar(edit_id, edit_nome, edit_descricao, edit_quantidade)
+                except DadosInvalidos as e:
+                    st.error(e.erros[0])
+                except NomeItemDuplicado:
                     st.error("Já existe outro item com esse nome. Escolha um nome diferente.")
                 else:
-                    atualizar_item(edit_id, edit_nome.strip(), edit_descricao.strip(), int(edit_quantidade))
                     st.success("Item atualizado com sucesso.")
                     del st.session_state["editar_item_id"]
-                    st.experimental_rerun()
+                    st.rerun()
 
 # -----------------------------
 # Exclusão de Item (confirmação)
@@ -168,13 +147,45 @@ if "excluir_item_id" in st.session_state:
     colc1, colc2 = st.columns(2)
     if colc1.button("Confirmar Exclusão"):
         # excluir
-        excluir_item(del_id)
-        st.success("Item excluído com sucesso.")
-        del st.session_state["excluir_item_id"]
-        st.experimental_rerun()
+        try:
+            itens.excluir(del_id)
+        except ItemComAgendamentos as e:
+            del st.session_state["excluir_item_id"]
+            st.error(f"O item aparece em {e.agendamentos} agendamento(s) e não pode ser excluído.")
+        else:
+            st.success("Item excluído com sucesso.")
+            del st.session_state["excluir_item_id"]
+            st.rerun()
     if colc2.button("Cancelar"):
         del st.session_state["excluir_item_id"]
-        st.experimental_rerun()
+        st.rerun()
+
+# -----------------------------
+# Importar itens (CSV, em lotes)
+# -----------------------------
+st.divider()
+st.subheader("📥 Importar Itens (CSV)")
+st.caption("Colunas: nome, quantidade_total e, opcionalmente, descricao. Linhas com erro são ignoradas e listadas abaixo.")
+col_arq, col_sep = st.columns([4, 1])
+arquivo_csv = col_arq.file_uploader("Arquivo CSV", type="csv", key="itens_importar_arquivo")
+separador = col_sep.selectbox("Separador", [",", ";"], key="itens_importar_sep")
+if arquivo_csv is not None and st.button("Importar", key="itens_importar"):
+    andamento = st.empty()
+    try:
+        resultado = importar_csv(
+            "itens", arquivo_csv, sep=separador,
+            progresso=lambda r: andamento.write(f"{r['lidas']} linha(s) processada(s)..."),
+        )
+    except ValueError as e:
+        st.error(str(e))
+    else:
+        andamento.empty()
+        st.success(f"{resultado['inseridas']} de {resultado['lidas']} linha(s) importada(s) em {resultado['duracao']:.1f}s.")
+        if resultado["erros"]:
+            st.warning(f"{len(resultado['erros'])} linha(s) não importada(s).")
+            st.dataframe(pd.DataFrame(resultado["erros"][:1000], columns=["linha", "motivo"]), hide_index=True)
+            st.download_button("⬇️ Relatório de erros (CSV)", data=erros_csv(resultado["erros"]),
+                               file_name="erros_importacao_itens.csv", mime="text/csv")
 
 # -----------------------------
 # Exportar itens filtrados (CSV)
@@ -185,9 +196,9 @@ csv_col1, csv_col2 = st.columns([3, 1])
 with csv_col1:
     st.write("Você pode exportar os itens atualmente filtrados (pesquisa + ordenação) em CSV.")
 with csv_col2:
-    df_to_export = pd.DataFrame(itens_filtered)
-    csv_buffer = df_to_export.to_csv(index=False)
-    st.download_button("📥 Exportar CSV", data=csv_buffer, file_name="itens_filtrados.csv", mime="text/csv")
+    if st.button("📥 Exportar CSV"):
+        st.download_button("Download CSV", data=itens.exportar_csv_filtrados(q), file_name="itens_filtrados.csv",
+                           mime="text/csv", key="itens_filtrados_download")
 
 # -----------------------------
 # Footer
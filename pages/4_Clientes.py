@@ -1,48 +1,43 @@
 import streamlit as st
 import pandas as pd
-import sqlite3
-from database import get_connection, listar_clientes
+from importacao import importar_csv, erros_csv
+from instrumentacao import secao
+from paginacao_ui import controles, pilha_cursores
+from services import clientes as servico_clientes, CpfDuplicado, DadosInvalidos
 
 st.set_page_config(page_title="Clientes - Sistema MTA", layout="wide")
 st.title("👥 Gestão de Clientes")
 st.write("Cadastre e gerencie os clientes (locatários).")
 
-# util: carregar clientes
-def load_clientes():
-    return listar_clientes()
-
-clientes = load_clientes()
-
 st.divider()
 
-#Função para validar CPF
-def validar_cpf(cpf: str) -> bool:
-    cpf = ''.join(filter(str.isdigit, cpf))
-
-    if len(cpf) != 11:
-        return False
-
-    if cpf == cpf[0] * 11:
-        return False
-
-    # calcular 1º dígito
-    soma = sum(int(cpf[i]) * (10 - i) for i in range(9))
-    dig1 = (soma * 10 % 11) % 10
+# -----------------------
+# Lista de clientes (busca e paginação no banco)
+# -----------------------
+st.subheader("📋 Clientes Cadastrados")
 
-    # calcular 2º dígito
-    soma = sum(int(cpf[i]) * (11 - i) for i in range(10))
-    dig2 = (soma * 10 % 11) % 10
+# CPFs que, só com dígitos, já pertenciam a outro cliente (ver migração)
+duplicados = servico_clientes.cpfs_duplicados()
+if duplicados:
+    with st.expander(f"⚠️ {len(duplicados)} cliente(s) com CPF repetido de outro cadastro — revise"):
+        st.dataframe(
+            pd.DataFrame(duplicados, columns=["id", "cpf", "id do cliente com o mesmo CPF", "registrado em"]),
+            hide_index=True,
+        )
 
-    return dig1 == int(cpf[9]) and dig2 == int(cpf[10])
+col_busca, col_pp = st.columns([4, 1])
+busca = col_busca.text_input("🔎 Buscar por nome, sobrenome, e-mail ou CPF", value="").strip()
+por_pagina = col_pp.selectbox("Por página", options=[10, 20, 50], index=1, key="clientes_por_pagina")
 
+# pilha com o cursor (nome completo, id) de início de cada página
+cursores = pilha_cursores("clientes", (busca, por_pagina))
 
-# -----------------------
-# Lista de clientes
-# -----------------------
-st.subheader("📋 Clientes Cadastrados")
+with secao("página de clientes"):
+    pagina = servico_clientes.listar_pagina(busca, por_pagina, cursores[-1])
+clientes = pagina.linhas
 
 if len(clientes) == 0:
-    st.info("Nenhum cliente cadastrado.")
+    st.info("Nenhum cliente encontrado." if busca else "Nenhum cliente cadastrado.")
 else:
     # tabela simples com botões por linha
     for c in clientes:
@@ -58,6 +53,8 @@ else:
             if cols[4].button("🗑 Excluir", key=f"del_{cid}"):
                 st.session_state["excluir_cliente_id"] = cid
 
+    controles("clientes", pagina, por_pagina, "cliente(s)")
+
 st.divider()
 
 # -----------------------
@@ -69,7 +66,7 @@ with st.form("novo_cliente"):
     n_sobrenome = st.text_input("Sobrenome")
     n_data_nasc = st.date_input("Data de Nascimento (opcional)", 
                                 value=None, 
-                                max_value=pd.to_datetime("today").date()-pd.Timedelta(days=6575),
+                                max_value=servico_clientes.data_nascimento_maxima(),
                                 min_value=pd.to_datetime("1900-01-01").date(),
                                 help="Deve ter ao menos 18 anos.")
     n_email = st.text_input("E-mail")
@@ -79,38 +76,44 @@ with st.form("novo_cliente"):
     submit = st.form_submit_button("Cadastrar")
 
     if submit:
-        # validações básicas
-        if not n_nome.strip() or not n_sobrenome.strip() or not n_email.strip() or not n_cpf.strip():
-            st.error("Nome, sobrenome, e-mail e CPF são obrigatórios.")
-        elif not validar_cpf(n_cpf):
-            st.error("CPF inválido. Verifique e tente novamente.")
+        try:
+            servico_clientes.cadastrar(n_nome, n_sobrenome, n_data_nasc, n_email, n_telefone, n_cpf)
+        except DadosInvalidos as e:
+            st.error(e.erros[0])
+        except CpfDuplicado:
+            st.error("CPF já cadastrado. Verifique os dados.")
+        except Exception as e:
+            st.error(f"Erro: {e}")
         else:
-            # inserir no DB
-            try:
-                conn = get_connection()
-                cur = conn.cursor()
-                cur.execute("""
-                    INSERT INTO clientes (nome, sobrenome, data_nascimento, email, telefone, cpf)
-                    VALUES (?, ?, ?, ?, ?, ?)
-                """, (
-                    n_nome.strip(),
-                    n_sobrenome.strip(),
-                    n_data_nasc.isoformat() if n_data_nasc else None,
-                    n_email.strip(),
-                    n_telefone.strip(),
-                    n_cpf.strip()
-                ))
-                conn.commit()
-                conn.close()
-                st.success("Cliente cadastrado com sucesso.")
-                st.experimental_rerun()
-            except sqlite3.IntegrityError as e:
-                if "UNIQUE constraint failed" in str(e):
-                    st.error("CPF já cadastrado. Verifique os dados.")
-                else:
-                    st.error("Erro ao cadastrar cliente.")
-            except Exception as e:
-                st.error(f"Erro: {e}")
+            st.success("Cliente cadastrado com sucesso.")
+            st.rerun()
+
+# -----------------------
+# Importar clientes (CSV, em lotes)
+# -----------------------
+st.divider()
+st.subheader("📥 Importar Clientes (CSV)")
+st.caption("Colunas: nome, sobrenome, email, cpf e, opcionalmente, data_nascimento (AAAA-MM-DD ou DD/MM/AAAA) e telefone. CPFs são gravados só com dígitos. Linhas com erro são ignoradas e listadas abaixo.")
+col_arq, col_sep = st.columns([4, 1])
+arquivo_csv = col_arq.file_uploader("Arquivo CSV", type="csv", key="clientes_importar_arquivo")
+separador = col_sep.selectbox("Separador", [",", ";"], key="clientes_importar_sep")
+if arquivo_csv is not None and st.button("Importar", key="clientes_importar"):
+    andamento = st.empty()
+    try:
+        resultado = importar_csv(
+            "clientes", arquivo_csv, sep=separador,
+            progresso=lambda r: andamento.write(f"{r['lidas']} linha(s) processada(s)..."),
+        )
+    except ValueError as e:
+        st.error(str(e))
+    else:
+        andamento.empty()
+        st.success(f"{resultado['inseridas']} de {resultado['lidas']} linha(s) importada(s) em {resultado['duracao']:.1f}s.")
+        if resultado["erros"]:
+            st.warning(f"{len(resultado['erros'])} linha(s) não importada(s).")
+            st.dataframe(pd.DataFrame(resultado["erros"][:1000], columns=["linha", "motivo"]), hide_index=True)
+            st.download_button("⬇️ Relatório de erros (CSV)", data=erros_csv(resultado["erros"]),
+                               file_name="erros_importacao_clientes.csv", mime="text/csv")
 
 # -----------------------
 # Editar Cliente (quando selecionado)
@@ -118,15 +121,11 @@ with st.form("novo_cliente"):
 if "editar_cliente_id" in st.session_state:
     cid = st.session_state["editar_cliente_id"]
     # buscar dados
-    conn = get_connection()
-    cur = conn.cursor()
-    cur.execute("SELECT id, nome, sobrenome, data_nascimento, email, telefone, cpf FROM clientes WHERE id=?", (cid,))
-    row = cur.fetchone()
-    conn.close()
+    row = servico_clientes.obter(cid)
     if not row:
         st.error("Cliente não encontrado.")
         del st.session_state["editar_cliente_id"]
-        st.experimental_rerun()
+        st.rerun()
     else:
         _, nome, sobrenome, data_nasc, email, telefone, cpf = row
         st.subheader(f"✏️ Editar Cliente — {nome} {sobrenome}")
@@ -143,36 +142,21 @@ if "editar_cliente_id" in st.session_state:
 
             if cancelar:
                 del st.session_state["editar_cliente_id"]
-                st.experimental_rerun()
+                st.rerun()
 
             if salvar:
-                if not validar_cpf(e_cpf):
-                    st.error("CPF inválido. Verifique.")
+                try:
+                    servico_clientes.atualizar(cid, e_nome, e_sobrenome, e_data_nasc, e_email, e_telefone, e_cpf)
+                except DadosInvalidos as e:
+                    st.error(e.erros[0])
+                except CpfDuplicado:
+                    st.error("CPF já cadastrado para outro cliente.")
+                except Exception as e:
+                    st.error(f"Erro: {e}")
                 else:
-                    try:
-                        conn = get_connection()
-                        cur = conn.cursor()
-                        cur.execute("""
-                            UPDATE clientes
-                            SET nome=?, sobrenome=?, data_nascimento=?, email=?, telefone=?, cpf=?
-                            WHERE id=?
-                        """, (
-                            e_nome.strip(), e_sobrenome.strip(),
-                            e_data_nasc.isoformat() if e_data_nasc else None,
-                            e_email.strip(), e_telefone.strip(), e_cpf.strip(), cid
-                        ))
-                        conn.commit()
-                        conn.close()
-                        st.success("Dados do cliente atualizados.")
-                        del st.session_state["editar_cliente_id"]
-                        st.experimental_rerun()
-                    except sqlite3.IntegrityError as e:
-                        if "UNIQUE constraint failed" in str(e):
-                            st.error("CPF já cadastrado para outro cliente.")
-                        else:
-                            st.error("Erro ao atualizar cliente.")
-                    except Exception as e:
-                        st.error(f"Erro: {e}")
+                    st.success("Dados do cliente atualizados.")
+                    del st.session_state["editar_cliente_id"]
+                    st.rerun()
 
 # -----------------------
 # Excluir Cliente (quando selecionado)
@@ -183,16 +167,12 @@ if "excluir_cliente_id" in st.session_state:
     col1, col2 = st.columns(2)
     if col1.button("Confirmar Exclusão"):
         try:
-            conn = get_connection()
-            cur = conn.cursor()
-            cur.execute("DELETE FROM clientes WHERE id=?", (cid,))
-            conn.commit()
-            conn.close()
+            servico_clientes.excluir(cid)
             st.success("Cliente excluído.")
             del st.session_state["excluir_cliente_id"]
-            st.experimental_rerun()
+            st.rerun()
         except Exception as e:
             st.error(f"Erro ao excluir: {e}")
     if col2.button("Cancelar"):
         del st.session_state["excluir_cliente_id"]
-        st.experimental_rerun()
+        st.rerun()
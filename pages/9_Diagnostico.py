@@ -0,0 +1,128 @@
+import streamlit as st
+import pandas as pd
+from database import (
+    obter_gerenciador,
+    estatisticas_cache,
+    estatisticas_prefixo,
+    estatisticas_escrita,
+)
+import instrumentacao
+import relatorios
+
+st.title("🩺 Diagnóstico")
+st.caption("Página oculta (/diagnostico): tempo por rerun, consultas SQL e seções de cada página, "
+           "registrados em memória enquanto a instrumentação está ligada.")
+
+
+# ------------------------------
+# Controles
+# ------------------------------
+def alternar_instrumentacao():
+    if st.session_state["diag_ativa"]:
+        instrumentacao.ativar()
+    else:
+        instrumentacao.desativar()
+
+
+col_ativa, col_limpar, col_exportar = st.columns([2, 1, 1])
+col_ativa.toggle("Instrumentação ligada", value=instrumentacao.ativa(), key="diag_ativa",
+                 on_change=alternar_instrumentacao)
+col_limpar.button("🧹 Limpar registros", on_click=instrumentacao.limpar)
+if col_exportar.button("⬇️ Exportar JSON"):
+    col_exportar.download_button("Download JSON", data=instrumentacao.exportar_json(indent=2),
+                                 file_name="diagnostico.json", mime="application/json")
+
+
+def ms(segundos):
+    return round(segundos * 1000, 2)
+
+
+# ------------------------------
+# Resumo por página
+# ------------------------------
+resumo = instrumentacao.resumo_por_pagina()
+st.subheader("Por página")
+if not resumo:
+    st.info("Nenhum rerun registrado. Ligue a instrumentação e navegue pelas páginas.")
+else:
+    st.dataframe(
+        pd.DataFrame([
+            {
+                "Página": pagina,
+                "Reruns": r["reruns"],
+                "Média (ms)": ms(r["duracao_media"]),
+                "p95 (ms)": ms(r["duracao_p95"]),
+                "Máx. (ms)": ms(r["duracao_max"]),
+                "SQL/rerun": round(r["consultas_media"], 1),
+                "SQL (ms)": ms(r["tempo_sql_medio"]),
+                "Conexões/rerun": round(r["conexoes_media"], 1),
+                "Conexões (ms)": ms(r["tempo_conexoes_medio"]),
+            }
+            for pagina, r in resumo.items()
+        ]),
+        hide_index=True,
+        use_container_width=True,
+    )
+
+    st.subheader("Seções")
+    secoes = [
+        {
+            "Página": pagina,
+            "Seção": nome,
+            "Vezes": s["vezes"],
+            "Média (ms)": ms(s["duracao_media"]),
+            "SQL/vez": round(s["consultas_media"], 1),
+            "SQL (ms)": ms(s["tempo_sql_medio"]),
+        }
+        for pagina, r in resumo.items()
+        for nome, s in r["secoes"].items()
+    ]
+    if secoes:
+        st.dataframe(pd.DataFrame(secoes), hide_index=True, use_container_width=True)
+
+    st.subheader("Consultas mais caras (tempo total)")
+    st.dataframe(
+        pd.DataFrame([
+            {
+                "SQL": c["sql"],
+                "Páginas": ", ".join(c["paginas"]),
+                "Vezes": c["vezes"],
+                "Total (ms)": ms(c["tempo_total"]),
+                "Média (ms)": ms(c["tempo_medio"]),
+                "Máx. (ms)": ms(c["tempo_max"]),
+                "Linhas": c["linhas"],
+            }
+            for c in instrumentacao.consultas_mais_caras(30)
+        ]),
+        hide_index=True,
+        use_container_width=True,
+    )
+
+    st.subheader("Últimos reruns")
+    st.dataframe(
+        pd.DataFrame([
+            {
+                "Início": e["inicio"],
+                "Página": e["pagina"],
+                "Duração (ms)": ms(e["duracao"]),
+                "SQL": e["total_consultas"],
+                "SQL (ms)": ms(e["tempo_sql"]),
+                "Conexões": e["conexoes"],
+            }
+            for e in reversed(list(instrumentacao.historico)[-50:])
+        ]),
+        hide_index=True,
+        use_container_width=True,
+    )
+
+# ------------------------------
+# Pool, caches e escritas (contadores do processo)
+# ------------------------------
+st.divider()
+st.subheader("Pool de conexões, caches e fatos dos relatórios")
+col_pool, col_cache, col_prefixo, col_escrita, col_fatos = st.columns(5)
+col_pool.json(obter_gerenciador().estatisticas())
+col_cache.json(estatisticas_cache())
+col_prefixo.json(dict(estatisticas_prefixo))
+col_escrita.json(dict(estatisticas_escrita))
+col_fatos.json(relatorios.obter_base_relatorio().estatisticas())
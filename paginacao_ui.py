@@ -0,0 +1,43 @@
+"""Paginação por cursor nas páginas Streamlit: pilha de cursores na sessão e botões Anterior/Próxima.
+
+A pilha guarda o cursor de início de cada página já visitada (o topo é a
+página atual; None é a primeira) e recomeça quando os filtros mudam. As
+chaves da sessão e dos botões derivam do prefixo de cada página
+(`ag`, `itens`, `clientes`): `<prefixo>_filtros`, `<prefixo>_cursores`,
+`<prefixo>_prev` e `<prefixo>_next`.
+
+    cursores = pilha_cursores("clientes", (busca, por_pagina))
+    pagina = servico_clientes.listar_pagina(busca, por_pagina, cursores[-1])
+    controles("clientes", pagina, por_pagina, "cliente(s)")
+"""
+import streamlit as st
+
+from services.paginacao import Cursor, Pagina
+
+
+def pilha_cursores(prefixo: str, filtros) -> list[Cursor | None]:
+    """Pilha da sessão para `prefixo`; volta à primeira página se `filtros` mudou."""
+    if st.session_state.get(f"{prefixo}_filtros") != filtros:
+        st.session_state[f"{prefixo}_filtros"] = filtros
+        st.session_state[f"{prefixo}_cursores"] = [None]
+    return st.session_state[f"{prefixo}_cursores"]
+
+
+def _pagina_anterior(prefixo: str):
+    st.session_state[f"{prefixo}_cursores"].pop()
+
+
+def _proxima_pagina(prefixo: str, cursor: Cursor | None):
+    st.session_state[f"{prefixo}_cursores"].append(cursor)
+
+
+def controles(prefixo: str, pagina: Pagina, por_pagina: int, rotulo: str):
+    """Linha com ◀ Anterior, "Página N de M — total rótulo" e Próxima ▶ (esta só com linhas na página)."""
+    numero = len(st.session_state[f"{prefixo}_cursores"])
+    col_prev, col_page, col_next = st.columns([1, 2, 1])
+    col_prev.button("◀ Anterior", on_click=_pagina_anterior, args=(prefixo,),
+                    disabled=numero == 1, key=f"{prefixo}_prev")
+    col_page.write(f"Página {numero} de {pagina.total_paginas(por_pagina)} — {pagina.total} {rotulo}")
+    if pagina.linhas:
+        col_next.button("Próxima ▶", on_click=_proxima_pagina, args=(prefixo, pagina.proximo_cursor),
+                        disabled=not pagina.tem_proxima, key=f"{prefixo}_next")
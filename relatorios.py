@@ -0,0 +1,335 @@
+"""Consultas dos relatórios.
+
+KPIs e gráficos saem das tabelas de fatos diários (fatos_item_dia e
+fatos_cliente_dia, mantidas por triggers no database.py), para qualquer
+período, sem carregar linhas de detalhe: os fatos ficam em memória e só os
+dias alterados são relidos. O detalhe é buscado só por página, e a
+exportação lê o período inteiro em lotes.
+"""
+import argparse
+import csv
+import io
+import threading
+import time
+from datetime import date
+
+import pandas as pd
+
+import database
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # exportação em Parquet fica indisponível
+    pa = None
+    pq = None
+
+
+# =======================================================
+#              KPIs E GRÁFICOS (FATOS DIÁRIOS)
+# =======================================================
+@database.em_cache("agendamentos", "agendamento_itens")
+def periodo_relatorio():
+    """(primeiro início, último fim) entre todos os agendamentos, ou None se não houver."""
+    with database.conexao() as conn:
+        row = conn.execute("""
+            SELECT (SELECT MIN(data_inicio) FROM agendamentos), (SELECT MAX(data_fim) FROM agendamentos)
+        """).fetchone()
+    return row if row[0] is not None else None
+
+
+# Cópia em memória das duas tabelas de fatos, com tipos compactos (dia em
+# datetime64, ids e contagens em int32), compartilhada entre as sessões. A
+# cada acesso só os dias marcados em fatos_dias_alterados depois da última
+# leitura são relidos do banco, inclusive os alterados por outro processo.
+TABELAS_FATOS = {"fatos_item_dia": "item_id", "fatos_cliente_dia": "cliente_id"}
+TIPOS_FATOS = {"receita": "float64", "quantidade": "int32", "agendamentos": "int32"}
+
+
+def _ler_fatos(conn, tabela, dias=None):
+    """Linhas da tabela de fatos (todas, ou só as dos `dias`), já nos tipos compactos."""
+    chave = TABELAS_FATOS[tabela]
+    consulta = f"SELECT dia, {chave}, receita, quantidade, agendamentos FROM {tabela}"
+    if dias is None:
+        partes = [pd.read_sql_query(consulta, conn)]
+    else:
+        partes = [
+            pd.read_sql_query(f"{consulta} WHERE dia IN ({','.join('?' * len(lote))})", conn, params=lote)
+            for lote in (dias[i:i + database.MAX_PARAMS_IN] for i in range(0, len(dias), database.MAX_PARAMS_IN))
+        ]
+    df = pd.concat(partes, ignore_index=True)
+    df["dia"] = pd.to_datetime(df["dia"], format="ISO8601")
+    return df.astype({chave: "int32", **TIPOS_FATOS})
+
+
+class BaseRelatorio:
+    """Fatos diários em memória, atualizados pela marca d'água de fatos_dias_alterados."""
+
+    def __init__(self):
+        self.fatos = None
+        self.marca = 0
+        self._lock = threading.Lock()
+        self.cargas_completas = 0
+        self.cargas_incrementais = 0
+        self.linhas_lidas = 0
+        self.ultima_duracao = 0.0
+
+    def dados(self):
+        """{tabela: DataFrame ordenado por dia}. Compartilhado entre sessões: filtre/copie, não altere."""
+        with self._lock:
+            t0 = time.perf_counter()
+            with database.conexao() as conn:
+                # mesma foto do banco para a marca d'água e para as linhas
+                conn.execute("BEGIN")
+                marca = conn.execute("SELECT COALESCE(MAX(seq), 0) FROM fatos_dias_alterados").fetchone()[0]
+                if self.fatos is None:
+                    self.fatos = {tabela: _ler_fatos(conn, tabela) for tabela in TABELAS_FATOS}
+                    self.cargas_completas += 1
+                    self.linhas_lidas += sum(len(df) for df in self.fatos.values())
+                elif marca > self.marca:
+                    dias = [r[0] for r in conn.execute(
+                        "SELECT dia FROM fatos_dias_alterados WHERE seq > ?", (self.marca,)
+                    )]
+                    alterados = pd.to_datetime(dias, format="ISO8601")
+                    novos = {}
+                    for tabela, atual in self.fatos.items():
+                        lidos = _ler_fatos(conn, tabela, dias)
+                        # dias sem fatos agora (ex.: agendamentos excluídos) só saem
+                        mantidos = atual[~atual["dia"].isin(alterados)]
+                        novos[tabela] = pd.concat([mantidos, lidos], ignore_index=True).sort_values(
+                            "dia", kind="stable", ignore_index=True
+                        )
+                        self.linhas_lidas += len(lidos)
+                    self.fatos = novos  # troca inteira: quem já tem o dict anterior não vê mudança no meio
+                    self.cargas_incrementais += 1
+                self.marca = marca
+            self.ultima_duracao = time.perf_counter() - t0
+            return self.fatos
+
+    def estatisticas(self):
+        with self._lock:
+            return {
+                "marca": self.marca,
+                "linhas": 0 if self.fatos is None else sum(len(df) for df in self.fatos.values()),
+                "memoria_bytes": 0 if self.fatos is None else int(
+                    sum(df.memory_usage(deep=True).sum() for df in self.fatos.values())
+                ),
+                "cargas_completas": self.cargas_completas,
+                "cargas_incrementais": self.cargas_incrementais,
+                "linhas_lidas": self.linhas_lidas,
+                "ultima_duracao": self.ultima_duracao,
+            }
+
+
+_bases = {}
+_bases_lock = threading.Lock()
+
+
+@database.recurso_compartilhado
+def _criar_base(db_path):
+    with _bases_lock:
+        if db_path not in _bases:
+            _bases[db_path] = BaseRelatorio()
+        return _bases[db_path]
+
+
+def obter_base_relatorio():
+    return _criar_base(str(database.DB_PATH))
+
+
+def _fatos_periodo(tabela, inicio, fim):
+    """Linhas da tabela de fatos com dia entre inicio e fim (busca binária no dia ordenado)."""
+    df = obter_base_relatorio().dados()[tabela]
+    de = df["dia"].searchsorted(pd.Timestamp(inicio), side="left")
+    ate = df["dia"].searchsorted(pd.Timestamp(fim), side="right")
+    return df.iloc[de:ate]
+
+
+def kpis_periodo(inicio, fim):
+    """Agendamentos, receita, itens locados e ticket médio dos agendamentos que começam no período."""
+    fatos = _fatos_periodo("fatos_cliente_dia", inicio, fim)
+    agendamentos = int(fatos["agendamentos"].sum())
+    receita = float(fatos["receita"].sum())
+    return {
+        "agendamentos": agendamentos,
+        "receita": receita,
+        "quantidade": int(fatos["quantidade"].sum()),
+        "ticket_medio": receita / agendamentos if agendamentos else 0.0,
+    }
+
+
+def receita_por_dia(inicio, fim):
+    """DataFrame (dia, receita) pela data de início dos agendamentos."""
+    fatos = _fatos_periodo("fatos_cliente_dia", inicio, fim)
+    return fatos.groupby("dia", as_index=False, sort=True)["receita"].sum()
+
+
+def receita_por_item(inicio, fim, limite=20):
+    """DataFrame (item, receita, quantidade) dos itens com maior receita no período."""
+    fatos = _fatos_periodo("fatos_item_dia", inicio, fim)
+    top = fatos.groupby("item_id")[["receita", "quantidade"]].sum().nlargest(limite, "receita")
+    nomes = database.obter_itens([int(i) for i in top.index])
+    top.insert(0, "item", [nomes[i][1] if i in nomes else f"#{i}" for i in top.index])
+    return top.reset_index(drop=True)
+
+
+def agendamentos_por_mes(inicio, fim):
+    """DataFrame (mes, agendamentos) pela data de início; mes é o primeiro dia do mês."""
+    fatos = _fatos_periodo("fatos_cliente_dia", inicio, fim)
+    meses = fatos["dia"].dt.to_period("M").dt.to_timestamp().rename("mes")
+    return fatos.groupby(meses, sort=True)["agendamentos"].sum().reset_index()
+
+
+# =======================================================
+#              DETALHE (PAGINADO / EXPORTAÇÃO)
+# =======================================================
+COLUNAS_DETALHE = [
+    "agendamento_id", "item", "cliente", "quantidade", "valor_unitario",
+    "valor_total", "data_inicio", "data_fim", "status",
+]
+
+# ordenações aceitas -> expressão SQL (nunca interpolar texto vindo da página)
+ORDENACOES_DETALHE = {
+    "inicio": "a.data_inicio",
+    "fim": "a.data_fim",
+    "agendamento": "a.id",
+    "item": "i.nome",
+    "cliente": "c.nome || ' ' || c.sobrenome",
+    "quantidade": "ai.quantidade",
+    "valor": "ai.valor_total",
+    "status": "a.status",
+}
+
+TAMANHO_LOTE_EXPORTACAO = 5000
+FORMATOS_EXPORTACAO = ["csv", "parquet"] if pq is not None else ["csv"]
+
+
+def _consulta_detalhe(ordem, decrescente):
+    if ordem not in ORDENACOES_DETALHE:
+        raise ValueError(f"ordenação desconhecida: {ordem}")
+    direcao = "DESC" if decrescente else "ASC"
+    return f"""
+        SELECT a.id, i.nome, c.nome || ' ' || c.sobrenome, ai.quantidade, ai.valor_unitario,
+               ai.valor_total, a.data_inicio, a.data_fim, a.status
+        FROM agendamentos a
+        JOIN agendamento_itens ai ON ai.agendamento_id = a.id
+        LEFT JOIN itens i ON i.id = ai.item_id
+        LEFT JOIN clientes c ON c.id = a.cliente_id
+        WHERE a.data_inicio BETWEEN ? AND ?
+        ORDER BY {ORDENACOES_DETALHE[ordem]} {direcao}, a.id {direcao}, ai.id
+    """
+
+
+@database.em_cache("agendamentos", "agendamento_itens")
+def contar_itens_agendados(inicio, fim):
+    """Linhas de detalhe (itens de agendamento) dos agendamentos que começam no período."""
+    with database.conexao() as conn:
+        total = conn.execute("""
+            SELECT COUNT(ai.id)
+            FROM agendamentos a
+            JOIN agendamento_itens ai ON ai.agendamento_id = a.id
+            WHERE a.data_inicio BETWEEN ? AND ?
+        """, (inicio, fim)).fetchone()[0]
+    return total
+
+
+def itens_agendados_periodo(inicio, fim, limite, deslocamento=0, ordem="inicio", decrescente=True):
+    """Uma página do detalhe, ordenada no banco; linhas na ordem de COLUNAS_DETALHE."""
+    with database.conexao() as conn:
+        rows = conn.execute(
+            f"{_consulta_detalhe(ordem, decrescente)} LIMIT ? OFFSET ?", (inicio, fim, limite, deslocamento)
+        ).fetchall()
+    return rows
+
+
+def lotes_itens_agendados(inicio, fim, ordem="inicio", decrescente=True, tamanho_lote=TAMANHO_LOTE_EXPORTACAO):
+    """Gera o detalhe do período em lotes lidos do cursor (fetchmany), sem montar o resultado inteiro."""
+    conn = database.get_connection()
+    try:
+        cur = conn.execute(_consulta_detalhe(ordem, decrescente), (inicio, fim))
+        while True:
+            lote = cur.fetchmany(tamanho_lote)
+            if not lote:
+                return
+            yield lote
+    finally:
+        conn.close()
+
+
+def _exportar_csv(arquivo, lotes):
+    texto = io.TextIOWrapper(arquivo, encoding="utf-8", newline="")
+    escritor = csv.writer(texto)
+    escritor.writerow(COLUNAS_DETALHE)
+    total = 0
+    for lote in lotes:
+        escritor.writerows(lote)
+        total += len(lote)
+    texto.flush()
+    texto.detach()  # não fecha o arquivo de quem chamou
+    return total
+
+
+def _exportar_parquet(arquivo, lotes):
+    if pq is None:
+        raise RuntimeError("Exportação em Parquet requer o pacote pyarrow.")
+    schema = pa.schema([
+        ("agendamento_id", pa.int64()),
+        ("item", pa.string()),
+        ("cliente", pa.string()),
+        ("quantidade", pa.int64()),
+        ("valor_unitario", pa.float64()),
+        ("valor_total", pa.float64()),
+        ("data_inicio", pa.date32()),
+        ("data_fim", pa.date32()),
+        ("status", pa.string()),
+    ])
+    datas = {"data_inicio", "data_fim"}
+    total = 0
+    with pq.ParquetWriter(arquivo, schema) as escritor:
+        for lote in lotes:
+            colunas = []
+            for campo, valores in zip(schema, zip(*lote)):
+                if campo.name in datas:
+                    valores = [date.fromisoformat(d) if d else None for d in valores]
+                colunas.append(pa.array(valores, type=campo.type))
+            escritor.write_batch(pa.record_batch(colunas, schema=schema))  # um row group por lote
+            total += len(lote)
+    return total
+
+
+def exportar_itens_agendados(arquivo, inicio, fim, formato="csv", ordem="inicio", decrescente=True,
+                             tamanho_lote=TAMANHO_LOTE_EXPORTACAO):
+    """Grava o detalhe do período em `arquivo` (binário, já aberto) lote a lote.
+
+    A memória usada depende de tamanho_lote, não do total de linhas.
+    Retorna quantas linhas foram gravadas.
+    """
+    lotes = lotes_itens_agendados(inicio, fim, ordem, decrescente, tamanho_lote)
+    if formato == "csv":
+        return _exportar_csv(arquivo, lotes)
+    if formato == "parquet":
+        return _exportar_parquet(arquivo, lotes)
+    raise ValueError(f"formato desconhecido: {formato}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Exporta o detalhe dos relatórios (itens por agendamento).")
+    parser.add_argument("saida")
+    parser.add_argument("--inicio", default="0000-01-01")
+    parser.add_argument("--fim", default="9999-12-31")
+    parser.add_argument("--formato", choices=["csv", "parquet"], default="csv")
+    parser.add_argument("--ordem", choices=list(ORDENACOES_DETALHE), default="inicio")
+    parser.add_argument("--crescente", action="store_true")
+    parser.add_argument("--lote", type=int, default=TAMANHO_LOTE_EXPORTACAO)
+    args = parser.parse_args()
+
+    t0 = time.perf_counter()
+    with open(args.saida, "wb") as arquivo:
+        linhas = exportar_itens_agendados(
+            arquivo, args.inicio, args.fim, args.formato, args.ordem, not args.crescente, args.lote
+        )
+    print(f"{linhas} linha(s) exportada(s) para {args.saida} em {time.perf_counter() - t0:.2f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,32 @@
+"""Camada de serviços: regras de negócio das páginas, sem Streamlit.
+
+Cada módulo expõe funções tipadas sobre o database.py / relatorios.py
+(agendamentos, disponibilidade, itens, clientes, relatorios); as listagens
+paginadas devolvem paginacao.Pagina. As páginas só cuidam de widgets e
+estado da sessão; o restante pode ser chamado de scripts, benchmarks e
+testes de carga, inclusive de várias threads (as conexões vêm do pool do
+database.py).
+
+    from services import agendamentos, disponibilidade
+    disp = disponibilidade.disponibilidade_itens([1, 2], "2025-01-10", "2025-01-12")
+    agendamentos.criar(7, "2025-01-10", "2025-01-12", [agendamentos.LinhaPedido(1, "Cadeira", 10, 5.0)], disp)
+"""
+from database import DisponibilidadeInsuficiente, ItemComAgendamentos, NomeItemDuplicado
+from services.erros import CpfDuplicado, DadosInvalidos
+from services import agendamentos, clientes, disponibilidade, itens, paginacao, relatorios
+from services.paginacao import Pagina
+
+__all__ = [
+    "agendamentos",
+    "clientes",
+    "disponibilidade",
+    "itens",
+    "paginacao",
+    "relatorios",
+    "CpfDuplicado",
+    "DadosInvalidos",
+    "DisponibilidadeInsuficiente",
+    "ItemComAgendamentos",
+    "NomeItemDuplicado",
+    "Pagina",
+]
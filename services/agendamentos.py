@@ -0,0 +1,144 @@
+"""Agendamentos: listagem paginada, validação e total do pedido, criação, edição e status.
+
+A disponibilidade é conferida duas vezes: aqui, contra o que o formulário
+mostrou (mensagem amigável), e de novo no database.py dentro da transação
+(DisponibilidadeInsuficiente, com os conflitos reais no momento da gravação).
+"""
+from collections.abc import Iterable
+from dataclasses import dataclass
+
+import database
+from services.disponibilidade import Data, Disponibilidade, data_iso
+from services.erros import DadosInvalidos
+from services.paginacao import Cursor, Pagina, montar_pagina
+
+STATUS_AGENDAMENTO = ["Em andamento", "Encerrado", "Cancelado"]
+
+
+@dataclass(frozen=True)
+class LinhaPedido:
+    item_id: int
+    nome: str
+    quantidade: int
+    valor_unitario: float
+
+    @property
+    def valor_total(self) -> float:
+        return self.quantidade * self.valor_unitario
+
+    def como_dict(self) -> dict:
+        """Formato esperado por database.criar_agendamento / atualizar_agendamento."""
+        return {"item_id": self.item_id, "quantidade": self.quantidade, "valor_unitario": self.valor_unitario}
+
+
+@dataclass(frozen=True)
+class Filtros:
+    status: str | None = None
+    cliente_id: int | None = None
+    data_de: Data | None = None
+    data_ate: Data | None = None
+
+    def como_kwargs(self) -> dict:
+        return {
+            "status": self.status,
+            "cliente_id": self.cliente_id,
+            "data_de": data_iso(self.data_de) if self.data_de else None,
+            "data_ate": data_iso(self.data_ate) if self.data_ate else None,
+        }
+
+
+# =======================================================
+#              CONSULTAS
+# =======================================================
+def _cursor(linha: dict) -> Cursor:
+    ag = linha["agendamento"]
+    return ag[3], ag[0]  # (data_inicio, id)
+
+
+def listar_pagina(filtros: Filtros, por_pagina: int, cursor: Cursor | None = None) -> Pagina[dict]:
+    """Página de agendamentos (com itens) a partir do cursor, mais o total para os filtros.
+
+    Cada linha é {"agendamento": (...), "itens": [(...), ...]} (ver listar_agendamentos_completos).
+    """
+    kwargs = filtros.como_kwargs()
+    linhas = database.listar_agendamentos_completos(limite=por_pagina + 1, apos=cursor, **kwargs)
+    return montar_pagina(linhas, por_pagina, database.contar_agendamentos(**kwargs), _cursor)
+
+
+def obter(agendamento_id: int) -> tuple | None:
+    """(id, cliente_id, data_inicio, data_fim, valor_total, status) ou None."""
+    return database.obter_agendamento(agendamento_id)
+
+
+def linhas_do_agendamento(itens: Iterable[tuple]) -> dict[int, LinhaPedido]:
+    """{item_id: LinhaPedido} a partir dos itens que vêm na listagem (para preencher a edição)."""
+    return {
+        item_id: LinhaPedido(item_id, nome, int(quantidade), float(valor_unitario or 0.0))
+        for _, item_id, nome, quantidade, valor_unitario, _ in itens
+    }
+
+
+# =======================================================
+#              PEDIDO: TOTAL E VALIDAÇÃO
+# =======================================================
+def total_pedido(linhas: Iterable[LinhaPedido]) -> float:
+    return sum(linha.valor_total for linha in linhas)
+
+
+def validar_pedido(cliente_id: int | None, inicio: Data, fim: Data, linhas: Iterable[LinhaPedido],
+                   disponibilidade: dict[int, Disponibilidade] | None = None) -> list[str]:
+    """Mensagens de erro do pedido (lista vazia = válido). Linhas com quantidade 0 são ignoradas."""
+    linhas = [linha for linha in linhas if linha.quantidade > 0]
+    erros = []
+    if cliente_id is None:
+        erros.append("Selecione um cliente.")
+    if data_iso(fim) < data_iso(inicio):
+        erros.append("Data fim não pode ser anterior à data início.")
+    if not linhas:
+        erros.append("Adicione ao menos 1 item com quantidade maior que zero.")
+    for linha in linhas:
+        disp = (disponibilidade or {}).get(linha.item_id)
+        if disp is not None and linha.quantidade > disp.disponivel:
+            erros.append(f"Sem disponibilidade suficiente para {linha.nome}. Disponível: {disp.disponivel}")
+    return erros
+
+
+def _linhas_validas(cliente_id, inicio, fim, linhas, disponibilidade):
+    linhas = list(linhas)
+    erros = validar_pedido(cliente_id, inicio, fim, linhas, disponibilidade)
+    if erros:
+        raise DadosInvalidos(erros)
+    return [linha.como_dict() for linha in linhas if linha.quantidade > 0]
+
+
+# =======================================================
+#              ESCRITAS
+# =======================================================
+def criar(cliente_id: int | None, inicio: Data, fim: Data, linhas: Iterable[LinhaPedido],
+          disponibilidade: dict[int, Disponibilidade] | None = None) -> int:
+    """Cria o agendamento; retorna o id.
+
+    DadosInvalidos se o pedido não passar na validação;
+    DisponibilidadeInsuficiente se outra reserva ocupou as unidades antes da gravação.
+    """
+    itens = _linhas_validas(cliente_id, inicio, fim, linhas, disponibilidade)
+    return database.criar_agendamento(cliente_id, data_iso(inicio), data_iso(fim), itens)
+
+
+def atualizar(agendamento_id: int, cliente_id: int | None, inicio: Data, fim: Data,
+              linhas: Iterable[LinhaPedido], disponibilidade: dict[int, Disponibilidade] | None = None) -> None:
+    """Substitui cliente, período e itens do agendamento (mesmas exceções de criar)."""
+    itens = _linhas_validas(cliente_id, inicio, fim, linhas, disponibilidade)
+    database.atualizar_agendamento(agendamento_id, cliente_id, data_iso(inicio), data_iso(fim), itens)
+
+
+def encerrar(agendamento_id: int) -> None:
+    database.atualizar_status(agendamento_id, "Encerrado")
+
+
+def cancelar(agendamento_id: int) -> None:
+    database.atualizar_status(agendamento_id, "Cancelado")
+
+
+def excluir(agendamento_id: int) -> None:
+    database.excluir_agendamento(agendamento_id)
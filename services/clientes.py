@@ -0,0 +1,88 @@
+"""Clientes: página com busca, validação (CPF, idade, obrigatórios) e cadastro."""
+import sqlite3
+from datetime import date, timedelta
+
+import database
+from services.erros import CpfDuplicado, DadosInvalidos
+from services.paginacao import Cursor, Pagina, montar_pagina
+
+
+def cpf_valido(cpf: str) -> bool:
+    """Confere os dígitos verificadores (aceita CPF formatado)."""
+    cpf = database.normalizar_cpf(cpf)
+    if len(cpf) != 11 or cpf == cpf[0] * 11:
+        return False
+    dig1 = sum(int(cpf[i]) * (10 - i) for i in range(9)) * 10 % 11 % 10
+    dig2 = sum(int(cpf[i]) * (11 - i) for i in range(10)) * 10 % 11 % 10
+    return dig1 == int(cpf[9]) and dig2 == int(cpf[10])
+
+
+def data_nascimento_maxima(hoje: date | None = None) -> date:
+    """Nascidos depois desta data ainda não têm a idade mínima."""
+    return (hoje or date.today()) - timedelta(days=database.IDADE_MINIMA_DIAS)
+
+
+def listar_pagina(busca: str, por_pagina: int, cursor: Cursor | None = None) -> Pagina[tuple]:
+    """Linhas (id, nome, sobrenome, email, telefone, cpf); o cursor é (nome completo, id)."""
+    busca = busca.strip()
+    linhas = database.listar_clientes_paginado(busca, limite=por_pagina + 1, cursor=cursor)
+    return montar_pagina(linhas, por_pagina, database.contar_clientes(busca), lambda c: (f"{c[1]} {c[2]}", c[0]))
+
+
+def obter(cliente_id: int) -> tuple | None:
+    """(id, nome, sobrenome, data_nascimento, email, telefone, cpf) ou None."""
+    return database.obter_cliente(cliente_id)
+
+
+def opcoes(busca: str, limite: int) -> list[tuple]:
+    """Até `limite` clientes para um seletor com busca (mesmas colunas da listagem)."""
+    return database.opcoes_clientes(busca, limite)
+
+
+def existe_algum() -> bool:
+    return bool(database.listar_clientes_paginado(limite=1))
+
+
+def cpfs_duplicados() -> list[tuple]:
+    return database.cpfs_duplicados()
+
+
+def validar(nome: str, sobrenome: str, data_nascimento: date | None, email: str, cpf: str) -> list[str]:
+    """Mensagens de erro do cadastro (lista vazia = válido)."""
+    erros = []
+    if not all(campo.strip() for campo in (nome, sobrenome, email, cpf)):
+        erros.append("Nome, sobrenome, e-mail e CPF são obrigatórios.")
+    elif not cpf_valido(cpf):
+        erros.append("CPF inválido. Verifique e tente novamente.")
+    if data_nascimento is not None and data_nascimento > data_nascimento_maxima():
+        erros.append("O cliente deve ter ao menos 18 anos.")
+    return erros
+
+
+def _gravar(gravar, cliente_id, nome, sobrenome, data_nascimento, email, telefone, cpf):
+    erros = validar(nome, sobrenome, data_nascimento, email, cpf)
+    if erros:
+        raise DadosInvalidos(erros)
+    campos = (nome.strip(), sobrenome.strip(), data_nascimento.isoformat() if data_nascimento else None,
+              email.strip(), (telefone or "").strip(), cpf.strip())
+    try:
+        return gravar(*cliente_id, *campos)
+    except sqlite3.IntegrityError as e:
+        if "UNIQUE constraint failed" in str(e):
+            raise CpfDuplicado(database.normalizar_cpf(cpf)) from e
+        raise
+
+
+def cadastrar(nome: str, sobrenome: str, data_nascimento: date | None, email: str, telefone: str,
+              cpf: str) -> int:
+    """Cadastra o cliente; retorna o id. DadosInvalidos ou CpfDuplicado em caso de recusa."""
+    return _gravar(database.inserir_cliente, (), nome, sobrenome, data_nascimento, email, telefone, cpf)
+
+
+def atualizar(cliente_id: int, nome: str, sobrenome: str, data_nascimento: date | None, email: str,
+              telefone: str, cpf: str) -> None:
+    _gravar(database.atualizar_cliente, (cliente_id,), nome, sobrenome, data_nascimento, email, telefone, cpf)
+
+
+def excluir(cliente_id: int) -> None:
+    database.excluir_cliente(cliente_id)
@@ -0,0 +1,61 @@
+"""Disponibilidade de itens num período: estoque menos o pico de unidades locadas."""
+from collections.abc import Iterable
+from dataclasses import dataclass
+from datetime import date
+
+import database
+
+Data = date | str
+
+
+def data_iso(valor: Data) -> str:
+    """'AAAA-MM-DD' de uma data ou de um texto que já começa em ISO."""
+    return valor.isoformat() if isinstance(valor, date) else str(valor)[:10]
+
+
+@dataclass(frozen=True)
+class Disponibilidade:
+    item_id: int
+    nome: str
+    descricao: str
+    total: int
+    locadas: int  # pico de unidades locadas ao mesmo tempo no período
+
+    @property
+    def disponivel(self) -> int:
+        return max(0, self.total - self.locadas)
+
+
+def disponibilidade_itens(item_ids: Iterable[int], inicio: Data, fim: Data,
+                          ignorar_agendamento_id: int | None = None) -> dict[int, Disponibilidade]:
+    """{item_id: Disponibilidade} dos itens pedidos que existem, na ordem pedida.
+
+    Na edição, `ignorar_agendamento_id` desconta o próprio agendamento (a
+    disponibilidade fica "ajustada": as unidades dele contam como livres).
+    """
+    ids = list(dict.fromkeys(item_ids))
+    itens = database.obter_itens(ids)
+    locadas = database.quantidades_locadas_no_periodo(
+        [i for i in ids if i in itens], data_iso(inicio), data_iso(fim), ignorar_agendamento_id=ignorar_agendamento_id
+    )
+    return {
+        i: Disponibilidade(i, itens[i][1], itens[i][2] or "", int(itens[i][3]), locadas[i])
+        for i in ids if i in itens
+    }
+
+
+def disponibilidade_catalogo(inicio: Data, fim: Data) -> list[Disponibilidade]:
+    """Todos os itens (ordem do catálogo) com o pico locado no período; uma consulta de ocupação."""
+    itens = database.listar_itens()
+    # None = só os itens com reservas no período; os demais têm 0 locadas
+    locadas = database.quantidades_locadas_no_periodo(None, data_iso(inicio), data_iso(fim))
+    return [
+        Disponibilidade(item_id, nome, descricao or "", int(total), locadas.get(item_id, 0))
+        for item_id, nome, descricao, total in itens
+    ]
+
+
+def curva_disponibilidade(item: Disponibilidade, inicio: Data, fim: Data) -> list[tuple[date, int, int]]:
+    """Dia a dia no período: (dia, disponíveis, locadas)."""
+    curva = database.curva_ocupacao([item.item_id], data_iso(inicio), data_iso(fim))[item.item_id]
+    return [(dia, max(0, item.total - ocupado), ocupado) for dia, ocupado in curva]
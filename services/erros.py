@@ -0,0 +1,17 @@
+"""Exceções dos serviços (as do banco, como DisponibilidadeInsuficiente, vêm do database.py)."""
+
+
+class DadosInvalidos(ValueError):
+    """Entrada recusada pela validação; `erros` traz as mensagens na ordem das regras."""
+
+    def __init__(self, erros: list[str]):
+        self.erros = list(erros)
+        super().__init__("; ".join(self.erros))
+
+
+class CpfDuplicado(Exception):
+    """Já existe outro cliente com o mesmo CPF (comparado só pelos dígitos)."""
+
+    def __init__(self, cpf: str):
+        self.cpf = cpf
+        super().__init__(f"CPF já cadastrado: {cpf}")
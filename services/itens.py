@@ -0,0 +1,88 @@
+"""Itens do catálogo: página (listagem ou busca), cadastro com validação e exportação CSV."""
+import pandas as pd
+
+import database
+from services.erros import DadosInvalidos
+from services.paginacao import Cursor, Pagina, montar_pagina
+
+COLUNAS_ITEM = ["id", "nome", "descricao", "quantidade_total"]
+
+
+def listar_pagina(busca: str, por_pagina: int, cursor: Cursor | None = None,
+                  numero_pagina: int = 1) -> Pagina[tuple]:
+    """Sem busca: ordem por nome a partir do cursor. Com busca: página `numero_pagina` (ver database.buscar_itens).
+
+    Linhas (id, nome, descricao, quantidade_total); o cursor é (nome, id) e só vale sem busca.
+    """
+    busca = busca.strip()
+    if busca:
+        total = database.contar_busca_itens(busca)
+        linhas = database.buscar_itens(busca, por_pagina + 1, (numero_pagina - 1) * por_pagina)
+    else:
+        total = database.contar_itens()
+        linhas = database.listar_itens_paginado(limite=por_pagina + 1, cursor=cursor)
+    return montar_pagina(linhas, por_pagina, total, lambda item: (item[1], item[0]))
+
+
+def obter(item_id: int) -> tuple | None:
+    return database.obter_item(item_id)
+
+
+def obter_varios(item_ids) -> dict[int, tuple]:
+    """{id: (id, nome, descricao, quantidade_total)} dos itens que ainda existem."""
+    return database.obter_itens(item_ids)
+
+
+def opcoes(busca: str, limite: int) -> list[tuple]:
+    """Até `limite` itens cujo nome ou descrição contém `busca` (a mesma busca da página de Itens)."""
+    return database.opcoes_itens(busca, limite)
+
+
+def existe_algum() -> bool:
+    return bool(database.listar_itens_paginado(limite=1))
+
+
+def renomeados() -> list[tuple]:
+    """(id, nome anterior, nome atual, renomeado em) dos itens renomeados por nome duplicado."""
+    return database.itens_renomeados()
+
+
+def _validar(nome: str, quantidade: int) -> None:
+    erros = []
+    if not nome.strip():
+        erros.append("O nome do item é obrigatório.")
+    if int(quantidade) < 1:
+        erros.append("A quantidade total deve ser maior que zero.")
+    if erros:
+        raise DadosInvalidos(erros)
+
+
+def cadastrar(nome: str, descricao: str, quantidade: int) -> int:
+    """Cadastra o item; retorna o id. DadosInvalidos ou NomeItemDuplicado em caso de recusa."""
+    _validar(nome, quantidade)
+    return database.inserir_item(nome.strip(), (descricao or "").strip(), int(quantidade))
+
+
+def atualizar(item_id: int, nome: str, descricao: str, quantidade: int) -> None:
+    _validar(nome, quantidade)
+    database.atualizar_item(item_id, nome.strip(), (descricao or "").strip(), int(quantidade))
+
+
+def excluir(item_id: int) -> None:
+    """ItemComAgendamentos se o item ainda aparece em algum agendamento."""
+    database.excluir_item(item_id)
+
+
+def exportar_csv() -> str:
+    """CSV do catálogo inteiro (gerado só quando a exportação é pedida)."""
+    return pd.DataFrame(database.listar_itens(), columns=COLUNAS_ITEM).to_csv(index=False)
+
+
+def exportar_csv_filtrados(busca: str) -> str:
+    """CSV dos itens que a página mostra: os da busca (por relevância) ou todos por nome."""
+    busca = busca.strip()
+    if busca:
+        linhas = database.buscar_itens(busca, database.contar_busca_itens(busca))
+    else:
+        linhas = database.listar_itens_paginado(limite=database.contar_itens())
+    return pd.DataFrame(linhas, columns=COLUNAS_ITEM).to_csv(index=False)
@@ -0,0 +1,25 @@
+"""Página de uma listagem por cursor (keyset), comum a agendamentos, itens e clientes."""
+from collections.abc import Callable
+from dataclasses import dataclass
+from typing import Generic, TypeVar
+
+T = TypeVar("T")
+Cursor = tuple[str, int]  # (chave de ordenação, id) do último registro da página
+
+
+@dataclass(frozen=True)
+class Pagina(Generic[T]):
+    linhas: list[T]
+    total: int
+    tem_proxima: bool
+    proximo_cursor: Cursor | None = None
+
+    def total_paginas(self, por_pagina: int) -> int:
+        return max(1, (self.total + por_pagina - 1) // por_pagina)
+
+
+def montar_pagina(linhas: list[T], por_pagina: int, total: int, cursor_de: Callable[[T], Cursor]) -> Pagina[T]:
+    """Recebe até por_pagina + 1 linhas (a sobra só indica que há página seguinte)."""
+    visiveis = linhas[:por_pagina]
+    cursor = cursor_de(visiveis[-1]) if visiveis else None
+    return Pagina(visiveis, total, len(linhas) > por_pagina, cursor)
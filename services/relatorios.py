@@ -0,0 +1,95 @@
+"""Relatórios prontos para exibir: KPIs, séries dos gráficos e detalhe paginado em DataFrames."""
+import os
+from datetime import date
+from typing import BinaryIO
+
+import pandas as pd
+
+import database
+import relatorios
+from services.disponibilidade import Data, data_iso
+
+FORMATOS_EXPORTACAO = relatorios.FORMATOS_EXPORTACAO
+# acima disso a exportação não passa pelo navegador (o download fica inteiro
+# em memória no servidor): vai direto para arquivo pela linha de comando
+LIMITE_EXPORTACAO_TELA = int(os.environ.get("MTA_LIMITE_EXPORTACAO_TELA", "100000"))
+
+# rótulo exibido -> chave de relatorios.ORDENACOES_DETALHE
+ORDENACOES = {
+    "Início": "inicio",
+    "Fim": "fim",
+    "ID": "agendamento",
+    "Item": "item",
+    "Cliente": "cliente",
+    "Qtd": "quantidade",
+    "Valor Item (R$)": "valor",
+    "Status": "status",
+}
+COLUNAS_EXIBICAO = ["ID", "Item", "Cliente", "Qtd", "Valor Unit (R$)", "Valor Item (R$)", "Início", "Fim", "Status"]
+
+
+def periodo() -> tuple[date, date] | None:
+    """(primeiro início, último fim) entre todos os agendamentos, ou None se não houver."""
+    total = relatorios.periodo_relatorio()
+    return None if total is None else (date.fromisoformat(total[0]), date.fromisoformat(total[1]))
+
+
+def kpis(inicio: Data, fim: Data) -> dict:
+    """{"agendamentos", "receita", "quantidade", "ticket_medio"} dos agendamentos que começam no período."""
+    return relatorios.kpis_periodo(data_iso(inicio), data_iso(fim))
+
+
+def receita_diaria(inicio: Data, fim: Data) -> pd.DataFrame:
+    return relatorios.receita_por_dia(data_iso(inicio), data_iso(fim)).rename(
+        columns={"dia": "data", "receita": "valor_total"})
+
+
+def ocupacao_itens(inicio: Data, fim: Data) -> pd.DataFrame:
+    """Diárias locadas e pico por item (da tabela ocupacao_diaria)."""
+    return pd.DataFrame(database.ocupacao_por_item(data_iso(inicio), data_iso(fim)),
+                        columns=["item_id", "item_nome", "diarias", "pico"])
+
+
+def receita_itens(inicio: Data, fim: Data, limite: int = 20) -> pd.DataFrame:
+    return relatorios.receita_por_item(data_iso(inicio), data_iso(fim), limite=limite).rename(
+        columns={"item": "item_nome", "receita": "valor_total"})
+
+
+def agendamentos_mes(inicio: Data, fim: Data) -> pd.DataFrame:
+    return relatorios.agendamentos_por_mes(data_iso(inicio), data_iso(fim))
+
+
+def contar_detalhe(inicio: Data, fim: Data) -> int:
+    return relatorios.contar_itens_agendados(data_iso(inicio), data_iso(fim))
+
+
+def pagina_detalhe(inicio: Data, fim: Data, ordem: str, decrescente: bool, por_pagina: int,
+                   pagina: int = 1) -> pd.DataFrame:
+    """Página `pagina` do detalhe (itens por agendamento), ordenada no banco; colunas de COLUNAS_EXIBICAO."""
+    df = pd.DataFrame(
+        relatorios.itens_agendados_periodo(
+            data_iso(inicio), data_iso(fim), por_pagina, (pagina - 1) * por_pagina,
+            ordem=ORDENACOES[ordem], decrescente=decrescente,
+        ),
+        columns=COLUNAS_EXIBICAO,
+    )
+    df["Início"] = pd.to_datetime(df["Início"])
+    df["Fim"] = pd.to_datetime(df["Fim"])
+    return df
+
+
+def comando_exportacao(inicio: Data, fim: Data, formato: str = "csv", ordem: str = "Início",
+                       decrescente: bool = True) -> str:
+    """Linha de comando do relatorios.py que grava a mesma exportação direto em arquivo."""
+    partes = ["python relatorios.py", f"relatorio.{formato}", f"--inicio {data_iso(inicio)}", f"--fim {data_iso(fim)}",
+              f"--formato {formato}", f"--ordem {ORDENACOES[ordem]}"]
+    if not decrescente:
+        partes.append("--crescente")
+    return " ".join(partes)
+
+
+def exportar(arquivo: BinaryIO, inicio: Data, fim: Data, formato: str = "csv", ordem: str = "Início",
+             decrescente: bool = True) -> int:
+    """Grava o detalhe do período em `arquivo` lote a lote; retorna quantas linhas foram gravadas."""
+    return relatorios.exportar_itens_agendados(arquivo, data_iso(inicio), data_iso(fim), formato,
+                                               ORDENACOES[ordem], decrescente)
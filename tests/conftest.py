@@ -0,0 +1,21 @@
+import os
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+# database.py migra o banco na importação: que não seja o database.db do repositório
+os.environ["MTA_DB_PATH"] = ":memory:"
+
+import database  # noqa: E402
+
+
+@pytest.fixture
+def banco(tmp_path, monkeypatch):
+    """database.py apontado para um banco novo, já migrado, em tmp_path."""
+    monkeypatch.setattr(database, "DB_PATH", tmp_path / "teste.db")
+    database.init_db()
+    yield database
+    database.obter_gerenciador().definir_rastreador(None)
+    database.obter_gerenciador().fechar_todas()
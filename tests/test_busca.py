@@ -0,0 +1,29 @@
+"""O seletor de itens do agendamento acha o mesmo que a busca da página de Itens."""
+import pytest
+
+ITENS = [
+    ("Cadeira Tiffany", "cadeira de madeira dourada"),
+    ("Mesa Provençal", "mesa redonda para 8 cadeiras"),
+    ("Toalha Branca", "toalha de linho"),
+    ("Taça de Cristal", None),
+]
+
+
+@pytest.fixture
+def catalogo(banco):
+    for nome, descricao in ITENS:
+        banco.inserir_item(nome, descricao, 10)
+    return banco
+
+
+@pytest.mark.parametrize("texto", ["", "ca", "cad", "cadeira", "CADEIRA", "linho", "madeira", "xyz"])
+def test_seletor_igual_a_busca(catalogo, texto):
+    esperado = catalogo.listar_itens_paginado(limite=50) if not texto else catalogo.buscar_itens(texto, 50)
+    assert catalogo.opcoes_itens(texto, 50) == esperado
+
+
+def test_seletor_digitado_aos_poucos(catalogo):
+    catalogo.cache_leituras.limpar()
+    for fim in range(1, len("cadeiras") + 1):
+        texto = "cadeiras"[:fim]
+        assert {r[0] for r in catalogo.opcoes_itens(texto, 50)} == {r[0] for r in catalogo.buscar_itens(texto, 50)}
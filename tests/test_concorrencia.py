@@ -0,0 +1,71 @@
+"""Sessões simultâneas lendo e gravando no mesmo banco (WAL, busy_timeout e retentativas).
+
+Versão curta de benchmarks/stress_concorrencia.py: nenhum "database is
+locked" pode chegar até a sessão.
+"""
+import random
+import sqlite3
+import threading
+import time
+from datetime import date, timedelta
+
+SESSOES = 6
+SEGUNDOS = 1.0
+PROPORCAO_ESCRITA = 0.3
+
+
+def sessao(banco, cliente_id, item_ids, seed, resultado):
+    rnd = random.Random(seed)
+    hoje = date.today()
+    leituras = escritas = erros_lock = 0
+    fim_teste = time.perf_counter() + SEGUNDOS
+    while time.perf_counter() < fim_teste:
+        inicio = hoje + timedelta(days=rnd.randint(0, 30))
+        fim = inicio + timedelta(days=rnd.randint(0, 7))
+        try:
+            if rnd.random() < PROPORCAO_ESCRITA:
+                ag_id = banco.inserir_agendamento_base(cliente_id, inicio.isoformat(), fim.isoformat(), 10.0)
+                banco.inserir_item_agendamento(ag_id, rnd.choice(item_ids), 1, 10.0, 10.0)
+                if rnd.random() < 0.2:
+                    banco.atualizar_status(ag_id, "Cancelado")
+                escritas += 1
+            else:
+                banco.quantidades_locadas_no_periodo(None, inicio.isoformat(), fim.isoformat())
+                banco.listar_itens()
+                leituras += 1
+        except sqlite3.OperationalError as e:
+            if not banco.banco_ocupado(e):
+                raise
+            erros_lock += 1
+    resultado.append((leituras, escritas, erros_lock))
+
+
+def test_sessoes_simultaneas_sem_lock(banco):
+    with banco.conexao() as conn:
+        assert conn.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+        assert conn.execute("PRAGMA busy_timeout").fetchone()[0] == int(banco.SQLITE_PRAGMAS["busy_timeout"])
+
+    item_ids = [banco.inserir_item(f"Item {i}", "", 100) for i in range(20)]
+    cliente_id = banco.inserir_cliente("Cliente", "Stress", None, "stress@example.com", "", "00000000000")
+
+    resultado, falhas = [], []
+
+    def rodar(seed):
+        try:
+            sessao(banco, cliente_id, item_ids, seed, resultado)
+        except Exception as e:  # noqa: BLE001 - qualquer outro erro reprova o teste
+            falhas.append(e)
+
+    threads = [threading.Thread(target=rodar, args=(s,)) for s in range(SESSOES)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert not falhas
+    leituras = sum(r[0] for r in resultado)
+    escritas = sum(r[1] for r in resultado)
+    assert leituras and escritas
+    assert sum(r[2] for r in resultado) == 0
+    assert banco.verificar_ocupacao_diaria() == []
+    assert banco.verificar_fatos_relatorio() == []
@@ -0,0 +1,37 @@
+"""ocupacao_diaria continua consistente quando itens são excluídos."""
+import pytest
+
+INICIO, FIM = "2030-03-01", "2030-03-03"
+
+
+def test_excluir_item_com_agendamentos_e_recusado(banco):
+    cliente_id = banco.inserir_cliente("Cliente", "Ocupação", None, "o@example.com", "", "00000000000")
+    usado = banco.inserir_item("Tenda", "", 5)
+    livre = banco.inserir_item("Mesa", "", 5)
+    banco.criar_agendamento(cliente_id, INICIO, FIM, [{"item_id": usado, "quantidade": 2, "valor_unitario": 10}])
+    antes = banco.ocupacao_por_item(INICIO, FIM)
+
+    with pytest.raises(banco.ItemComAgendamentos) as erro:
+        banco.excluir_item(usado)
+    assert erro.value.agendamentos == 1
+    assert banco.obter_item(usado) is not None
+
+    banco.excluir_item(livre)
+    assert banco.obter_item(livre) is None
+
+    assert banco.verificar_ocupacao_diaria() == []
+    ocupacao = banco.ocupacao_por_item(INICIO, FIM)
+    assert ocupacao == antes
+    assert all(nome is not None for _, nome, _, _ in ocupacao)
+
+
+def test_excluir_item_depois_de_excluir_agendamentos(banco):
+    cliente_id = banco.inserir_cliente("Cliente", "Ocupação", None, "o@example.com", "", "00000000000")
+    item_id = banco.inserir_item("Tenda", "", 5)
+    ag_id = banco.criar_agendamento(cliente_id, INICIO, FIM, [{"item_id": item_id, "quantidade": 2, "valor_unitario": 10}])
+
+    banco.excluir_agendamento(ag_id)
+    banco.excluir_item(item_id)
+
+    assert banco.verificar_ocupacao_diaria() == []
+    assert banco.ocupacao_por_item(INICIO, FIM) == []
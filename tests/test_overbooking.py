@@ -0,0 +1,66 @@
+"""Corrida de reservas: várias threads disputando as últimas unidades de um item.
+
+Versão curta de benchmarks/stress_overbooking.py (que usa processos): com a
+checagem dentro da transação, as reservas aceitas nunca passam do estoque.
+"""
+import threading
+
+import pytest
+
+ESTOQUE = 5
+THREADS = 6
+TENTATIVAS = 4
+INICIO, FIM = "2030-01-01", "2030-01-07"
+
+
+def test_corrida_sem_overbooking(banco):
+    item_id = banco.inserir_item("Item disputado", "", ESTOQUE)
+    cliente_id = banco.inserir_cliente("Cliente", "Corrida", None, "corrida@example.com", "", "00000000000")
+
+    barreira = threading.Barrier(THREADS)
+    aceitas, recusadas, erros = [], [], []
+
+    def reservar():
+        barreira.wait()
+        for _ in range(TENTATIVAS):
+            try:
+                banco.criar_agendamento(cliente_id, INICIO, FIM,
+                                        [{"item_id": item_id, "quantidade": 1, "valor_unitario": 0}])
+                aceitas.append(1)
+            except banco.DisponibilidadeInsuficiente as e:
+                assert e.conflitos
+                recusadas.append(1)
+            except Exception as e:  # noqa: BLE001 - qualquer outro erro reprova o teste
+                erros.append(e)
+
+    threads = [threading.Thread(target=reservar) for _ in range(THREADS)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert not erros
+    assert len(aceitas) == ESTOQUE
+    assert len(recusadas) == THREADS * TENTATIVAS - ESTOQUE
+    assert banco.quantidade_locada_no_periodo(item_id, INICIO, FIM) == ESTOQUE
+    assert banco.verificar_ocupacao_diaria() == []
+
+
+def test_reativar_cancelado_respeita_estoque(banco):
+    item_id = banco.inserir_item("Item disputado", "", 2)
+    cliente_id = banco.inserir_cliente("Cliente", "Corrida", None, "corrida@example.com", "", "00000000000")
+    pedido = [{"item_id": item_id, "quantidade": 2, "valor_unitario": 0}]
+
+    cancelado = banco.criar_agendamento(cliente_id, INICIO, FIM, pedido)
+    banco.atualizar_status(cancelado, "Cancelado")
+    outro = banco.criar_agendamento(cliente_id, INICIO, FIM, pedido)
+
+    with pytest.raises(banco.DisponibilidadeInsuficiente) as erro:
+        banco.atualizar_status(cancelado, "Em andamento")
+    assert erro.value.conflitos[0]["disponivel"] == 0
+    assert banco.quantidade_locada_no_periodo(item_id, INICIO, FIM) == 2
+
+    banco.atualizar_status(outro, "Cancelado")
+    banco.atualizar_status(cancelado, "Em andamento")
+    assert banco.quantidade_locada_no_periodo(item_id, INICIO, FIM) == 2
+    assert banco.verificar_ocupacao_diaria() == []
@@ -0,0 +1,177 @@
+"""Regressão de planos de consulta: nenhum caminho quente pode fazer full scan.
+
+Cada caminho roda as funções reais do database.py / relatorios.py num banco
+temporário com alguns registros; cada comando SQL emitido passa por EXPLAIN
+QUERY PLAN. Os corpos dos triggers (que o rastreador não mostra) são
+verificados a partir do sqlite_master. Varreduras esperadas ficam listadas
+em PERMITIDOS, por caminho.
+"""
+import io
+import re
+import sqlite3
+from datetime import date, timedelta
+
+import pytest
+
+import relatorios
+
+HOJE = date.today()
+INICIO, FIM = HOJE.isoformat(), (HOJE + timedelta(days=30)).isoformat()
+
+# comandos que não passam pelo planejador
+IGNORAR = ("PRAGMA", "BEGIN", "COMMIT", "ROLLBACK", "SELECT 1", "CREATE", "ALTER", "ANALYZE")
+
+# comandos internos do FTS5 sobre as tabelas-sombra de itens_busca (o
+# rastreador os mostra como comentários "-- ...")
+INTERNOS_FTS5 = re.compile(r"^-- (PRAGMA 'main'\.data_version|.*'main'\.'itens_busca_(content|docsize|data|idx|config)')")
+
+# (caminho, detalhe do plano) aceitos
+PERMITIDOS = {
+    # primeira página sem filtro: percorre o índice na ordem da listagem e para no LIMIT
+    ("listagem de agendamentos", "SCAN agendamentos USING INDEX idx_agendamentos_inicio"),
+    # termo curto demais para trigramas: LIKE em nome e descrição (ver database._consulta_busca)
+    ("busca de itens (termo curto)", "SCAN i"),
+    ("busca de itens (termo curto)", "SCAN i USING INDEX sqlite_autoindex_itens_1"),
+    # primeira carga dos fatos em memória (depois só os dias alterados são relidos)
+    ("relatório (carga dos fatos)", "SCAN fatos_item_dia"),
+    ("relatório (carga dos fatos)", "SCAN fatos_cliente_dia"),
+}
+
+CAMINHOS = {
+    "disponibilidade (todos os itens)": lambda db: db.quantidades_locadas_no_periodo(None, INICIO, FIM),
+    "disponibilidade (itens selecionados)": lambda db: db.quantidades_locadas_no_periodo([1, 2], INICIO, FIM),
+    "disponibilidade (edição)": lambda db: db.quantidades_locadas_no_periodo([1], INICIO, FIM, ignorar_agendamento_id=1),
+    "curva de ocupação": lambda db: db.curva_ocupacao([1], INICIO, FIM),
+    "encerrar expirados": lambda db: db.encerrar_agendamentos_expirados(),
+    "varredura agendada (não pendente)": lambda db: db.varrer_expirados(),
+    "atualizar status": lambda db: db.atualizar_status(1, "Em andamento"),
+    "excluir agendamento": lambda db: db.excluir_agendamento(2),
+    "listagem de agendamentos": lambda db: db.listar_agendamentos_completos(limite=20),
+    "listagem de agendamentos (cursor)": lambda db: db.listar_agendamentos_completos(limite=20, apos=(FIM, 10)),
+    "listagem por status": lambda db: db.listar_agendamentos_completos(limite=20, status="Em andamento"),
+    "listagem por cliente": lambda db: db.listar_agendamentos_completos(limite=20, cliente_id=1, apos=(FIM, 10)),
+    "contagem por status": lambda db: db.contar_agendamentos(status="Cancelado"),
+    "contagem por cliente": lambda db: db.contar_agendamentos(cliente_id=1),
+    "ocupação por item (relatório)": lambda db: db.ocupacao_por_item(INICIO, FIM),
+    "criar agendamento": lambda db: db.criar_agendamento(
+        1, INICIO, FIM, [{"item_id": 1, "quantidade": 1, "valor_unitario": 10}]
+    ),
+    "editar agendamento": lambda db: db.atualizar_agendamento(
+        1, 2, INICIO, FIM, [{"item_id": 2, "quantidade": 2, "valor_unitario": 10}]
+    ),
+    "cancelar agendamento": lambda db: db.atualizar_status(1, "Cancelado"),
+    "relatório (KPIs)": lambda db: relatorios.kpis_periodo(INICIO, FIM),
+    "relatório (receita por dia)": lambda db: relatorios.receita_por_dia(INICIO, FIM),
+    "relatório (receita por item)": lambda db: relatorios.receita_por_item(INICIO, FIM),
+    "relatório (agendamentos por mês)": lambda db: relatorios.agendamentos_por_mes(INICIO, FIM),
+    "relatório (carga dos fatos)": lambda db: relatorios.BaseRelatorio().dados(),
+    "relatório (fatos alterados)": lambda db: (
+        db.atualizar_agendamento(1, 2, INICIO, FIM, [{"item_id": 2, "quantidade": 2, "valor_unitario": 10}]),
+        relatorios.kpis_periodo(INICIO, FIM),
+    ),
+    "relatório (detalhe paginado)": lambda db: (
+        relatorios.contar_itens_agendados(INICIO, FIM), relatorios.itens_agendados_periodo(INICIO, FIM, 50)
+    ),
+    "relatório (período total)": lambda db: relatorios.periodo_relatorio(),
+    "relatório (detalhe ordenado por item)": lambda db: relatorios.itens_agendados_periodo(
+        INICIO, FIM, 50, ordem="item", decrescente=False
+    ),
+    "relatório (exportação CSV)": lambda db: relatorios.exportar_itens_agendados(io.BytesIO(), INICIO, FIM),
+    "busca de itens": lambda db: (db.contar_busca_itens("cadeira"), db.buscar_itens("cadeira")),
+    "busca de itens (termo curto)": lambda db: (db.contar_busca_itens("ca"), db.buscar_itens("ca")),
+    "editar item (índice de busca)": lambda db: db.atualizar_item(1, "Item 1", "", 1),
+    "catálogo paginado": lambda db: db.listar_itens_paginado(limite=20, cursor=("m", 10)),
+    "catálogo paginado (desc)": lambda db: db.listar_itens_paginado(ordem="nome_desc", limite=20, cursor=("m", 10)),
+    "catálogo por prefixo": lambda db: (db.contar_itens("cad"), db.listar_itens_paginado("cad", limite=20)),
+    "nome de item duplicado": lambda db: db.nome_item_existe(" ITEM 1 ", ignorar_id=2),
+    "clientes paginados": lambda db: db.listar_clientes_paginado(limite=20, cursor=("m", 10)),
+    "busca de clientes": lambda db: (
+        db.contar_clientes("cliente"),
+        db.listar_clientes_paginado("cliente", limite=20, cursor=("Cliente 1 Teste", 1)),
+        db.listar_clientes_paginado("123.4", limite=20),
+    ),
+    "seletores do agendamento": lambda db: (
+        db.cache_leituras.limpar(),
+        db.opcoes_clientes("Cliente 1", 50),
+        db.opcoes_itens("Item 1", 50),
+        db.obter_itens([1, 2, 3]),
+    ),
+    "importação de itens (lote)": lambda db: db.inserir_itens_lote([("Item 1", "", 1), ("Novo 1", "", 1)]),
+    "importação de clientes (lote)": lambda db: db.inserir_clientes_lote(
+        [("Novo", "Cliente", None, "n@x.com", "", "52998224725")]
+    ),
+}
+
+
+@pytest.fixture
+def banco_com_dados(banco):
+    for i in range(1, 4):
+        banco.inserir_item(f"Item {i}", "cadeira de madeira", 10)
+        banco.inserir_cliente(f"Cliente {i}", "Teste", "1990-01-01", f"c{i}@x.com", "", f"1234567890{i}")
+    for i in range(1, 4):
+        banco.criar_agendamento(i, INICIO, (HOJE + timedelta(days=5)).isoformat(),
+                                [{"item_id": i, "quantidade": 1, "valor_unitario": 10}])
+    relatorios.obter_base_relatorio().dados()  # carga completa fora da medição
+    return banco
+
+
+def _virtual_com_restricao(detalhe):
+    # tabela virtual (FTS5): "INDEX 0:M2" usa MATCH/rowid; "INDEX 0:" é varredura
+    return " VIRTUAL TABLE INDEX " in detalhe and detalhe.split(":", 1)[-1].strip() != ""
+
+
+def varreduras(conn, sql, parametros=()):
+    """Linhas SCAN do plano (inclusive SCAN ... USING INDEX), exceto as que não são full scan."""
+    plano = [linha[3] for linha in conn.execute("EXPLAIN QUERY PLAN " + sql, parametros)]
+    # subconsultas (verificadas no próprio plano) aparecem como CO-ROUTINE/MATERIALIZE <nome>
+    subconsultas = {
+        detalhe.split()[1] for detalhe in plano
+        if detalhe.startswith(("CO-ROUTINE", "MATERIALIZE")) and len(detalhe.split()) > 1
+    }
+    return [
+        detalhe for detalhe in plano
+        if detalhe.startswith("SCAN")
+        and detalhe != "SCAN CONSTANT ROW"  # semente de CTE recursiva
+        and not _virtual_com_restricao(detalhe)
+        and detalhe.split()[1] not in subconsultas
+    ]
+
+
+@pytest.mark.parametrize("caminho", list(CAMINHOS))
+def test_caminho_sem_full_scan(banco_com_dados, caminho):
+    comandos = []
+    banco_com_dados.obter_gerenciador().definir_rastreador(comandos.append)
+    CAMINHOS[caminho](banco_com_dados)
+    banco_com_dados.obter_gerenciador().definir_rastreador(None)
+    assert comandos, "o caminho não executou nenhum comando"
+
+    falhas = []
+    with sqlite3.connect(banco_com_dados.DB_PATH) as explain:
+        for sql in comandos:
+            sql = sql.strip()
+            if sql.upper().startswith(IGNORAR):
+                continue
+            if sql.startswith("--"):
+                if not INTERNOS_FTS5.match(sql):
+                    falhas.append(f"comando interno não reconhecido: {sql}")
+                continue
+            falhas += [
+                f"{detalhe}: {' '.join(sql.split())}"
+                for detalhe in varreduras(explain, sql) if (caminho, detalhe) not in PERMITIDOS
+            ]
+    assert not falhas, "\n".join(falhas)
+
+
+def test_triggers_sem_full_scan(banco_com_dados):
+    falhas = []
+    with sqlite3.connect(banco_com_dados.DB_PATH) as conn:
+        triggers = conn.execute("SELECT name, sql FROM sqlite_master WHERE type = 'trigger'").fetchall()
+        assert triggers
+        for nome, sql in triggers:
+            corpo = sql[sql.upper().index("BEGIN") + len("BEGIN"):sql.upper().rindex("END")]
+            for comando in filter(str.strip, corpo.split(";")):
+                # NEW.col / OLD.col viram parâmetros nomeados
+                comando = re.sub(r"\b(NEW|OLD)\.(\w+)", r":\1_\2", comando)
+                parametros = dict.fromkeys(re.findall(r":(\w+)", comando))
+                falhas += [f"{nome}: {detalhe}" for detalhe in varreduras(conn, comando, parametros)]
+    assert not falhas, "\n".join(falhas)
@@ -0,0 +1,53 @@
+"""Fatos dos relatórios em memória: só os dias alterados são relidos, inclusive por outra conexão."""
+import sqlite3
+
+import relatorios
+
+INICIO, FIM = "2030-05-01", "2030-05-31"
+
+
+def kpis_no_banco(banco, inicio, fim):
+    with sqlite3.connect(banco.DB_PATH) as conn:
+        agendamentos, receita, quantidade = conn.execute("""
+            SELECT COALESCE(SUM(agendamentos), 0), COALESCE(SUM(receita), 0), COALESCE(SUM(quantidade), 0)
+            FROM fatos_cliente_dia WHERE dia BETWEEN ? AND ?
+        """, (inicio, fim)).fetchone()
+    kpis = relatorios.kpis_periodo(inicio, fim)
+    assert (kpis["agendamentos"], kpis["quantidade"]) == (agendamentos, quantidade)
+    assert round(kpis["receita"], 2) == round(receita, 2)
+    return kpis
+
+
+def test_fatos_em_memoria_acompanham_escritas(banco):
+    cliente_id = banco.inserir_cliente("Cliente", "Relatório", None, "r@example.com", "", "00000000000")
+    tenda = banco.inserir_item("Tenda", "", 10)
+    mesa = banco.inserir_item("Mesa", "", 10)
+    primeiro = banco.criar_agendamento(cliente_id, "2030-05-02", "2030-05-04",
+                                       [{"item_id": tenda, "quantidade": 2, "valor_unitario": 50}])
+    banco.criar_agendamento(cliente_id, "2030-05-10", "2030-05-12",
+                            [{"item_id": mesa, "quantidade": 1, "valor_unitario": 30}])
+    base = relatorios.obter_base_relatorio()
+
+    assert kpis_no_banco(banco, INICIO, FIM)["receita"] == 130
+    assert base.estatisticas()["cargas_completas"] == 1
+
+    # escrita por este módulo: só o dia alterado é relido
+    banco.atualizar_agendamento(primeiro, cliente_id, "2030-05-20", "2030-05-21",
+                                [{"item_id": mesa, "quantidade": 3, "valor_unitario": 30}])
+    assert kpis_no_banco(banco, INICIO, FIM)["receita"] == 120
+    receita_item = relatorios.receita_por_item(INICIO, FIM)
+    assert receita_item["item"].tolist() == ["Mesa"]
+    assert receita_item["quantidade"].tolist() == [4]
+
+    # escrita e exclusão por outra conexão (outro processo) também aparecem
+    with sqlite3.connect(banco.DB_PATH) as conn:
+        conn.execute("UPDATE agendamento_itens SET valor_total = 300 WHERE agendamento_id = ?", (primeiro,))
+    assert kpis_no_banco(banco, INICIO, FIM)["receita"] == 330
+    banco.excluir_agendamento(primeiro)
+    assert kpis_no_banco(banco, INICIO, FIM)["agendamentos"] == 1
+    assert relatorios.receita_por_dia(INICIO, FIM)["dia"].dt.strftime("%Y-%m-%d").tolist() == ["2030-05-10"]
+
+    estatisticas = base.estatisticas()
+    assert estatisticas["cargas_completas"] == 1
+    assert estatisticas["cargas_incrementais"] == 3
+    assert estatisticas["linhas"] == 2  # um dia, um item e um cliente em cada tabela